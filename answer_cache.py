@@ -0,0 +1,100 @@
+import os
+import re
+import threading
+import unicodedata
+
+from geo_cache import LRUCache, geohash_encode
+
+# 의미에 영향이 적은 어미/부탁 표현. 토큰 끝에서 긴 것부터 한 번 제거합니다
+_SUFFIXES = sorted(['해주세요', '해줘요', '해줄래', '해줘', '주세요', '줘요', '줄래', '줘', '할래'],
+                   key=len, reverse=True)
+# 질의에서 빼도 되는 군더더기 단어
+_STOPWORDS = {'좀', '혹시', '저기', '그럼', '제발', '한번', '나', '저', '제가', '내가'}
+_PUNCTUATION = re.compile(r'[^\w\s]')
+
+
+def normalize_query(text):
+    """질의 문자열을 캐시 키로 쓸 수 있게 정규화합니다.
+
+    NFKC 정규화, 소문자화, 문장부호/이모지 제거 후 토큰마다 어미를 떼고
+    군더더기 단어를 뺀 뒤 정렬합니다. "근처 맛집 추천해줘!"와
+    "맛집 근처 추천 좀 해주세요"는 같은 키가 됩니다.
+    """
+    text = _PUNCTUATION.sub(' ', unicodedata.normalize('NFKC', text or '').lower())
+    tokens = set()
+    for token in text.split():
+        if token in _STOPWORDS or token in _SUFFIXES:
+            continue
+        for suffix in _SUFFIXES:
+            if token.endswith(suffix):
+                token = token[:-len(suffix)]
+                break
+        tokens.add(token)
+    return ' '.join(sorted(tokens))
+
+
+class AnswerCache:
+    """정규화한 질의 + 세션 위치 버킷을 키로 하는 LLM 응답 캐시
+
+    같은 지역(geohash 셀)에서 들어온 거의 같은 질문에는 최근 응답을 재사용해
+    Dify 호출을 건너뜁니다. 요청/세션별로 캐시를 우회할 수 있고, 히트/미스/우회
+    횟수를 기록합니다.
+    """
+
+    def __init__(self, ttl=None, maxsize=None, precision=None, enabled=None):
+        self.ttl = int(ttl or os.getenv('ANSWER_CACHE_TTL', 600))
+        self.precision = int(precision or os.getenv('ANSWER_CACHE_PRECISION', 5))
+        self.memory = LRUCache(int(maxsize or os.getenv('ANSWER_CACHE_SIZE', 1024)), self.ttl)
+        if enabled is None:
+            enabled = os.getenv('ANSWER_CACHE_ENABLED', '1') == '1'
+        self.enabled = enabled
+
+        self._lock = threading.Lock()
+        self._stats = {'hits': 0, 'misses': 0, 'bypassed': 0, 'stores': 0, 'stale_hits': 0}
+
+    def key(self, query, location=None):
+        """캐시 키 (정규화한 질의, 위치 버킷). 정규화 결과가 비면 None"""
+        normalized = normalize_query(query)
+        if not normalized:
+            return None
+        bucket = ''
+        if location and location.get('latitude') is not None and location.get('longitude') is not None:
+            bucket = geohash_encode(float(location['latitude']), float(location['longitude']), self.precision)
+        return normalized, bucket
+
+    def lookup_key(self, query, location=None, use_cache=True):
+        """이 요청이 캐시를 쓸 수 있으면 키를, 아니면 None을 반환합니다."""
+        if not self.enabled or not use_cache:
+            self._count('bypassed')
+            return None
+        return self.key(query, location)
+
+    def get(self, key):
+        answer = self.memory.get(key)
+        self._count('hits' if answer is not None else 'misses')
+        return answer
+
+    def get_stale(self, key):
+        """만료된 항목까지 포함해 마지막으로 저장된 응답 (Dify 장애 시 사용)"""
+        answer = self.memory.get_stale(key)
+        if answer is not None:
+            self._count('stale_hits')
+        return answer
+
+    def set(self, key, answer):
+        self.memory.set(key, answer)
+        self._count('stores')
+
+    def _count(self, name):
+        with self._lock:
+            self._stats[name] += 1
+
+    def stats(self):
+        """히트/미스 카운터"""
+        with self._lock:
+            stats = dict(self._stats)
+        lookups = stats['hits'] + stats['misses']
+        stats['hit_rate'] = stats['hits'] / lookups if lookups else 0.0
+        stats['size'] = len(self.memory)
+        stats['enabled'] = self.enabled
+        return stats
@@ -1,162 +1,50 @@
-from flask import Flask, render_template, request, jsonify
-import requests
-import folium
-from geopy.geocoders import Nominatim
-from geopy.distance import geodesic
-import os
+from flask import Flask, render_template, request, jsonify, Response, stream_with_context
 from dotenv import load_dotenv
 import json
+from core import PLACE_TYPES, TravelRecommender, lazy_instance, validate_place_type
+from geo_cache import MAX_PLACES_RADIUS
+from map_render import itinerary_geojson, places_geojson
+import metrics
+from metrics import REGISTRY, timed
+from ratelimit import PRIORITY_INTERACTIVE
+from singleflight import single_flight_stats
+from upstream import run_concurrently, upstream_stats
+from blocking import blocking_stats
 
 load_dotenv()
 
 app = Flask(__name__)
 
-class TravelRecommender:
-    def __init__(self):
-        self.geolocator = Nominatim(user_agent="travel_recommender")
-        
-        self.api_key = os.getenv('GOOGLE_PLACES_API_KEY')
-        
-    def get_current_location(self, lat, lng):
-        """현재 위치 정보를 가져옵니다."""
-        try:
-            location = self.geolocator.reverse(f"{lat}, {lng}")
-            return {
-                'address': location.address,
-                'latitude': lat,
-                'longitude': lng
-            }
-        except Exception as e:
-            return {
-                'address': f"위치: {lat}, {lng}",
-                'latitude': lat,
-                'longitude': lng
-            }
-    
-    def search_nearby_places(self, lat, lng, radius=5000, place_type='tourist_attraction'):
-        """주변 여행지를 검색합니다."""
-        if not self.api_key:
-            # API 키가 없을 경우 샘플 데이터 반환
-            return self.get_sample_places(lat, lng)
-        
-        url = "https://maps.googleapis.com/maps/api/place/nearbysearch/json"
-        params = {
-            'location': f"{lat},{lng}",
-            'radius': radius,
-            'type': place_type,
-            'key': self.api_key
-        }
-        
-        try:
-            response = requests.get(url, params=params)
-            data = response.json()
-            
-            if data['status'] == 'OK':
-                places = []
-                for place in data['results']:
-                    place_info = {
-                        'name': place.get('name', ''),
-                        'address': place.get('vicinity', ''),
-                        'rating': place.get('rating', 0),
-                        'types': place.get('types', []),
-                        'latitude': place['geometry']['location']['lat'],
-                        'longitude': place['geometry']['location']['lng'],
-                        'distance': geodesic((lat, lng), 
-                                           (place['geometry']['location']['lat'], 
-                                            place['geometry']['location']['lng'])).kilometers
-                    }
-                    places.append(place_info)
-                
-                # 거리순으로 정렬
-                places.sort(key=lambda x: x['distance'])
-                return places[:10]  # 상위 10개만 반환
-            else:
-                return self.get_sample_places(lat, lng)
-                
-        except Exception as e:
-            print(f"API 호출 오류: {e}")
-            return self.get_sample_places(lat, lng)
-    
-    def get_sample_places(self, lat, lng):
-        """샘플 여행지 데이터를 반환합니다."""
-        sample_places = [
-            {
-                'name': '한강공원',
-                'address': '서울특별시 영등포구 여의도동',
-                'rating': 4.5,
-                'types': ['park', 'tourist_attraction'],
-                'latitude': lat + 0.01,
-                'longitude': lng + 0.01,
-                'distance': 1.2
-            },
-            {
-                'name': '남산타워',
-                'address': '서울특별시 용산구 남산공원길',
-                'rating': 4.3,
-                'types': ['tourist_attraction', 'point_of_interest'],
-                'latitude': lat - 0.008,
-                'longitude': lng + 0.005,
-                'distance': 2.1
-            },
-            {
-                'name': '경복궁',
-                'address': '서울특별시 종로구 사직로',
-                'rating': 4.7,
-                'types': ['tourist_attraction', 'museum'],
-                'latitude': lat + 0.015,
-                'longitude': lng - 0.003,
-                'distance': 3.5
-            },
-            {
-                'name': '홍대거리',
-                'address': '서울특별시 마포구 홍대로',
-                'rating': 4.2,
-                'types': ['tourist_attraction', 'shopping'],
-                'latitude': lat - 0.012,
-                'longitude': lng - 0.008,
-                'distance': 4.2
-            },
-            {
-                'name': '동대문디자인플라자',
-                'address': '서울특별시 중구 을지로',
-                'rating': 4.0,
-                'types': ['tourist_attraction', 'shopping'],
-                'latitude': lat + 0.018,
-                'longitude': lng + 0.002,
-                'distance': 5.1
-            }
-        ]
-        return sample_places
-    
-    def create_map(self, current_location, places):
-        """지도를 생성합니다."""
-        # 현재 위치를 중심으로 지도 생성
-        map_obj = folium.Map(
-            location=[current_location['latitude'], current_location['longitude']],
-            zoom_start=13
-        )
-        
-        # 현재 위치 마커 추가
-        folium.Marker(
-            [current_location['latitude'], current_location['longitude']],
-            popup=f"현재 위치<br>{current_location['address']}",
-            icon=folium.Icon(color='red', icon='info-sign')
-        ).add_to(map_obj)
-        
-        # 여행지 마커 추가
-        for place in places:
-            folium.Marker(
-                [place['latitude'], place['longitude']],
-                popup=f"<b>{place['name']}</b><br>"
-                      f"주소: {place['address']}<br>"
-                      f"평점: {place['rating']}<br>"
-                      f"거리: {place['distance']:.1f}km",
-                icon=folium.Icon(color='blue', icon='star')
-            ).add_to(map_obj)
-        
-        return map_obj
+def parse_search_query(data):
+    """검색 요청의 (위도, 경도, 반경, 장소 타입)을 검증합니다. 잘못되면 ValueError"""
+    if not isinstance(data, dict):
+        raise ValueError('잘못된 요청 형식입니다')
+    try:
+        lat = float(data.get('latitude', 37.5665))
+        lng = float(data.get('longitude', 126.9780))
+        radius = int(data.get('radius', 5000))
+    except (TypeError, ValueError):
+        raise ValueError('latitude, longitude, radius는 숫자여야 합니다')
+    if not 1 <= radius <= MAX_PLACES_RADIUS:
+        raise ValueError(f'radius는 1~{MAX_PLACES_RADIUS} 사이여야 합니다')
+    place_type = validate_place_type(data.get('place_type', 'tourist_attraction'))
+    return lat, lng, radius, place_type
+
+def bad_request(error):
+    return jsonify({'success': False, 'error': error}), 400
 
-recommender = TravelRecommender()
+# 워커 프로세스에서 처음 사용할 때 생성 (SQLite 캐시 연결, 업스트림 클라이언트)
+get_recommender = lazy_instance(TravelRecommender)
+
+# /metrics 엔드포인트와 요청 지연 기록, 캐시/업스트림 카운터 등록
+metrics.init_app(app, 'travel')
+REGISTRY.register_collector('cache_reverse_geocode', lambda: get_recommender().geocode_cache.stats())
+REGISTRY.register_collector('cache_places', lambda: get_recommender().places_cache.stats())
+REGISTRY.register_collector('cache_map_render', lambda: get_recommender().map_renderer.cache.stats())
+REGISTRY.register_collector('prefetch', lambda: get_recommender().prefetcher.stats())
+REGISTRY.register_collector('upstream', upstream_stats, label='upstream')
+REGISTRY.register_collector('single_flight', single_flight_stats, label='name')
+REGISTRY.register_collector('blocking', blocking_stats)
 
 @app.route('/')
 def index():
@@ -165,11 +53,15 @@ def index():
 @app.route('/get_location', methods=['POST'])
 def get_location():
     """현재 위치를 가져옵니다."""
+    recommender = get_recommender()
     data = request.get_json()
     lat = float(data.get('latitude', 37.5665))
     lng = float(data.get('longitude', 126.9780))
     
-    current_location = recommender.get_current_location(lat, lng)
+    # 사용자가 직접 요청한 조회는 호출 한도 대기열에서 우선 처리
+    current_location = recommender.get_current_location(lat, lng, PRIORITY_INTERACTIVE)
+    # 다음 검색에 쓰일 주변 타일을 미리 조회
+    recommender.prefetcher.schedule(lat, lng)
     
     return jsonify({
         'success': True,
@@ -179,42 +71,130 @@ def get_location():
 @app.route('/search_places', methods=['POST'])
 def search_places():
     """주변 여행지를 검색합니다."""
-    data = request.get_json()
-    lat = float(data.get('latitude', 37.5665))
-    lng = float(data.get('longitude', 126.9780))
-    radius = int(data.get('radius', 5000))
-    place_type = data.get('place_type', 'tourist_attraction')
-    
-    current_location = recommender.get_current_location(lat, lng)
-    places = recommender.search_nearby_places(lat, lng, radius, place_type)
+    recommender = get_recommender()
+    data = request.get_json(silent=True) or {}
+    try:
+        lat, lng, radius, place_type = parse_search_query(data)
+    except ValueError as e:
+        return bad_request(str(e))
     
-    # 지도 생성
-    map_obj = recommender.create_map(current_location, places)
-    map_html = map_obj._repr_html_()
+    # 역지오코딩과 주변 검색을 동시에 수행
+    current_location, (places, source) = run_concurrently(
+        lambda: recommender.get_current_location(lat, lng),
+        lambda: recommender.lookup_nearby_places(lat, lng, radius, place_type)
+    )
     
-    return jsonify({
+    result = {
         'success': True,
         'location': current_location,
         'places': places,
-        'map_html': map_html
-    })
+        'source': source,
+        'stale': source == 'stale'
+    }
+    
+    # 기본은 GeoJSON 마커 데이터, map_format='html'이면 folium 지도 HTML
+    if data.get('map_format', 'geojson') == 'html':
+        result['map_html'] = recommender.render_map_html(current_location, places)
+    else:
+        result['map_geojson'] = places_geojson(current_location, places)
+    
+    with timed('json.serialize'):
+        return jsonify(result)
+
+@app.route('/search_places/stream', methods=['POST'])
+def search_places_stream():
+    """모든 페이지를 조회하며 결과를 NDJSON으로 스트리밍합니다.
+    
+    줄마다 지금까지 받은 페이지로 다시 순위를 매긴 places와 map_geojson이 담기며,
+    마지막 줄은 done=true 입니다.
+    """
+    recommender = get_recommender()
+    data = request.get_json(silent=True) or {}
+    try:
+        lat, lng, radius, place_type = parse_search_query(data)
+    except ValueError as e:
+        return bad_request(str(e))
+    
+    pages = recommender.stream_nearby_places(lat, lng, radius, place_type)
+    # 첫 페이지와 역지오코딩은 /search_places와 같이 동시에 수행
+    current_location, first = run_concurrently(
+        lambda: recommender.get_current_location(lat, lng),
+        lambda: next(pages)
+    )
+    
+    def line(page):
+        places, source, done = page
+        map_geojson = places_geojson(current_location, places)
+        with timed('json.serialize'):
+            return json.dumps({
+                'success': True,
+                'location': current_location,
+                'places': places,
+                'source': source,
+                'stale': source == 'stale',
+                'done': done,
+                'map_geojson': map_geojson
+            }, ensure_ascii=False) + '\n'
+    
+    def generate():
+        yield line(first)
+        for page in pages:
+            yield line(page)
+    
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+@app.route('/search_places/batch', methods=['POST'])
+def search_places_batch():
+    """여러 정류지/유형을 한 번에 검색합니다 (일정 계획용).
+    
+    {"queries": [{"latitude", "longitude", "radius", "place_type"}, ...]}를 받아
+    질의 순서대로의 결과 목록(results)과 모든 정류지와 장소를 합친 map_geojson을
+    반환합니다.
+    """
+    recommender = get_recommender()
+    data = request.get_json(silent=True) or {}
+    raw_queries = data.get('queries') if isinstance(data, dict) else None
+    if not isinstance(raw_queries, list) or not raw_queries:
+        return bad_request('queries 목록이 필요합니다')
+    if len(raw_queries) > recommender.batch_max:
+        return bad_request(f'질의는 최대 {recommender.batch_max}개까지 가능합니다')
+    
+    try:
+        queries = [parse_search_query(query) for query in raw_queries]
+    except ValueError as e:
+        return bad_request(f'잘못된 질의 형식입니다: {e}')
+    
+    results = recommender.search_batch(queries)
+    for result, (_, _, radius, place_type) in zip(results, queries):
+        result['radius'] = radius
+        result['place_type'] = place_type
+    
+    payload = {
+        'success': True,
+        'results': results,
+        'map_geojson': itinerary_geojson([(result['location'], result['places']) for result in results])
+    }
+    with timed('json.serialize'):
+        return jsonify(payload)
 
 @app.route('/get_place_types')
 def get_place_types():
     """사용 가능한 장소 타입을 반환합니다."""
-    place_types = [
-        {'value': 'tourist_attraction', 'label': '관광지'},
-        {'value': 'restaurant', 'label': '레스토랑'},
-        {'value': 'hotel', 'label': '호텔'},
-        {'value': 'museum', 'label': '박물관'},
-        {'value': 'park', 'label': '공원'},
-        {'value': 'shopping_mall', 'label': '쇼핑몰'},
-        {'value': 'cafe', 'label': '카페'},
-        {'value': 'bar', 'label': '바'},
-        {'value': 'movie_theater', 'label': '영화관'},
-        {'value': 'amusement_park', 'label': '놀이공원'}
-    ]
-    return jsonify(place_types)
+    return jsonify(PLACE_TYPES)
+
+@app.route('/cache_stats')
+def cache_stats():
+    """캐시 히트/미스 통계를 반환합니다."""
+    recommender = get_recommender()
+    return jsonify({
+        'reverse_geocode': recommender.geocode_cache.stats(),
+        'places': recommender.places_cache.stats(),
+        'map_render': recommender.map_renderer.cache.stats(),
+        'prefetch': recommender.prefetcher.stats(),
+        'upstreams': upstream_stats(),
+        'single_flight': single_flight_stats()
+    })
 
 if __name__ == '__main__':
     import sys
@@ -0,0 +1,92 @@
+"""대화 저장 처리량 벤치마크
+
+요청마다 연결을 새로 여는 기존 방식과 연결 풀(WAL), write-behind 그룹 커밋
+방식의 초당 INSERT 수를 비교합니다.
+
+    python benchmarks/bench_db.py --threads 8 --inserts 2000
+"""
+import argparse
+import json
+import os
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database import DatabaseManager
+
+
+class LegacyDatabaseManager(DatabaseManager):
+    """호출마다 sqlite3.connect → 커밋 → close 하던 기존 동작 (rollback journal 모드)"""
+
+    def _connect(self):
+        return sqlite3.connect(self.db_path, check_same_thread=False)
+
+    def save_chat(self, session_id, user_message, ai_response, location_data=None, intent=None, entities=None):
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        cursor.execute('''
+            INSERT INTO chat_history (session_id, user_message, ai_response, location_data, intent, entities)
+            VALUES (?, ?, ?, ?, ?, ?)
+        ''', (session_id, user_message, ai_response,
+              json.dumps(location_data) if location_data else None,
+              intent, json.dumps(entities) if entities else None))
+        conn.commit()
+        conn.close()
+
+
+def run(db, threads, inserts):
+    """threads개 스레드가 합계 inserts건을 저장하는 데 걸린 시간으로 처리량을 계산합니다."""
+    per_thread = inserts // threads
+    errors = []
+
+    def worker(n):
+        for i in range(per_thread):
+            try:
+                db.save_chat(f'bench-{n}', f'질문 {i}', '응답 ' * 50, {'latitude': 37.5, 'longitude': 127.0})
+            except sqlite3.OperationalError as e:
+                errors.append(str(e))
+
+    workers = [threading.Thread(target=worker, args=(n,)) for n in range(threads)]
+    start = time.perf_counter()
+    for t in workers:
+        t.start()
+    for t in workers:
+        t.join()
+    db.flush()
+    elapsed = time.perf_counter() - start
+
+    return {
+        'inserts_per_sec': round(per_thread * threads / elapsed, 1),
+        'elapsed_sec': round(elapsed, 3),
+        'errors': len(errors)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--inserts', type=int, default=2000)
+    args = parser.parse_args()
+
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        modes = {
+            'legacy': lambda path: LegacyDatabaseManager(path, write_behind=False),
+            'pooled': lambda path: DatabaseManager(path, write_behind=False),
+            'write_behind': lambda path: DatabaseManager(path, write_behind=True),
+        }
+        for name, factory in modes.items():
+            db = factory(os.path.join(tmp, f'{name}.db'))
+            results[name] = run(db, args.threads, args.inserts)
+            print(f"{name:>13}: {results[name]['inserts_per_sec']:>10} inserts/s "
+                  f"({results[name]['elapsed_sec']}s, errors={results[name]['errors']})")
+
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,178 @@
+"""워커 시작 시간/메모리 벤치마크
+
+앱 모듈마다 새 프로세스를 띄워 import 시간, 첫 요청까지의 시간, 그 시점의
+RSS/PSS를 측정합니다 (gunicorn 워커가 각자 앱을 불러오는 경우).
+
+--preload를 주면 부모 프로세스에서 모듈을 불러오고 core.preload()를 실행한 뒤
+--workers개 워커를 fork해, 워커마다 첫 요청 시간과 RSS/PSS를 보고합니다
+(gunicorn --preload). PSS는 공유 페이지를 공유한 프로세스 수로 나눈 값이라
+fork로 공유한 메모리만큼 RSS보다 작아집니다.
+
+    python benchmarks/bench_startup.py --runs 5
+    python benchmarks/bench_startup.py --preload --workers 4
+"""
+import argparse
+import importlib
+import json
+import os
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# 대상: (모듈, 첫 요청 경로). 첫 요청에서 DB/캐시/업스트림 클라이언트가 만들어짐
+TARGETS = {
+    'app': ('app', '/cache_stats'),
+    'chat': ('chat_app', '/api/session/bench'),
+}
+
+
+def memory():
+    """현재 프로세스의 RSS와 PSS (MB). /proc이 없으면 최대 RSS만 반환합니다."""
+    try:
+        with open('/proc/self/smaps_rollup') as f:
+            fields = dict(line.split(':', 1) for line in f if ':' in line and not line.startswith(' '))
+        return {
+            'rss_mb': round(int(fields['Rss'].split()[0]) / 1024, 1),
+            'pss_mb': round(int(fields['Pss'].split()[0]) / 1024, 1),
+        }
+    except (OSError, KeyError, ValueError):
+        return {'rss_mb': round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1), 'pss_mb': None}
+
+
+def first_request(module, path):
+    """첫 요청을 처리하고 걸린 시간(ms)과 상태 코드를 반환합니다."""
+    started = time.perf_counter()
+    status = module.app.test_client().get(path).status_code
+    return round((time.perf_counter() - started) * 1000, 1), status
+
+
+def measure_cold(target):
+    """--child 모드: 이 프로세스에서 대상을 처음부터 불러와 측정합니다."""
+    module_name, path = TARGETS[target]
+    started = time.perf_counter()
+    module = importlib.import_module(module_name)
+    import_ms = round((time.perf_counter() - started) * 1000, 1)
+    after_import = memory()
+    first_ms, status = first_request(module, path)
+    return {
+        'import_ms': import_ms,
+        'import_rss_mb': after_import['rss_mb'],
+        'first_request_ms': first_ms,
+        'status': status,
+        **memory(),
+    }
+
+
+def run_cold(target, runs):
+    results = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        output = subprocess.run([sys.executable, os.path.abspath(__file__), '--child', target],
+                                capture_output=True, text=True, check=True).stdout
+        result = json.loads(output.strip().splitlines()[-1])
+        result['process_ms'] = round((time.perf_counter() - started) * 1000, 1)
+        results.append(result)
+    return results
+
+
+def run_preload(targets, workers):
+    """부모에서 불러오고 preload한 뒤 워커를 fork해 워커별 측정값을 모읍니다."""
+    import core
+
+    started = time.perf_counter()
+    modules = {target: importlib.import_module(TARGETS[target][0]) for target in targets}
+    import_ms = round((time.perf_counter() - started) * 1000, 1)
+    started = time.perf_counter()
+    core.preload()
+    preload_ms = round((time.perf_counter() - started) * 1000, 1)
+
+    parent = {'import_ms': import_ms, 'preload_ms': preload_ms,
+              'threads_before_fork': threading.active_count(), **memory()}
+
+    children = []
+    for n in range(workers):
+        read_fd, write_fd = os.pipe()
+        pid = os.fork()
+        if pid == 0:
+            os.close(read_fd)
+            result = {'worker': n}
+            for target in targets:
+                result[f'{target}_first_request_ms'] = first_request(modules[target], TARGETS[target][1])[0]
+            result.update(memory())
+            os.write(write_fd, json.dumps(result).encode('utf-8'))
+            os._exit(0)
+        os.close(write_fd)
+        children.append((pid, read_fd))
+
+    results = []
+    for pid, read_fd in children:
+        with os.fdopen(read_fd, 'rb') as f:
+            data = f.read()
+        os.waitpid(pid, 0)
+        results.append(json.loads(data))
+    return parent, results
+
+
+def summarize(results, keys):
+    return {key: round(statistics.median(r[key] for r in results), 1)
+            for key in keys if all(r.get(key) is not None for r in results)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--targets', default=','.join(TARGETS), help=f"측정할 앱 ({', '.join(TARGETS)})")
+    parser.add_argument('--runs', type=int, default=3, help='앱마다 새 프로세스를 띄워 측정할 횟수')
+    parser.add_argument('--preload', action='store_true', help='preload 후 fork한 워커도 측정')
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--child', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        # 환경 변수(임시 DB 경로)는 부모 프로세스에서 물려받음
+        print(json.dumps(measure_cold(args.child)))
+        return
+
+    targets = [t.strip() for t in args.targets.split(',') if t.strip()]
+    unknown = [t for t in targets if t not in TARGETS]
+    if unknown:
+        parser.error(f"알 수 없는 대상: {', '.join(unknown)} (가능: {', '.join(TARGETS)})")
+
+    with tempfile.TemporaryDirectory(prefix='bench-startup-') as tmp:
+        # 임시 DB를 쓰고 보관 작업은 끔 (첫 요청은 외부 API를 호출하지 않음)
+        os.environ['GEOCODE_CACHE_DB'] = os.path.join(tmp, 'geocode_cache.db')
+        os.environ['CHAT_DB_PATH'] = os.path.join(tmp, 'chat_history.db')
+        os.environ.setdefault('CHAT_RETENTION_DAYS', '0')
+        report = run(targets, args)
+
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+
+
+def run(targets, args):
+    report = {'cold': {}}
+    for target in targets:
+        runs = run_cold(target, args.runs)
+        summary = summarize(runs, ('process_ms', 'import_ms', 'first_request_ms', 'import_rss_mb', 'rss_mb', 'pss_mb'))
+        report['cold'][target] = {'median': summary, 'runs': runs}
+        print(f"{target:>6} (새 프로세스): import {summary['import_ms']}ms, 첫 요청 {summary['first_request_ms']}ms, "
+              f"프로세스 {summary['process_ms']}ms, RSS {summary['rss_mb']}MB")
+
+    if args.preload:
+        parent, workers = run_preload(targets, args.workers)
+        report['preload'] = {'parent': parent, 'workers': workers}
+        print(f"preload 부모: import {parent['import_ms']}ms + preload {parent['preload_ms']}ms, "
+              f"RSS {parent['rss_mb']}MB, fork 전 스레드 {parent['threads_before_fork']}개")
+        for worker in workers:
+            first = ', '.join(f"{t} 첫 요청 {worker[f'{t}_first_request_ms']}ms" for t in targets)
+            print(f"  워커 {worker['worker']}: {first}, RSS {worker['rss_mb']}MB, PSS {worker['pss_mb']}MB")
+    return report
+
+
+if __name__ == '__main__':
+    main()
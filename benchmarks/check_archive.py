@@ -0,0 +1,116 @@
+"""여러 프로세스의 대화 보관 작업 점검
+
+같은 DB에 보존 기간이 지난 대화를 채운 뒤 워커 프로세스 두 개가 동시에
+ChatArchive.run_once()를 실행하고, 모든 대화가 정확히 한 번씩만 보관됐는지
+(히스토리 id 중복/누락, 인덱스 행 수, 참조되지 않는 세그먼트) 확인합니다.
+
+- lease: 임대를 얻은 한 프로세스만 보관하고 다른 쪽은 건너뜀
+- race: 임대가 바로 만료되게 해 두 프로세스가 같은 행을 고르는 경우 (삭제 검사로 한쪽만 커밋)
+
+    python benchmarks/check_archive.py --sessions 30 --rows 100
+"""
+import argparse
+import multiprocessing
+import os
+import sqlite3
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+def seed(db_path, sessions, rows):
+    """보존 기간(30일)이 지난 대화를 sessions x rows개 채웁니다."""
+    from database import DatabaseManager
+
+    DatabaseManager(db_path).archive.close()
+    conn = sqlite3.connect(db_path)
+    conn.executemany('''
+        INSERT INTO chat_history (session_id, user_message, ai_response, timestamp)
+        VALUES (?, ?, ?, datetime('now', '-60 days'))
+    ''', [(f'session-{s}', f'질문 {s}-{i}', f'답변 {s}-{i}') for s in range(sessions) for i in range(rows)])
+    conn.commit()
+    conn.close()
+
+
+def archive_worker(db_path, barrier, results):
+    from database import DatabaseManager
+
+    db = DatabaseManager(db_path)
+    barrier.wait()
+    moved = db.archive.run_once()
+    results.put((os.getpid(), moved, db.archive.stats()))
+
+
+def run_scenario(name, sessions, rows, lease_seconds):
+    with tempfile.TemporaryDirectory(prefix='check-archive-') as tmp:
+        db_path = os.path.join(tmp, 'chat_history.db')
+        os.environ.update(CHAT_RETENTION_DAYS='30', CHAT_ARCHIVE_INTERVAL='3600', CHAT_ARCHIVE_BATCH='500',
+                          CHAT_ARCHIVE_LEASE=str(lease_seconds))
+        seed(db_path, sessions, rows)
+
+        context = multiprocessing.get_context('fork')
+        barrier = context.Barrier(2)
+        results = context.Queue()
+        workers = [context.Process(target=archive_worker, args=(db_path, barrier, results)) for _ in range(2)]
+        for worker in workers:
+            worker.start()
+        reports = [results.get(timeout=120) for _ in workers]
+        for worker in workers:
+            worker.join()
+
+        from database import DatabaseManager
+
+        db = DatabaseManager(db_path)
+        db.archive.close()
+        ids = []
+        for s in range(sessions):
+            cursor = None
+            while True:
+                page = db.get_chat_history_page(f'session-{s}', 100, cursor)
+                ids += [item['id'] for item in page['history']]
+                cursor = page['next_cursor']
+                if cursor is None:
+                    break
+
+        live = db._run(lambda conn: conn.execute('SELECT COUNT(*) FROM chat_history').fetchone()[0])
+        indexed, referenced = db._run(lambda conn: conn.execute(
+            'SELECT SUM(row_count), COUNT(DISTINCT segment) FROM chat_archive_index'
+        ).fetchone())
+        on_disk = len(os.listdir(db.archive.archive_dir))
+
+    expected = sessions * rows
+    moved = sum(report[1] for report in reports)
+    problems = []
+    if len(ids) != expected or len(set(ids)) != expected:
+        problems.append(f'히스토리 {len(ids)}개 (고유 {len(set(ids))}개, 기대 {expected}개)')
+    if moved != expected or indexed != expected or live != 0:
+        problems.append(f'보관 {moved}개, 인덱스 {indexed}개, 라이브 {live}개')
+    if on_disk != referenced:
+        problems.append(f'세그먼트 파일 {on_disk}개, 참조 {referenced}개')
+
+    summary = ', '.join(f"pid {pid}: {count}개 (건너뜀 {stats.get('skipped', 0)}, 충돌 {stats.get('conflicts', 0)})"
+                        for pid, count, stats in reports)
+    print(f"{name}: {'통과' if not problems else '실패'} - {summary}")
+    for problem in problems:
+        print(f'  {problem}')
+    return not problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sessions', type=int, default=30)
+    parser.add_argument('--rows', type=int, default=100, help='세션당 대화 수')
+    args = parser.parse_args()
+
+    ok = run_scenario('lease', args.sessions, args.rows, lease_seconds=600)
+    ok = run_scenario('race', args.sessions, args.rows, lease_seconds=0) and ok
+    if not ok:
+        print('대화 보관 점검 실패')
+        sys.exit(1)
+    print('대화 보관 점검 통과')
+
+
+if __name__ == '__main__':
+    main()
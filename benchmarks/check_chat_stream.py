@@ -0,0 +1,112 @@
+"""채팅 스트리밍 응답 캐시 점검
+
+로컬 스텁 Dify(benchmarks/stubs.py)가 응답을 중간에 끊도록 한 뒤
+/api/chat/stream으로 질문하고, 끊긴 응답이 응답 캐시에 저장되지 않아 같은
+질문을 한 다른 세션이 잘린 답을 cached=True로 받지 않는지 확인합니다. 이어서
+Dify 회로를 열어 만료된 응답을 제공할 때 SSE end 이벤트와 Socket.IO response
+이벤트에 stale=True가 담기는지 확인합니다. 점검이 하나라도 실패하면 종료 코드
+1로 끝납니다.
+
+    python benchmarks/check_chat_stream.py
+"""
+import json
+import os
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from load_test import configure_environment  # noqa: E402
+from stubs import start_stubs  # noqa: E402
+
+QUESTION = '근처 맛집 추천해줘'
+ANSWER_TTL = 2
+
+
+def stream_chat(client, session_id, message=QUESTION):
+    """/api/chat/stream을 끝까지 읽어 (받은 조각을 이은 문자열, end 이벤트 데이터)를 반환합니다."""
+    response = client.post('/api/chat/stream', json={'message': message, 'session_id': session_id})
+    chunks = []
+    end = None
+    for block in response.get_data(as_text=True).split('\n\n'):
+        lines = block.strip().splitlines()
+        if not lines:
+            continue
+        data = json.loads(lines[-1][len('data:'):].strip())
+        if lines[0] == 'event: end':
+            end = data
+        else:
+            chunks.append(data['chunk'])
+    return ''.join(chunks), end
+
+
+def check(failures, name, ok, detail=''):
+    print(f"{'통과' if ok else '실패'}: {name}{f' ({detail})' if detail else ''}")
+    if not ok:
+        failures.append(name)
+
+
+def main():
+    stubs = start_stubs(profiles={'dify': {'latency': 0.05, 'jitter': 0.0, 'truncate_rate': 1.0}})
+    failures = []
+    with tempfile.TemporaryDirectory(prefix='check-chat-') as tmp:
+        configure_environment(stubs.base_url, tmp, rate_limits=False)
+        os.environ['CHAT_RETENTION_DAYS'] = '0'
+        os.environ['ANSWER_CACHE_TTL'] = str(ANSWER_TTL)
+        import chat_app
+
+        client = chat_app.app.test_client()
+        answers = chat_app.get_dify_client().answer_cache
+
+        # 1) 응답이 중간에 끊긴 세션
+        partial, end = stream_chat(client, 'check-session-a')
+        check(failures, '끊긴 응답도 받은 만큼 전달', bool(partial) and end is not None, repr(partial))
+        check(failures, '끊긴 응답은 캐시하지 않음', answers.stats()['stores'] == 0, f"stores={answers.stats()['stores']}")
+
+        # 2) 같은 질문을 한 다른 세션은 잘린 답 대신 Dify를 다시 호출해 전체 응답을 받아야 함
+        stubs.profiles['dify']['truncate_rate'] = 0.0
+        full, end = stream_chat(client, 'check-session-b')
+        check(failures, '다른 세션은 캐시된 잘린 답을 받지 않음', not end['cached'] and full != partial,
+              f"cached={end['cached']}, {full!r}")
+        check(failures, 'Dify 재호출', stubs.calls.get('dify') == 2, f"dify={stubs.calls.get('dify')}")
+
+        # 3) 끝까지 받은 응답은 캐시되어 다음 세션에 그대로 제공
+        cached, end = stream_chat(client, 'check-session-c')
+        check(failures, '완전한 응답은 캐시', end['cached'] and cached == full, f"cached={end['cached']}")
+        check(failures, '신선한 캐시 응답은 stale 아님', end.get('stale') is False, f"stale={end.get('stale')}")
+
+        # 4) 캐시가 만료된 뒤 Dify 회로가 열리면 만료된 응답을 stale=True로 제공
+        time.sleep(ANSWER_TTL + 0.1)
+        stubs.profiles['dify']['error_rate'] = 1.0
+        dify = chat_app.get_dify_client()
+        for i in range(20):
+            if dify.upstream.circuit_open():
+                break
+            stream_chat(client, 'check-session-fail', f'회로 점검 질문 {i}')
+        check(failures, 'Dify 회로 열림', dify.upstream.circuit_open())
+
+        stale, end = stream_chat(client, 'check-session-d')
+        check(failures, 'SSE end 이벤트에 stale 표시', end.get('stale') is True and stale == full,
+              f"stale={end.get('stale')}")
+
+        socket = chat_app.socketio.test_client(chat_app.app)
+        socket.emit('message', {'message': QUESTION, 'session_id': 'check-session-e'})
+        responses = [event['args'][0] for event in socket.get_received() if event['name'] == 'response']
+        check(failures, 'Socket.IO response 이벤트에 stale 표시',
+              len(responses) == 1 and responses[0].get('stale') is True,
+              f"stale={responses[0].get('stale') if responses else None}")
+        socket.disconnect()
+
+        chat_app.get_session_store().flush()
+
+    if failures:
+        print(f"채팅 스트리밍 점검 실패: {len(failures)}건")
+        sys.exit(1)
+    print('채팅 스트리밍 점검 통과')
+
+
+if __name__ == '__main__':
+    main()
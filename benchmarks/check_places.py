@@ -0,0 +1,121 @@
+"""장소 검색 결과 수 점검
+
+로컬 스텁 Places(benchmarks/stubs.py, 고정 장소 분포)에 대해 여러 좌표와 반경으로
+lookup_nearby_places를 호출하고, 타일 캐시를 거친 결과 수가 요청 좌표/반경으로
+바로 조회했을 때(첫 페이지 20개를 거리순으로 자른 limit개)보다 적지 않은지
+확인합니다. 같은 타일을 캐시에서 읽는 요청도 함께 검사되며, 하나라도 모자라면
+종료 코드 1로 끝납니다.
+
+stream_nearby_places도 함께 점검합니다.
+- 페이지 토큰이 만료된 타일을 스트리밍하면 다시 받은 첫 페이지와 토큰이 캐시에 남아
+  다음 스트림이 첫 페이지를 또 조회하지 않는지
+- 첫 페이지의 반경 안에 장소가 없어 샘플을 보여 줬을 때 나머지 페이지에서 찾은
+  장소로 이어지는지
+
+    python benchmarks/check_places.py --points 40
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from load_test import SEOUL, configure_environment  # noqa: E402
+from stubs import places_within, start_stubs  # noqa: E402
+
+RADII = (1000, 2000, 3000, 5000, 7000, 10000, 15000, 20000, 30000, 50000)
+
+
+def check_counts(recommender, stubs, points, seed):
+    """좌표/반경마다 결과 수를 비교해 (검사 수, 모자란 검사 목록)을 반환합니다."""
+    rng = random.Random(seed)
+    short = []
+    checked = 0
+    for _ in range(points):
+        lat = SEOUL[0] + rng.uniform(-0.15, 0.15)
+        lng = SEOUL[1] + rng.uniform(-0.15, 0.15)
+        for radius in RADII:
+            expected = min(recommender.limit, len(places_within(lat, lng, radius)))
+            places, source = recommender.lookup_nearby_places(lat, lng, radius, 'restaurant')
+            checked += 1
+            if len(places) < expected:
+                short.append((round(lat, 4), round(lng, 4), radius, source, len(places), expected))
+    return checked, short
+
+
+def check_stream(recommender, stubs, sample_recommender):
+    """스트리밍 경로를 점검해 실패한 항목 목록을 반환합니다."""
+    failures = []
+    lat, lng, radius = SEOUL[0] + 0.01, SEOUL[1] + 0.01, 3000
+
+    # 1) 첫 페이지는 캐시에 있지만 페이지 토큰이 만료된 타일
+    recommender.lookup_nearby_places(lat, lng, radius, 'restaurant')
+    tile = recommender.places_cache.tile(lat, lng, 'restaurant', radius)
+    recommender.places_cache.page_tokens.clear()
+    list(recommender.stream_nearby_places(lat, lng, radius, 'restaurant'))
+    if recommender.places_cache.get_page_token(tile) is None:
+        failures.append('토큰 만료 후 다시 받은 첫 페이지의 토큰이 캐시되지 않음')
+    # 합친 페이지가 밀려난 뒤의 스트림은 캐시된 토큰부터 이어 가야 함 (첫 페이지 재조회 없음)
+    recommender.places_cache.memory.set(tile.key + ('pages',), None)
+    calls = stubs.calls.get('google_places', 0)
+    list(recommender.stream_nearby_places(lat, lng, radius, 'restaurant'))
+    refetched = stubs.calls.get('google_places', 0) - calls
+    if refetched != recommender.max_pages - 1:
+        failures.append(f'토큰 만료 뒤 두 번째 스트림의 Places 호출 {refetched}회 (기대 {recommender.max_pages - 1}회)')
+
+    # 2) 첫 페이지 20개가 모두 반경 밖이고 요청 반경 그대로 다시 조회해도 비어 있던 타일
+    cache = sample_recommender.places_cache
+    tile = cache.tile(lat, lng, 'restaurant', radius)
+    far = [{'name': f'먼 장소 {i}', 'geometry': {'location': {'lat': lat + 1.0, 'lng': lng}}} for i in range(20)]
+    cache.set(tile, far, f'1:{lat}:{lng}:{radius}:restaurant')
+    cache.set(cache.exact_tile(lat, lng, 'restaurant', radius), [])
+    pages = list(sample_recommender.stream_nearby_places(lat, lng, radius, 'restaurant'))
+    if pages[0][1] != 'sample':
+        failures.append(f'첫 결과가 샘플이 아님 ({pages[0][1]})')
+    if pages[-1][1] != 'live' or not pages[-1][0]:
+        failures.append(f'샘플 이후 나머지 페이지를 조회하지 않음 (결과 {len(pages)}번, 마지막 {pages[-1][1]})')
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--points', type=int, default=40, help='검사할 좌표 수 (좌표마다 모든 반경 검사)')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    stubs = start_stubs(profiles={'google_places': {'latency': 0.0, 'jitter': 0.0}})
+    with tempfile.TemporaryDirectory(prefix='check-places-') as tmp:
+        configure_environment(stubs.base_url, tmp, rate_limits=False)
+        os.environ['PLACES_PAGE_TOKEN_DELAY'] = '0'
+        from core import TravelRecommender
+
+        recommender = TravelRecommender()
+        checked, short = check_counts(recommender, stubs, args.points, args.seed)
+        # 같은 좌표를 다시 조회하면 모두 캐시에서 응답해야 하고 결과 수도 같아야 함
+        calls = stubs.calls.get('google_places', 0)
+        _, short_cached = check_counts(recommender, stubs, args.points, args.seed)
+        repeat_calls = stubs.calls.get('google_places', 0) - calls
+        stream_failures = check_stream(recommender, stubs, TravelRecommender(sample_when_empty=True))
+
+    stats = recommender.places_cache.stats()
+    print(f"검사 {checked}건, Places 호출 {calls}회 (검사당 {calls / checked:.2f}), "
+          f"같은 질의 반복 시 호출 {repeat_calls}회, 캐시 히트율 {stats['hit_rate']:.2f}")
+    for lat, lng, radius, source, count, expected in (short + short_cached)[:10]:
+        print(f"  모자람: ({lat}, {lng}) 반경 {radius}m [{source}] {count}개 < {expected}개")
+
+    for failure in stream_failures:
+        print(f'  스트리밍: {failure}')
+
+    if short or short_cached or repeat_calls or stream_failures:
+        print(f"장소 결과 수 점검 실패: 모자람 {len(short) + len(short_cached)}건, 반복 호출 {repeat_calls}회, "
+              f"스트리밍 {len(stream_failures)}건")
+        sys.exit(1)
+    print('장소 결과 수 점검 통과')
+
+
+if __name__ == '__main__':
+    main()
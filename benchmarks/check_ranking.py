@@ -0,0 +1,117 @@
+"""거리 순위 정확도 점검
+
+rank_places(haversine + argpartition)의 결과를 geodesic 기준 구현과
+ranking.check_accuracy로 비교합니다. 국내 주요 도시 주변에 Places 응답과 같은
+형식의 레코드(최대 60개, 반경 밖과 좌표 없는 레코드 포함)를 만들어 반경별로
+검사하고, 하나라도 기준을 넘으면 종료 코드 1로 끝납니다.
+
+- 거리: 같은 장소의 두 거리 차이가 거리의 --tolerance 비율 이하
+- 순서: 상위 k개가 같은 순서이거나, 다르다면 같은 순위끼리의 기준 거리 차이가
+  허용 오차 이하 (haversine과 타원체 거리 차이로 생기는 근소한 동률 뒤바뀜만 허용)
+
+    python benchmarks/check_ranking.py
+    python benchmarks/check_ranking.py --samples 200 --seed 7
+"""
+import argparse
+import math
+import os
+import random
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from ranking import check_accuracy, rank_places, rank_places_geodesic  # noqa: E402
+
+# 검사 기준점 (위도, 경도)
+CENTERS = {
+    '서울': (37.5665, 126.9780),
+    '부산': (35.1796, 129.0756),
+    '제주': (33.4996, 126.5312),
+    '강릉': (37.7519, 128.8761),
+}
+RADII = (500, 1000, 5000, 20000)
+PLACE_TYPES = ('tourist_attraction', 'restaurant', 'cafe', 'lodging', 'museum', 'park')
+
+
+def make_results(rnd, lat, lng, radius, count):
+    """기준점 주변 (반경의 1.2배 사각형) 무작위 Places 레코드"""
+    span_lat = radius * 1.2 / 111320
+    span_lng = span_lat / math.cos(math.radians(lat))
+    results = []
+    for i in range(count):
+        results.append({
+            'name': f'장소 {i}',
+            'vicinity': f'테스트로 {i}',
+            'rating': round(rnd.uniform(3.0, 5.0), 1),
+            'types': [rnd.choice(PLACE_TYPES), 'point_of_interest'],
+            'geometry': {'location': {
+                'lat': lat + rnd.uniform(-span_lat, span_lat),
+                'lng': lng + rnd.uniform(-span_lng, span_lng),
+            }},
+        })
+    # 위치 정보가 없는 레코드는 양쪽 모두 제외해야 함
+    results.append({'name': '좌표 없음', 'geometry': {}})
+    return results
+
+
+def check(lat, lng, results, limit, radius, tolerance):
+    """한 표본을 검사해 (거리 통과, 순서 통과, 최대 오차 km)를 반환합니다."""
+    accuracy = check_accuracy(lat, lng, results, limit, radius)
+    fast = rank_places(lat, lng, results, limit, radius)
+    reference = rank_places_geodesic(lat, lng, results, limit, radius)
+
+    # rank_places가 고른 장소들의 geodesic 거리 (순위 그대로)
+    fast_reference = _geodesic_distances(lat, lng, fast)
+
+    distance_ok = (accuracy['max_error_km'] <= tolerance * radius / 1000 and all(
+        abs(place['distance'] - ref) <= tolerance * ref for place, ref in zip(fast, fast_reference)
+    ))
+    order_ok = accuracy['same_order'] or (len(fast) == len(reference) and all(
+        abs(ref - place['distance']) <= tolerance * place['distance']
+        for ref, place in zip(fast_reference, reference)
+    ))
+    return distance_ok, order_ok, accuracy['max_error_km']
+
+
+def _geodesic_distances(lat, lng, places):
+    records = [{'name': i, 'geometry': {'location': {'lat': p['latitude'], 'lng': p['longitude']}}}
+               for i, p in enumerate(places)]
+    by_index = {p['name']: p['distance'] for p in rank_places_geodesic(lat, lng, records, limit=len(records))}
+    return [by_index[i] for i in range(len(places))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--samples', type=int, default=50, help='도시/반경마다 검사할 표본 수')
+    parser.add_argument('--count', type=int, default=60, help='표본당 장소 수 (Places 3페이지 = 60)')
+    parser.add_argument('--limit', type=int, default=10)
+    parser.add_argument('--tolerance', type=float, default=0.005, help='허용 거리 오차 (거리 대비 비율)')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    rnd = random.Random(args.seed)
+    failures = 0
+    for city, (lat, lng) in CENTERS.items():
+        for radius in RADII:
+            distance_fail = order_fail = 0
+            max_error = 0.0
+            for _ in range(args.samples):
+                results = make_results(rnd, lat, lng, radius, args.count)
+                distance_ok, order_ok, error = check(lat, lng, results, args.limit, radius, args.tolerance)
+                distance_fail += not distance_ok
+                order_fail += not order_ok
+                max_error = max(max_error, error)
+            failures += distance_fail + order_fail
+            status = '통과' if not (distance_fail or order_fail) else '실패'
+            print(f"{city} 반경 {radius}m: 최대 오차 {max_error * 1000:.1f}m, "
+                  f"거리 실패 {distance_fail}, 순서 실패 {order_fail} ({status})")
+
+    if failures:
+        print(f"순위 정확도 점검 실패: {failures}건")
+        sys.exit(1)
+    print('순위 정확도 점검 통과')
+
+
+if __name__ == '__main__':
+    main()
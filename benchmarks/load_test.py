@@ -0,0 +1,338 @@
+"""엔드포인트 부하 테스트
+
+로컬 스텁 업스트림(benchmarks/stubs.py)을 띄우고 app.py와 chat_app.py를
+로컬 HTTP 서버로 실행한 뒤, 동시성 단계마다 엔드포인트별로 정해진 시간 동안
+요청을 보내 처리량과 p50/p95/p99 지연을 측정합니다. 결과는 JSON으로 저장되며
+--compare로 이전 결과와 비교할 수 있습니다.
+
+    python benchmarks/load_test.py --concurrency 1,8,32 --duration 10
+    python benchmarks/load_test.py --endpoints api_chat,socket_message --dify-latency 0.5
+    python benchmarks/load_test.py --compare benchmarks/results/load_20250101-120000.json
+
+앱 설정은 환경 변수로 바꿀 수 있습니다 (예: CHAT_DB_WRITE_BEHIND=1). 업스트림
+호출 한도는 기본으로 끄며, --rate-limits를 주면 설정값을 그대로 적용합니다.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from datetime import datetime
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from stubs import add_profile_arguments, profiles_from_args, start_stubs
+
+SEOUL = (37.5665, 126.9780)
+PLACE_TYPES = ['restaurant', 'tourist_attraction', 'hotel']
+MESSAGES = ['근처 맛집 추천해줘', '가볼 만한 관광지 알려줘', '오늘 묵을 호텔 찾아줘', '카페 추천 좀 해주세요', '안녕하세요']
+
+
+def configure_environment(stub_url, tmp_dir, rate_limits):
+    """앱을 import하기 전에 스텁 주소와 임시 저장소 경로를 환경 변수로 설정합니다."""
+    for name in ('GOOGLE_PLACES', 'NOMINATIM', 'DIFY'):
+        os.environ[f'{name}_BASE_URL'] = stub_url
+        if not rate_limits:
+            os.environ.setdefault(f'{name}_RATE', '0')
+    os.environ.setdefault('GOOGLE_PLACES_API_KEY', 'stub-key')
+    os.environ.setdefault('DIFY_API_KEY', 'stub-key')
+    os.environ.setdefault('PLACES_PROVIDER', 'google')
+    os.environ.setdefault('PLACES_PAGE_TOKEN_DELAY', '0.1')
+    os.environ['GEOCODE_CACHE_DB'] = os.path.join(tmp_dir, 'geocode_cache.db')
+    os.environ['CHAT_DB_PATH'] = os.path.join(tmp_dir, 'chat_history.db')
+
+
+def serve(flask_app):
+    """Flask 앱을 임의 포트의 스레드형 werkzeug 서버로 실행하고 기본 URL을 반환합니다."""
+    from werkzeug.serving import WSGIRequestHandler, make_server
+
+    class QuietHandler(WSGIRequestHandler):
+        def log_request(self, *args, **kwargs):
+            pass
+
+    server = make_server('127.0.0.1', 0, flask_app, threaded=True, request_handler=QuietHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return f'http://127.0.0.1:{server.server_port}', server
+
+
+def random_point(rng, spread):
+    return SEOUL[0] + rng.uniform(-spread, spread), SEOUL[1] + rng.uniform(-spread, spread)
+
+
+class Worker:
+    """부하를 만드는 클라이언트 하나 (스레드당 HTTP 세션/Socket.IO 연결)"""
+
+    def __init__(self, urls, spread, seed):
+        import requests
+
+        self.urls = urls
+        self.spread = spread
+        self.rng = random.Random(seed)
+        self.http = requests.Session()
+        self.session_id = str(uuid.uuid4())
+        self.socket = None
+
+    def point(self):
+        return random_point(self.rng, self.spread)
+
+    def post(self, server, path, payload, stream=False):
+        response = self.http.post(self.urls[server] + path, json=payload, stream=stream, timeout=60)
+        if stream:
+            for _ in response.iter_lines():
+                pass
+        response.raise_for_status()
+        return response
+
+    def get(self, server, path):
+        response = self.http.get(self.urls[server] + path, timeout=60)
+        response.raise_for_status()
+        return response
+
+    def connect_socket(self):
+        import socketio
+
+        self.socket = socketio.Client(reconnection=False)
+        self._responded = threading.Event()
+        self.socket.on('response', lambda data: self._responded.set())
+        self.socket.connect(self.urls['chat'], transports=['polling'], wait_timeout=10)
+
+    def socket_message(self, message):
+        """Socket.IO message를 보내고 response 이벤트가 올 때까지 기다립니다."""
+        if self.socket is None:
+            self.connect_socket()
+
+        self._responded.clear()
+        self.socket.emit('message', {'message': message, 'session_id': self.session_id})
+        if not self._responded.wait(60):
+            raise TimeoutError('Socket.IO 응답 시간 초과')
+
+    def close(self):
+        if self.socket is not None:
+            self.socket.disconnect()
+        self.http.close()
+
+
+def _location(worker, server, path):
+    lat, lng = worker.point()
+    worker.post(server, path, {'latitude': lat, 'longitude': lng, 'session_id': worker.session_id})
+
+
+def _search(worker, path, stream=False):
+    lat, lng = worker.point()
+    worker.post('app', path, {
+        'latitude': lat, 'longitude': lng, 'radius': 5000, 'place_type': worker.rng.choice(PLACE_TYPES)
+    }, stream=stream)
+
+
+def _search_batch(worker, stops=4):
+    """정류지 stops곳 × 장소 유형 두 가지를 한 번에 검색"""
+    queries = []
+    for _ in range(stops):
+        lat, lng = worker.point()
+        for place_type in worker.rng.sample(PLACE_TYPES, 2):
+            queries.append({'latitude': lat, 'longitude': lng, 'radius': 5000, 'place_type': place_type})
+    worker.post('app', '/search_places/batch', {'queries': queries})
+
+
+def _api_places(worker):
+    lat, lng = worker.point()
+    worker.post('chat', '/api/places', {
+        'latitude': lat, 'longitude': lng, 'place_type': worker.rng.choice(PLACE_TYPES),
+        'session_id': worker.session_id
+    })
+
+
+# 엔드포인트 이름 → 요청 한 번을 보내는 함수
+ENDPOINTS = {
+    'get_location': lambda w: _location(w, 'app', '/get_location'),
+    'search_places': lambda w: _search(w, '/search_places'),
+    'search_places_stream': lambda w: _search(w, '/search_places/stream', stream=True),
+    'search_places_batch': _search_batch,
+    'get_place_types': lambda w: w.get('app', '/get_place_types'),
+    'api_chat': lambda w: w.post('chat', '/api/chat', {
+        'message': w.rng.choice(MESSAGES), 'session_id': w.session_id
+    }),
+    'api_location': lambda w: _location(w, 'chat', '/api/location'),
+    'api_places': _api_places,
+    'api_history': lambda w: w.get('chat', f'/api/history/{w.session_id}?limit=20'),
+    'socket_message': lambda w: w.socket_message(w.rng.choice(MESSAGES)),
+}
+
+
+def percentile(sorted_values, pct):
+    """정렬된 값의 nearest-rank 백분위수"""
+    if not sorted_values:
+        return None
+    index = max(0, min(len(sorted_values) - 1, int(round(pct / 100 * len(sorted_values))) - 1))
+    return sorted_values[index]
+
+
+def run_level(name, urls, concurrency, duration, spread, seed):
+    """concurrency개 워커가 duration초 동안 엔드포인트를 반복 호출한 결과"""
+    request_fn = ENDPOINTS[name]
+    latencies = []
+    errors = []
+    lock = threading.Lock()
+    start_barrier = threading.Barrier(concurrency + 1)
+    deadline = [0.0]
+
+    def worker_loop(n):
+        worker = Worker(urls, spread, seed * 1000 + n)
+        local_latencies = []
+        local_errors = []
+        try:
+            # 연결 수립 시간은 측정에서 제외
+            if name == 'socket_message':
+                worker.connect_socket()
+            start_barrier.wait()
+            while time.perf_counter() < deadline[0]:
+                started = time.perf_counter()
+                try:
+                    request_fn(worker)
+                    local_latencies.append(time.perf_counter() - started)
+                except Exception as e:
+                    local_errors.append(type(e).__name__)
+        finally:
+            worker.close()
+            with lock:
+                latencies.extend(local_latencies)
+                errors.extend(local_errors)
+
+    threads = [threading.Thread(target=worker_loop, args=(n,), daemon=True) for n in range(concurrency)]
+    for t in threads:
+        t.start()
+    deadline[0] = time.perf_counter() + duration
+    start_barrier.wait()
+    started = time.perf_counter()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    to_ms = lambda value: round(value * 1000, 2) if value is not None else None
+    return {
+        'requests': len(latencies),
+        'errors': len(errors),
+        'error_types': {kind: errors.count(kind) for kind in set(errors)},
+        'throughput_rps': round(len(latencies) / elapsed, 2),
+        'mean_ms': to_ms(sum(latencies) / len(latencies)) if latencies else None,
+        'p50_ms': to_ms(percentile(latencies, 50)),
+        'p95_ms': to_ms(percentile(latencies, 95)),
+        'p99_ms': to_ms(percentile(latencies, 99)),
+        'max_ms': to_ms(latencies[-1] if latencies else None),
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT,
+                                       stderr=subprocess.DEVNULL).decode().strip()
+    except Exception:
+        return None
+
+
+def compare(current, baseline_path):
+    """같은 엔드포인트/동시성 단계의 처리량과 p95 변화를 출력합니다."""
+    with open(baseline_path, encoding='utf-8') as f:
+        baseline = json.load(f)
+
+    print(f"\n비교 기준: {baseline_path} (commit {baseline['meta'].get('git_commit')})")
+    print(f"{'endpoint':>22} {'c':>4} {'rps':>10} {'Δrps':>8} {'p95 ms':>10} {'Δp95':>8}")
+    for name, levels in current['results'].items():
+        for level, stats in levels.items():
+            base = baseline['results'].get(name, {}).get(level)
+            if not base:
+                continue
+            rps_delta = _change(base['throughput_rps'], stats['throughput_rps'])
+            p95_delta = _change(base['p95_ms'], stats['p95_ms'])
+            print(f"{name:>22} {level:>4} {stats['throughput_rps']:>10} {rps_delta:>8} "
+                  f"{stats['p95_ms']!s:>10} {p95_delta:>8}")
+
+
+def _change(before, after):
+    if not before or after is None:
+        return '-'
+    return f'{(after - before) / before * 100:+.1f}%'
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--concurrency', default='1,4,16', help='쉼표로 구분한 동시성 단계')
+    parser.add_argument('--duration', type=float, default=5, help='단계별 측정 시간 (초)')
+    parser.add_argument('--endpoints', default=','.join(ENDPOINTS), help='측정할 엔드포인트 (쉼표 구분)')
+    parser.add_argument('--spread', type=float, default=0.05, help='요청 좌표를 서울 시청 기준 ±spread도 안에서 무작위 선택')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--rate-limits', action='store_true', help='업스트림 호출 한도를 설정값대로 적용')
+    parser.add_argument('--output', help='결과 JSON 경로 (기본: benchmarks/results/load_<시각>.json)')
+    parser.add_argument('--compare', help='비교할 이전 결과 JSON')
+    add_profile_arguments(parser)
+    args = parser.parse_args()
+
+    endpoints = [name.strip() for name in args.endpoints.split(',') if name.strip()]
+    unknown = [name for name in endpoints if name not in ENDPOINTS]
+    if unknown:
+        parser.error(f"알 수 없는 엔드포인트: {', '.join(unknown)} (가능: {', '.join(ENDPOINTS)})")
+    levels = [int(c) for c in args.concurrency.split(',') if c.strip()]
+
+    profiles = profiles_from_args(args)
+    stubs = start_stubs(profiles=profiles)
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        configure_environment(stubs.base_url, tmp_dir, args.rate_limits)
+        import app as map_app
+        import chat_app
+
+        urls = {'app': serve(map_app.app)[0], 'chat': serve(chat_app.app)[0]}
+
+        results = {}
+        for name in endpoints:
+            results[name] = {}
+            for concurrency in levels:
+                stats = run_level(name, urls, concurrency, args.duration, args.spread, args.seed)
+                results[name][str(concurrency)] = stats
+                print(f"{name:>22} c={concurrency:<4} {stats['throughput_rps']:>9} req/s  "
+                      f"p50={stats['p50_ms']}ms p95={stats['p95_ms']}ms p99={stats['p99_ms']}ms "
+                      f"errors={stats['errors']}")
+
+        chat_app.get_db().flush()
+        chat_app.get_session_store().flush()
+
+    report = {
+        'meta': {
+            'timestamp': datetime.now().isoformat(timespec='seconds'),
+            'git_commit': git_commit(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'concurrency': levels,
+            'duration_sec': args.duration,
+            'spread_deg': args.spread,
+            'rate_limits': args.rate_limits,
+            'stub_profiles': profiles,
+        },
+        'results': results,
+        'upstream_calls': dict(stubs.calls),
+    }
+
+    output = args.output or os.path.join(ROOT, 'benchmarks', 'results',
+                                         f"load_{datetime.now().strftime('%Y%m%d-%H%M%S')}.json")
+    os.makedirs(os.path.dirname(output), exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"\n결과 저장: {output}")
+
+    if args.compare:
+        compare(report, args.compare)
+
+    stubs.shutdown()
+
+
+if __name__ == '__main__':
+    main()
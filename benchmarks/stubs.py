@@ -0,0 +1,240 @@
+"""Google Places / Nominatim / Dify 로컬 스텁 서버
+
+세 업스트림을 하나의 HTTP 서버로 흉내 냅니다. 업스트림마다 응답 지연(평균 ±
+지터)과 오류율을 지정할 수 있으며, 앱은 <NAME>_BASE_URL 환경 변수로 이
+서버를 가리키면 됩니다. Dify는 truncate_rate 확률로 응답 중간에 message_end
+없이 연결을 끊습니다.
+
+    python benchmarks/stubs.py --port 8900 --places-latency 0.15 --error-rate 0.02
+"""
+import argparse
+import json
+import math
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import numpy as np
+
+# 업스트림별 기본 (평균 지연 초, 지터 초, 오류율, Dify는 응답을 중간에 끊는 비율)
+DEFAULT_PROFILES = {
+    'google_places': {'latency': 0.15, 'jitter': 0.05, 'error_rate': 0.0},
+    'nominatim': {'latency': 0.2, 'jitter': 0.05, 'error_rate': 0.0},
+    'dify': {'latency': 0.3, 'jitter': 0.1, 'error_rate': 0.0, 'truncate_rate': 0.0},
+}
+
+_ANSWER = '주변에 평점이 높은 장소들을 찾았어요. 지도에서 위치를 확인해 보세요!'
+
+# Places 스텁의 고정 장소 분포: 서울 시청 주변에 밀집(정규 분포)하고 ±0.6° 안에 고르게 퍼진 장소들.
+# Nearby Search처럼 요청 반경 안의 장소를 prominence 순으로 한 페이지 20개, 최대 3페이지 반환합니다
+_FIELD_CENTER = (37.5665, 126.9780)
+_FIELD_SPAN = 0.6
+_FIELD_SIZE = 40000
+_PAGE_SIZE = 20
+
+
+def _poi_field():
+    rng = np.random.default_rng(20240101)
+    dense = _FIELD_SIZE // 2
+    lats = np.concatenate([rng.normal(_FIELD_CENTER[0], 0.08, dense),
+                           rng.uniform(-_FIELD_SPAN, _FIELD_SPAN, _FIELD_SIZE - dense) + _FIELD_CENTER[0]])
+    lngs = np.concatenate([rng.normal(_FIELD_CENTER[1], 0.08, dense),
+                           rng.uniform(-_FIELD_SPAN, _FIELD_SPAN, _FIELD_SIZE - dense) + _FIELD_CENTER[1]])
+    prominence = rng.random(_FIELD_SIZE)
+    # prominence 내림차순으로 저장해 두면 반경 필터 결과가 그대로 응답 순서
+    order = np.argsort(-prominence)
+    return lats[order], lngs[order], prominence[order]
+
+
+_FIELD = _poi_field()
+
+
+def places_within(lat, lng, radius):
+    """반경(미터) 안 장소의 인덱스를 prominence 순으로 반환합니다."""
+    lats, lngs, _ = _FIELD
+    dlat = np.radians(lats - lat)
+    dlng = np.radians(lngs - lng) * math.cos(math.radians(lat))
+    distance = 6371008.8 * np.sqrt(dlat ** 2 + dlng ** 2)
+    return np.flatnonzero(distance <= radius)
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, *args):
+        pass
+
+    def _delay(self, upstream):
+        profile = self.server.profiles[upstream]
+        self.server.count(upstream)
+        time.sleep(max(0.0, random.gauss(profile['latency'], profile['jitter'])))
+        if random.random() < profile['error_rate']:
+            self.server.count(upstream + '_errors')
+            self._send_json({'error': 'stub error'}, status=500)
+            return False
+        return True
+
+    def _send_json(self, obj, status=200):
+        body = json.dumps(obj, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        params = parse_qs(url.query)
+
+        if url.path == '/reverse':
+            if self._delay('nominatim'):
+                lat, lng = params['lat'][0], params['lon'][0]
+                self._send_json({'display_name': f'서울특별시 중구 스텁로 {lat[:7]}, {lng[:8]}'})
+        elif url.path == '/maps/api/place/nearbysearch/json':
+            if self._delay('google_places'):
+                self._send_json(self._nearby(params))
+        else:
+            self._send_json({'error': 'not found'}, status=404)
+
+    def _nearby(self, params):
+        """반경 안 장소를 20개짜리 페이지로 반환합니다. pagetoken으로 최대 3페이지까지 이어집니다."""
+        if 'pagetoken' in params:
+            page, lat, lng, radius, place_type = params['pagetoken'][0].split(':')
+            page, lat, lng, radius = int(page), float(lat), float(lng), float(radius)
+        else:
+            page = 0
+            lat, lng = map(float, params['location'][0].split(','))
+            radius = float(params.get('radius', ['5000'])[0])
+            place_type = params.get('type', ['restaurant'])[0]
+
+        lats, lngs, prominence = _FIELD
+        matches = places_within(lat, lng, radius)
+        if not len(matches):
+            return {'status': 'ZERO_RESULTS', 'results': []}
+
+        results = []
+        for i in matches[page * _PAGE_SIZE:(page + 1) * _PAGE_SIZE]:
+            results.append({
+                'name': f'스텁 장소 {i}',
+                'vicinity': '서울특별시 중구',
+                'rating': round(3.0 + 2.0 * float(prominence[i]), 1),
+                'types': [place_type, 'point_of_interest'],
+                'geometry': {'location': {'lat': float(lats[i]), 'lng': float(lngs[i])}}
+            })
+
+        data = {'status': 'OK', 'results': results}
+        if page < 2 and len(matches) > (page + 1) * _PAGE_SIZE:
+            data['next_page_token'] = f'{page + 1}:{lat}:{lng}:{radius}:{place_type}'
+        return data
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        self.rfile.read(length)
+
+        if urlparse(self.path).path != '/v1/chat-messages':
+            self._send_json({'error': 'not found'}, status=404)
+            return
+        if not self._delay('dify'):
+            return
+
+        # 응답을 몇 조각으로 나눠 SSE로 전송
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('Connection', 'close')
+        self.end_headers()
+        chunk_delay = self.server.profiles['dify']['latency'] / 10
+        words = _ANSWER.split(' ')
+        truncated = random.random() < self.server.profiles['dify']['truncate_rate']
+        if truncated:
+            # 응답 절반만 보내고 message_end 없이 연결 종료
+            self.server.count('dify_truncated')
+            words = words[:len(words) // 2]
+        for word in words:
+            event = {'event': 'message', 'answer': word + ' ', 'conversation_id': 'stub-conversation'}
+            self.wfile.write(f'data: {json.dumps(event, ensure_ascii=False)}\n\n'.encode('utf-8'))
+            self.wfile.flush()
+            time.sleep(chunk_delay)
+        if truncated:
+            self.close_connection = True
+            return
+        self.wfile.write(b'data: {"event": "message_end", "conversation_id": "stub-conversation"}\n\n')
+        self.wfile.flush()
+        self.close_connection = True
+
+
+class StubServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, profiles):
+        super().__init__(address, StubHandler)
+        self.profiles = profiles
+        self._lock = threading.Lock()
+        self.calls = {}
+
+    def count(self, name):
+        with self._lock:
+            self.calls[name] = self.calls.get(name, 0) + 1
+
+    @property
+    def base_url(self):
+        return f'http://{self.server_address[0]}:{self.server_address[1]}'
+
+
+def start_stubs(host='127.0.0.1', port=0, profiles=None):
+    """스텁 서버를 백그라운드 스레드로 시작합니다. profiles는 DEFAULT_PROFILES 형식으로 일부만 덮어씁니다."""
+    merged = {name: dict(profile) for name, profile in DEFAULT_PROFILES.items()}
+    for name, profile in (profiles or {}).items():
+        merged[name].update(profile)
+
+    server = StubServer((host, port), merged)
+    threading.Thread(target=server.serve_forever, name='stub-upstreams', daemon=True).start()
+    return server
+
+
+def add_profile_arguments(parser):
+    """업스트림별 지연/오류율 옵션 (--places-latency, --nominatim-error-rate 등)"""
+    parser.add_argument('--error-rate', type=float, default=None, help='모든 업스트림의 오류율 (0~1)')
+    for name, prefix in (('google_places', 'places'), ('nominatim', 'nominatim'), ('dify', 'dify')):
+        defaults = DEFAULT_PROFILES[name]
+        parser.add_argument(f'--{prefix}-latency', type=float, default=defaults['latency'])
+        parser.add_argument(f'--{prefix}-jitter', type=float, default=defaults['jitter'])
+        parser.add_argument(f'--{prefix}-error-rate', type=float, default=None)
+    parser.add_argument('--dify-truncate-rate', type=float, default=0.0, help='Dify 응답을 중간에 끊는 비율 (0~1)')
+
+
+def profiles_from_args(args):
+    profiles = {}
+    for name, prefix in (('google_places', 'places'), ('nominatim', 'nominatim'), ('dify', 'dify')):
+        error_rate = getattr(args, f'{prefix}_error_rate')
+        if error_rate is None:
+            error_rate = args.error_rate or 0.0
+        profiles[name] = {
+            'latency': getattr(args, f'{prefix}_latency'),
+            'jitter': getattr(args, f'{prefix}_jitter'),
+            'error_rate': error_rate,
+        }
+    profiles['dify']['truncate_rate'] = args.dify_truncate_rate
+    return profiles
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8900)
+    add_profile_arguments(parser)
+    args = parser.parse_args()
+
+    server = start_stubs(args.host, args.port, profiles_from_args(args))
+    print(f'스텁 업스트림: {server.base_url}')
+    print(f'  GOOGLE_PLACES_BASE_URL={server.base_url} NOMINATIM_BASE_URL={server.base_url} DIFY_BASE_URL={server.base_url}')
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,90 @@
+import os
+import sys
+import threading
+
+
+def is_green():
+    """eventlet monkey patch가 적용된 프로세스인지 확인합니다."""
+    if 'eventlet' not in sys.modules:
+        # 불러온 적이 없으면 patch도 안 된 것 (eventlet을 새로 불러오는 데 수백 ms)
+        return False
+    try:
+        from eventlet import patcher
+    except ImportError:
+        return False
+    return patcher.is_monkey_patched('thread')
+
+
+class BlockingExecutor:
+    """이벤트 루프를 멈추게 하는 작업(SQLite 등)을 위한 제한된 실행기
+
+    eventlet 모드에서는 eventlet.tpool의 네이티브 스레드에서 실행해 그동안
+    다른 그린 스레드(연결된 소켓들)가 계속 진행되게 하고, 동시에 넘기는 작업
+    수를 max_workers로 제한합니다. threading 모드에서는 요청마다 스레드가
+    있으므로 호출한 스레드에서 바로 실행합니다.
+
+    네이티브 스레드에서 실행되므로 넘기는 함수 안에서는 그린 락/큐처럼
+    monkey patch된 동기화 객체를 쓰지 않아야 합니다.
+    """
+
+    def __init__(self, max_workers=None):
+        self.max_workers = int(max_workers or os.getenv('BLOCKING_WORKERS', 20))
+        self.green = is_green()
+        self._tpool = None
+        if self.green:
+            from eventlet import tpool
+            tpool.set_num_threads(self.max_workers)
+            self._tpool = tpool
+
+        self._slots = threading.BoundedSemaphore(self.max_workers)
+        self._lock = threading.Lock()
+        self._stats = {'calls': 0, 'waited': 0, 'in_flight': 0}
+
+    def run(self, fn, *args, **kwargs):
+        """fn(*args, **kwargs)를 실행하고 결과를 반환합니다 (예외는 그대로 전달)."""
+        if not self.green:
+            return fn(*args, **kwargs)
+
+        if not self._slots.acquire(blocking=False):
+            self._count('waited')
+            self._slots.acquire()
+        self._count('calls')
+        self._count('in_flight')
+        try:
+            return self._tpool.execute(fn, *args, **kwargs)
+        finally:
+            self._count('in_flight', -1)
+            self._slots.release()
+
+    def _count(self, name, delta=1):
+        with self._lock:
+            self._stats[name] += delta
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+        stats['max_workers'] = self.max_workers
+        stats['green'] = self.green
+        return stats
+
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor():
+    """공용 실행기. monkey patch 여부를 반영하도록 처음 사용할 때 만듭니다."""
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = BlockingExecutor()
+    return _executor
+
+
+def run_blocking(fn, *args, **kwargs):
+    return get_executor().run(fn, *args, **kwargs)
+
+
+def blocking_stats():
+    return get_executor().stats()
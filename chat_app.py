@@ -1,33 +1,111 @@
-from flask import Flask, render_template, request, jsonify, session
+from flask import Flask, render_template, request, jsonify, session, Response, stream_with_context
 from flask_socketio import SocketIO, emit
-import requests
 import json
-import sqlite3
 import uuid
 from datetime import datetime
 import os
+import time
 from dotenv import load_dotenv
-import folium
-from geopy.geocoders import Nominatim
-from geopy.distance import geodesic
+from core import TravelRecommender, lazy_instance, validate_place_type
+from ratelimit import PRIORITY_INTERACTIVE
+from singleflight import single_flight_stats
+from upstream import get_upstream, upstream_stats
+from database import DatabaseManager
+from session_store import SessionStore
+from intent import load_intent_matcher
+from answer_cache import AnswerCache
+from blocking import blocking_stats, is_green
+from map_render import places_geojson
+import metrics
+from metrics import REGISTRY, timed
 
 load_dotenv()
 
 app = Flask(__name__)
 app.config['SECRET_KEY'] = os.getenv('SECRET_KEY', 'your-secret-key')
-socketio = SocketIO(app, cors_allowed_origins="*", async_mode="threading")
+# serve.py(운영 모드)가 eventlet monkey patch를 적용했으면 eventlet, 아니면 threading(개발 서버)
+# 워커 프로세스를 여러 개 띄울 때는 SOCKETIO_MESSAGE_QUEUE(예: redis://)로 이벤트를 주고받음
+socketio = SocketIO(app, cors_allowed_origins="*", async_mode='eventlet' if is_green() else 'threading',
+                    message_queue=os.getenv('SOCKETIO_MESSAGE_QUEUE') or None)
 
 class DifyClient:
     def __init__(self):
         self.api_key = os.getenv('DIFY_API_KEY')
-        self.base_url = os.getenv('DIFY_BASE_URL', 'https://api.dify.ai')
+        self.upstream = get_upstream('dify')
+        # 설정 파일 기반 의도/엔티티 분류기 (기본 응답과 대화 저장에 사용)
+        self.intent_matcher = load_intent_matcher()
+        # 정규화한 질의 + 위치 버킷 기준 응답 캐시
+        self.answer_cache = AnswerCache()
         
     def chat_completion(self, messages, context=None):
-        """Dify 채팅 완성 API 호출"""
+        """Dify 채팅 완성 API 호출 (스트림을 끝까지 읽어 전체 응답 반환)"""
+        for event in self.stream_chat(messages, context):
+            if event['type'] == 'end':
+                return {'answer': event['answer'], 'conversation_id': event['conversation_id'],
+                        'cached': event.get('cached', False), 'stale': event.get('stale', False)}
+        return self.get_fallback_response(messages[-1]['content'])
+    
+    def stream_chat(self, messages, context=None):
+        """응답 캐시를 먼저 확인하고, 없으면 Dify 스트리밍 응답을 전달
+        
+        context의 location(세션 위치)과 use_cache(False면 캐시 우회)를 키 계산에
+        사용합니다. 캐시 히트면 전체 응답을 조각 하나로 보내고 end 이벤트에
+        cached=True를 표시합니다. Dify 회로가 열려 있으면 만료된 응답을
+        stale=True로 제공합니다. 기본 응답(fallback)과 중간에 끊긴 응답(partial)은
+        캐시하지 않습니다.
+        """
+        context = context or {}
+        with timed('answer_cache.lookup'):
+            key = self.answer_cache.lookup_key(
+                messages[-1]['content'], context.get('location'), context.get('use_cache', True)
+            )
+            answer = self.answer_cache.get(key) if key is not None else None
+        if key is not None:
+            stale = False
+            if answer is None and self.upstream.circuit_open():
+                # Dify 회로가 열린 동안은 만료된 응답이라도 제공하고, 회복되면 백그라운드에서 갱신
+                answer = self.answer_cache.get_stale(key)
+                stale = answer is not None
+                if stale:
+                    self.upstream.revalidate(('answer', key), lambda: self._refresh_answer(messages, context, key))
+            if answer is not None:
+                yield {'type': 'chunk', 'text': answer}
+                yield {'type': 'end', 'answer': answer, 'conversation_id': context.get('conversation_id'),
+                       'cached': True, 'stale': stale}
+                return
+        
+        for event in self._stream_dify(messages, context):
+            if event['type'] == 'end' and key is not None and self._cacheable(event):
+                self.answer_cache.set(key, event['answer'])
+            yield event
+
+    def _cacheable(self, end_event):
+        """끝까지 받은 Dify 응답만 캐시 (기본 응답, 중간에 끊긴 응답 제외)"""
+        return bool(end_event['answer']) and not end_event.get('fallback') and not end_event.get('partial')
+    
+    def _refresh_answer(self, messages, context, key):
+        """Dify 응답을 끝까지 받아 캐시를 갱신합니다. 기본 응답으로 대체되면 None"""
+        for event in self._stream_dify(messages, context):
+            if event['type'] == 'end':
+                if not self._cacheable(event):
+                    return None
+                self.answer_cache.set(key, event['answer'])
+                return event['answer']
+        return None
+    
+    def _stream_dify(self, messages, context=None):
+        """Dify 스트리밍 응답을 도착하는 대로 전달
+        
+        {'type': 'chunk', 'text': ...} 이벤트를 조각마다 yield하고, 마지막에
+        전체 응답이 담긴 {'type': 'end', 'answer': ..., 'conversation_id': ...}를
+        한 번 yield합니다. 첫 조각 전에 실패하면 기본 응답으로 대체하고, 조각을
+        보낸 뒤 실패하거나 message_end 없이 스트림이 끝나면 받은 만큼을
+        partial=True로 표시해 보냅니다.
+        """
         if not self.api_key:
-            return self.get_fallback_response(messages[-1]['content'])
+            yield from self._fallback_events(messages[-1]['content'])
+            return
         
-        url = f"{self.base_url}/v1/chat-messages"
         headers = {
             'Authorization': f'Bearer {self.api_key}',
             'Content-Type': 'application/json'
@@ -41,174 +119,74 @@ class DifyClient:
             'user': context.get('user_id') if context else 'anonymous'
         }
         
+        chunks = []
+        conversation_id = None
+        completed = False
+        started = time.perf_counter()
         try:
-            response = requests.post(url, headers=headers, json=data)
-            if response.status_code == 200:
-                return response.json()
-            else:
-                return self.get_fallback_response(messages[-1]['content'])
+            response = self.upstream.post('/v1/chat-messages', headers=headers, json=data, stream=True)
+            if response.status_code != 200:
+                response.close()
+                yield from self._fallback_events(messages[-1]['content'])
+                return
+            
+            with response:
+                for event in self._iter_sse(response):
+                    conversation_id = event.get('conversation_id') or conversation_id
+                    if event.get('event') in ('message', 'agent_message'):
+                        text = event.get('answer', '')
+                        if text:
+                            if not chunks:
+                                REGISTRY.observe('dify.first_chunk', time.perf_counter() - started)
+                            chunks.append(text)
+                            yield {'type': 'chunk', 'text': text}
+                    elif event.get('event') == 'message_end':
+                        completed = True
+                        break
+                    elif event.get('event') == 'error':
+                        raise RuntimeError(event.get('message', 'stream error'))
         except Exception as e:
             print(f"Dify API 오류: {e}")
-            return self.get_fallback_response(messages[-1]['content'])
-    
-    def get_fallback_response(self, user_message):
-        """API 키가 없을 때의 기본 응답"""
-        # 간단한 의도 파악
-        if any(word in user_message for word in ['맛집', '음식', '식당', '레스토랑', '카페']):
-            return {
-                'answer': '맛집을 찾고 계시는군요! 현재 위치를 알려주시면 주변의 인기 맛집들을 추천해드릴게요. 📍 위치를 설정해주세요.',
-                'conversation_id': str(uuid.uuid4())
-            }
-        elif any(word in user_message for word in ['관광', '여행', '명소', '볼거리']):
-            return {
-                'answer': '관광지를 찾고 계시는군요! 현재 위치를 알려주시면 주변의 인기 관광지를 추천해드릴게요. 📍 위치를 설정해주세요.',
-                'conversation_id': str(uuid.uuid4())
-            }
-        elif any(word in user_message for word in ['호텔', '숙박', '잔다']):
-            return {
-                'answer': '숙박 시설을 찾고 계시는군요! 현재 위치를 알려주시면 주변의 호텔과 게스트하우스를 추천해드릴게요. 📍 위치를 설정해주세요.',
-                'conversation_id': str(uuid.uuid4())
-            }
-        else:
-            return {
-                'answer': '안녕하세요! 여행지 추천을 도와드릴게요. 어떤 종류의 장소를 찾고 계신가요? (맛집, 관광지, 호텔 등)',
-                'conversation_id': str(uuid.uuid4())
-            }
-
-class DatabaseManager:
-    def __init__(self):
-        self.db_path = 'chat_history.db'
-        self.init_database()
-    
-    def init_database(self):
-        """데이터베이스 초기화"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        # 대화 히스토리 테이블
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS chat_history (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                session_id TEXT,
-                user_message TEXT,
-                ai_response TEXT,
-                location_data TEXT,
-                timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
-                intent TEXT,
-                entities TEXT
-            )
-        ''')
+            if not chunks:
+                yield from self._fallback_events(messages[-1]['content'])
+                return
         
-        # 사용자 세션 테이블
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS user_sessions (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                session_id TEXT UNIQUE,
-                current_location TEXT,
-                preferences TEXT,
-                created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
-                last_activity DATETIME DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
-        
-        conn.commit()
-        conn.close()
+        REGISTRY.observe('dify.stream', time.perf_counter() - started)
+        end = {'type': 'end', 'answer': ''.join(chunks), 'conversation_id': conversation_id}
+        if not completed:
+            end['partial'] = True
+        yield end
     
-    def save_chat(self, session_id, user_message, ai_response, location_data=None, intent=None, entities=None):
-        """대화 저장"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            INSERT INTO chat_history (session_id, user_message, ai_response, location_data, intent, entities)
-            VALUES (?, ?, ?, ?, ?, ?)
-        ''', (session_id, user_message, ai_response, 
-              json.dumps(location_data) if location_data else None,
-              intent, json.dumps(entities) if entities else None))
-        
-        conn.commit()
-        conn.close()
+    def _iter_sse(self, response):
+        """SSE 응답에서 data 줄의 JSON 이벤트를 하나씩 파싱"""
+        response.encoding = 'utf-8'
+        for line in response.iter_lines(decode_unicode=True):
+            if not line or not line.startswith('data:'):
+                continue
+            try:
+                yield json.loads(line[5:].strip())
+            except ValueError:
+                continue
     
-    def get_chat_history(self, session_id, limit=10):
-        """대화 히스토리 조회"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            SELECT user_message, ai_response, timestamp 
-            FROM chat_history 
-            WHERE session_id = ? 
-            ORDER BY timestamp DESC 
-            LIMIT ?
-        ''', (session_id, limit))
-        
-        history = cursor.fetchall()
-        conn.close()
-        
-        return [{'user': msg, 'ai': response, 'timestamp': ts} for msg, response, ts in history]
+    def _fallback_events(self, user_message):
+        fallback = self.get_fallback_response(user_message)
+        yield {'type': 'chunk', 'text': fallback['answer']}
+        yield {'type': 'end', 'answer': fallback['answer'], 'conversation_id': fallback['conversation_id'],
+               'fallback': True}
     
-    def update_session_location(self, session_id, location_data):
-        """세션 위치 정보 업데이트"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            INSERT OR REPLACE INTO user_sessions (session_id, current_location, last_activity)
-            VALUES (?, ?, CURRENT_TIMESTAMP)
-        ''', (session_id, json.dumps(location_data)))
-        
-        conn.commit()
-        conn.close()
+    def get_fallback_response(self, user_message):
+        """API 키가 없거나 호출에 실패했을 때의 기본 응답 (의도별 응답 문구)"""
+        intent = self.intent_matcher.classify(user_message)['intent']
+        return {
+            'answer': self.intent_matcher.response(intent),
+            'conversation_id': str(uuid.uuid4())
+        }
 
-class TravelRecommender:
-    def __init__(self):
-        self.geolocator = Nominatim(user_agent="travel_chat_bot")
-        self.api_key = os.getenv('GOOGLE_PLACES_API_KEY')
+class ChatRecommender(TravelRecommender):
+    """채팅용 장소 추천기 (상위 5개, 결과가 없으면 유형별 샘플 데이터)"""
     
-    def search_nearby_places(self, lat, lng, radius=5000, place_type='restaurant'):
-        """주변 장소 검색"""
-        if not self.api_key:
-            return self.get_sample_places(lat, lng, place_type)
-        
-        url = "https://maps.googleapis.com/maps/api/place/nearbysearch/json"
-        params = {
-            'location': f"{lat},{lng}",
-            'radius': radius,
-            'type': place_type,
-            'key': self.api_key
-        }
-        
-        try:
-            response = requests.get(url, params=params)
-            data = response.json()
-            
-            if data['status'] == 'OK':
-                places = []
-                for place in data['results']:
-                    geometry = place.get('geometry', {}).get('location', {})
-                    lat_ = geometry.get('lat')
-                    lng_ = geometry.get('lng')
-                    if lat_ is None or lng_ is None:
-                        continue  # 위치 정보 없는 장소 제외
-                    place_info = {
-                        'name': place.get('name', ''),
-                        'address': place.get('vicinity', ''),
-                        'rating': place.get('rating', 0),
-                        'types': place.get('types', []),
-                        'latitude': lat_,
-                        'longitude': lng_,
-                        'distance': geodesic((lat, lng), (lat_, lng_)).kilometers
-                    }
-                    places.append(place_info)
-                places.sort(key=lambda x: x['distance'])
-                if not places:
-                    return self.get_sample_places(lat, lng, place_type)
-                return places[:5]
-            else:
-                return self.get_sample_places(lat, lng, place_type)
-        except Exception as e:
-            print(f"Places API 오류: {e}")
-            return self.get_sample_places(lat, lng, place_type)
+    def __init__(self):
+        super().__init__(limit=5, zoom_start=14, sample_when_empty=True)
     
     def get_sample_places(self, lat, lng, place_type):
         """샘플 장소 데이터"""
@@ -231,39 +209,53 @@ class TravelRecommender:
         }
         
         return sample_data.get(place_type, sample_data['restaurant'])
-    
-    def create_map(self, current_location, places):
-        """지도 생성"""
-        map_obj = folium.Map(
-            location=[current_location['latitude'], current_location['longitude']],
-            zoom_start=14
-        )
-        
-        # 현재 위치 마커
-        folium.Marker(
-            [current_location['latitude'], current_location['longitude']],
-            popup=f"현재 위치<br>{current_location['address']}",
-            icon=folium.Icon(color='red', icon='info-sign')
-        ).add_to(map_obj)
-        
-        # 추천 장소 마커
-        for place in places:
-            lat = place.get('latitude')
-            lng = place.get('longitude')
-            if lat is None or lng is None:
-                continue  # 위치 정보가 없으면 마커 추가하지 않음
-            folium.Marker(
-                [lat, lng],
-                popup=f"<b>{place.get('name','')}</b><br>주소: {place.get('address','')}<br>평점: {place.get('rating','')}<br>거리: {place.get('distance',0):.1f}km",
-                icon=folium.Icon(color='blue', icon='star')
-            ).add_to(map_obj)
-        
-        return map_obj
 
-# 전역 객체들
-dify_client = DifyClient()
-db_manager = DatabaseManager()
-travel_recommender = TravelRecommender()
+# 전역 객체들: SQLite 연결과 백그라운드 스레드를 만들므로 워커 프로세스에서 처음 사용할 때 생성
+get_dify_client = lazy_instance(DifyClient)
+get_db = lazy_instance(DatabaseManager)
+get_session_store = lazy_instance(lambda: SessionStore(get_db()))
+get_travel_recommender = lazy_instance(ChatRecommender)
+
+# /metrics 엔드포인트와 요청 지연 기록, 캐시/업스트림 카운터 등록
+metrics.init_app(app, 'chat')
+REGISTRY.register_collector('cache_reverse_geocode', lambda: get_travel_recommender().geocode_cache.stats())
+REGISTRY.register_collector('cache_places', lambda: get_travel_recommender().places_cache.stats())
+REGISTRY.register_collector('cache_map_render', lambda: get_travel_recommender().map_renderer.cache.stats())
+REGISTRY.register_collector('cache_answers', lambda: get_dify_client().answer_cache.stats())
+REGISTRY.register_collector('prefetch', lambda: get_travel_recommender().prefetcher.stats())
+REGISTRY.register_collector('sessions', lambda: get_session_store().stats())
+REGISTRY.register_collector('upstream', upstream_stats, label='upstream')
+REGISTRY.register_collector('single_flight', single_flight_stats, label='name')
+REGISTRY.register_collector('blocking', blocking_stats)
+REGISTRY.register_collector('chat_archive', lambda: get_db().archive.stats())
+
+def chat_context(session_id, data):
+    """Dify 호출 컨텍스트 (세션 위치와 캐시 사용 여부는 응답 캐시 키 계산에 사용)"""
+    state = get_session_store().get(session_id)
+    return {
+        'conversation_id': session_id,
+        'user_id': session_id,
+        'location': state['current_location'],
+        'use_cache': data.get('use_cache', True) is not False and state['preferences'].get('answer_cache', True)
+    }
+
+def save_turn(session_id, user_message, ai_response):
+    """대화 저장 (의도/엔티티 포함) 후 세션의 최근 대화에 추가"""
+    with timed('intent.classify'):
+        classification = get_dify_client().intent_matcher.classify(user_message)
+    get_db().save_chat(session_id, user_message, ai_response,
+                         intent=classification['intent'], entities=classification['entities'])
+    get_session_store().add_turn(session_id, user_message, ai_response)
+    return classification
+
+def request_location(data, session_id):
+    """요청의 좌표, 없으면 세션에 저장된 위치, 그것도 없으면 서울 시청"""
+    if data.get('latitude') is not None and data.get('longitude') is not None:
+        return float(data['latitude']), float(data['longitude'])
+    location = get_session_store().get(session_id)['current_location'] if session_id else None
+    if location:
+        return float(location['latitude']), float(location['longitude'])
+    return 37.5665, 126.9780
 
 @app.route('/')
 def index():
@@ -279,20 +271,56 @@ def chat():
     
     # Dify API 호출
     messages = [{'role': 'user', 'content': user_message}]
-    context = {'conversation_id': session_id, 'user_id': session_id}
+    context = chat_context(session_id, data)
     
-    response = dify_client.chat_completion(messages, context)
+    response = get_dify_client().chat_completion(messages, context)
     ai_response = response.get('answer', '죄송합니다. 응답을 생성할 수 없습니다.')
     
-    # 대화 저장
-    db_manager.save_chat(session_id, user_message, ai_response)
+    # 대화 저장 (의도/엔티티 포함)
+    classification = save_turn(session_id, user_message, ai_response)
     
     return jsonify({
         'success': True,
         'response': ai_response,
+        'intent': classification['intent'],
+        'entities': classification['entities'],
+        'cached': response.get('cached', False),
+        'stale': response.get('stale', False),
         'session_id': session_id
     })
 
+@app.route('/api/chat/stream', methods=['POST'])
+def chat_stream():
+    """채팅 API (SSE 스트리밍)
+
+    마지막 end 이벤트에 전체 응답과 cached, stale(Dify 회로가 열려 만료된 응답을 제공) 여부가 담깁니다.
+    """
+    data = request.get_json()
+    user_message = data.get('message', '')
+    session_id = data.get('session_id', str(uuid.uuid4()))
+    
+    messages = [{'role': 'user', 'content': user_message}]
+    context = chat_context(session_id, data)
+    
+    def generate():
+        ai_response = None
+        cached = stale = False
+        for event in get_dify_client().stream_chat(messages, context):
+            if event['type'] == 'chunk':
+                yield f"data: {json.dumps({'chunk': event['text']}, ensure_ascii=False)}\n\n"
+            else:
+                ai_response = event['answer'] or '죄송합니다. 응답을 생성할 수 없습니다.'
+                cached = event.get('cached', False)
+                stale = event.get('stale', False)
+        
+        # 전체 응답이 끝난 뒤 한 번만 저장
+        save_turn(session_id, user_message, ai_response)
+        final = {'response': ai_response, 'cached': cached, 'stale': stale, 'session_id': session_id}
+        yield f"event: end\ndata: {json.dumps(final, ensure_ascii=False)}\n\n"
+    
+    return Response(stream_with_context(generate()), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
 @app.route('/api/location', methods=['POST'])
 def set_location():
     """위치 설정 API"""
@@ -300,23 +328,14 @@ def set_location():
     lat = float(data.get('latitude', 37.5665))
     lng = float(data.get('longitude', 126.9780))
     session_id = data.get('session_id', str(uuid.uuid4()))
+    travel_recommender = get_travel_recommender()
     
-    try:
-        location = travel_recommender.geolocator.reverse(f"{lat}, {lng}")
-        location_data = {
-            'address': location.address,
-            'latitude': lat,
-            'longitude': lng
-        }
-    except:
-        location_data = {
-            'address': f"위치: {lat}, {lng}",
-            'latitude': lat,
-            'longitude': lng
-        }
+    location_data = travel_recommender.get_current_location(lat, lng, PRIORITY_INTERACTIVE)
     
-    # 세션 위치 업데이트
-    db_manager.update_session_location(session_id, location_data)
+    # 세션 위치 업데이트 (DB에는 주기적으로 write-back)
+    get_session_store().update_location(session_id, location_data)
+    # 다음 /api/places 요청에 쓰일 주변 타일을 미리 조회
+    travel_recommender.prefetcher.schedule(lat, lng)
     
     return jsonify({
         'success': True,
@@ -328,33 +347,92 @@ def set_location():
 def search_places():
     """장소 검색 API"""
     data = request.get_json()
-    lat = float(data.get('latitude', 37.5665))
-    lng = float(data.get('longitude', 126.9780))
-    place_type = data.get('place_type', 'restaurant')
-    session_id = data.get('session_id', str(uuid.uuid4()))
+    try:
+        place_type = validate_place_type(data.get('place_type', 'restaurant'))
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    session_id = data.get('session_id')
+    # 좌표를 보내지 않으면 세션에 저장된 위치를 사용
+    lat, lng = request_location(data, session_id)
+    session_id = session_id or str(uuid.uuid4())
+    travel_recommender = get_travel_recommender()
     
     # 주변 장소 검색
-    places = travel_recommender.search_nearby_places(lat, lng, 5000, place_type)
+    places, source = travel_recommender.lookup_nearby_places(lat, lng, 5000, place_type)
+    
+    result = {
+        'success': True,
+        'places': places,
+        'source': source,
+        'stale': source == 'stale',
+        'session_id': session_id
+    }
     
-    # 지도 생성
+    # 기본은 GeoJSON 마커 데이터, map_format='html'이면 folium 지도 HTML
     current_location = {'latitude': lat, 'longitude': lng, 'address': f"위치: {lat}, {lng}"}
-    map_obj = travel_recommender.create_map(current_location, places)
-    map_html = map_obj._repr_html_()
+    if data.get('map_format', 'geojson') == 'html':
+        result['map_html'] = travel_recommender.render_map_html(current_location, places)
+    else:
+        result['map_geojson'] = places_geojson(current_location, places)
     
+    with timed('json.serialize'):
+        return jsonify(result)
+
+@app.route('/api/session/<session_id>')
+def get_session(session_id):
+    """세션 상태 조회 (위치, 환경설정, 최근 대화)"""
+    session_data = get_session_store().get(session_id)
     return jsonify({
         'success': True,
-        'places': places,
-        'map_html': map_html,
-        'session_id': session_id
+        'session_id': session_id,
+        'location': session_data['current_location'],
+        'preferences': session_data['preferences'],
+        'recent_turns': list(session_data['turns'])
     })
 
 @app.route('/api/history/<session_id>')
 def get_history(session_id):
-    """대화 히스토리 조회"""
-    history = db_manager.get_chat_history(session_id)
+    """대화 히스토리 조회 (?limit=&cursor= 로 이전 페이지 조회)"""
+    limit = min(max(request.args.get('limit', 10, type=int), 1), 100)
+    cursor = request.args.get('cursor', type=int)
+    
+    page = get_db().get_chat_history_page(session_id, limit, cursor)
+    return jsonify({
+        'success': True,
+        'history': page['history'],
+        'next_cursor': page['next_cursor']
+    })
+
+@app.route('/api/cache/answers', methods=['POST'])
+def set_answer_cache():
+    """세션별 응답 캐시 사용 여부 설정 (enabled: false면 항상 Dify 호출)"""
+    data = request.get_json()
+    session_id = data.get('session_id')
+    if not session_id:
+        return jsonify({'success': False, 'error': 'session_id가 필요합니다'}), 400
+    
+    enabled = data.get('enabled', True) is not False
+    get_session_store().set_preference(session_id, 'answer_cache', enabled)
+    return jsonify({
+        'success': True,
+        'session_id': session_id,
+        'enabled': enabled
+    })
+
+@app.route('/api/cache/stats')
+def cache_stats():
+    """캐시 히트/미스 통계"""
+    travel_recommender = get_travel_recommender()
     return jsonify({
         'success': True,
-        'history': history
+        'reverse_geocode': travel_recommender.geocode_cache.stats(),
+        'places': travel_recommender.places_cache.stats(),
+        'map_render': travel_recommender.map_renderer.cache.stats(),
+        'prefetch': travel_recommender.prefetcher.stats(),
+        'answers': get_dify_client().answer_cache.stats(),
+        'sessions': get_session_store().stats(),
+        'upstreams': upstream_stats(),
+        'single_flight': single_flight_stats()
     })
 
 @socketio.on('connect')
@@ -365,24 +443,62 @@ def handle_connect():
 
 @socketio.on('message')
 def handle_message(data):
-    """WebSocket 메시지 처리"""
+    """WebSocket 메시지 처리 (응답 조각을 도착하는 대로 전송)"""
     user_message = data.get('message', '')
     session_id = data.get('session_id', str(uuid.uuid4()))
     
     # Dify API 호출
     messages = [{'role': 'user', 'content': user_message}]
-    context = {'conversation_id': session_id, 'user_id': session_id}
+    context = chat_context(session_id, data)
     
-    response = dify_client.chat_completion(messages, context)
-    ai_response = response.get('answer', '죄송합니다. 응답을 생성할 수 없습니다.')
+    ai_response = None
+    cached = stale = False
+    started = time.perf_counter()
+    for event in get_dify_client().stream_chat(messages, context):
+        if event['type'] == 'chunk':
+            emit('response_chunk', {
+                'chunk': event['text'],
+                'session_id': session_id
+            })
+        else:
+            ai_response = event['answer'] or '죄송합니다. 응답을 생성할 수 없습니다.'
+            cached = event.get('cached', False)
+            stale = event.get('stale', False)
     
-    # 대화 저장
-    db_manager.save_chat(session_id, user_message, ai_response)
+    # 대화 저장 (의도/엔티티 포함)
+    save_turn(session_id, user_message, ai_response)
+    # Socket.IO 이벤트는 HTTP 요청 훅을 거치지 않으므로 단계로 기록
+    REGISTRY.observe('socket.message', time.perf_counter() - started)
     
     emit('response', {
         'response': ai_response,
+        'cached': cached,
+        'stale': stale,
         'session_id': session_id
     })
 
+@socketio.on('search_places')
+def handle_search_places(data):
+    """WebSocket 장소 검색 (모든 페이지를 조회하며 받은 페이지마다 places 이벤트 전송)"""
+    session_id = data.get('session_id')
+    try:
+        place_type = validate_place_type(data.get('place_type', 'restaurant'))
+    except ValueError as e:
+        emit('places_error', {'error': str(e), 'session_id': session_id})
+        return
+    lat, lng = request_location(data, session_id)
+    session_id = session_id or str(uuid.uuid4())
+    
+    current_location = {'latitude': lat, 'longitude': lng, 'address': f"위치: {lat}, {lng}"}
+    for places, source, done in get_travel_recommender().stream_nearby_places(lat, lng, 5000, place_type):
+        emit('places', {
+            'places': places,
+            'source': source,
+            'stale': source == 'stale',
+            'done': done,
+            'map_geojson': places_geojson(current_location, places),
+            'session_id': session_id
+        })
+
 if __name__ == '__main__':
     socketio.run(app, debug=True, host='0.0.0.0', port=5002, allow_unsafe_werkzeug=True) 
\ No newline at end of file
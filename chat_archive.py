@@ -0,0 +1,172 @@
+import gzip
+import json
+import os
+import threading
+import uuid
+from datetime import datetime
+
+from blocking import run_blocking
+
+
+class ChatArchive:
+    """오래된 대화를 옮겨 두는 압축 보관 계층
+
+    보존 기간(retention_days)이 지난 chat_history 행을 batch_size개씩 읽어 gzip
+    JSONL 세그먼트 파일에 추가 전용으로 기록하고, 라이브 DB에서는 삭제합니다.
+    세그먼트 안에서 세션마다 별도의 gzip 멤버로 기록하므로 chat_archive_index의
+    (세그먼트, 오프셋, 길이)만으로 한 세션의 대화만 읽을 수 있습니다. 삭제로 생긴
+    빈 페이지는 incremental_vacuum으로 조금씩 반환합니다.
+
+    세그먼트를 먼저 쓰고 인덱스 추가와 삭제를 한 트랜잭션으로 커밋하므로, 중간에
+    중단되면 참조되지 않는 세그먼트만 남고 대화는 라이브 DB에 그대로 남습니다.
+
+    워커 프로세스마다 보관 작업이 돌기 때문에 DB의 임대(lease)를 얻은 프로세스만
+    실행하고 배치마다 임대를 연장합니다. 임대가 만료되어 두 프로세스가 같은 행을
+    골랐더라도 삭제가 모두 성공한 쪽만 커밋되고 나머지 세그먼트는 버려집니다.
+    """
+
+    def __init__(self, db, archive_dir=None, retention_days=None, interval=None, batch_size=None,
+                 vacuum_pages=None):
+        self.db = db
+        self.archive_dir = archive_dir or os.getenv('CHAT_ARCHIVE_DIR') or \
+            os.path.splitext(db.db_path)[0] + '_archive'
+        self.retention_days = float(retention_days if retention_days is not None
+                                    else os.getenv('CHAT_RETENTION_DAYS', 30))
+        self.interval = float(interval or os.getenv('CHAT_ARCHIVE_INTERVAL', 3600))
+        self.batch_size = int(batch_size or os.getenv('CHAT_ARCHIVE_BATCH', 5000))
+        self.vacuum_pages = int(vacuum_pages if vacuum_pages is not None else os.getenv('CHAT_VACUUM_PAGES', 1000))
+        self.lease_seconds = float(os.getenv('CHAT_ARCHIVE_LEASE', 600))
+        self._owner = uuid.uuid4().hex
+
+        self._lock = threading.Lock()
+        self._run_lock = threading.Lock()
+        self._stats = {'runs': 0, 'archived': 0, 'segments': 0, 'vacuumed_pages': 0, 'reads': 0,
+                       'skipped': 0, 'conflicts': 0}
+        self._stop = threading.Event()
+        self._worker = None
+
+    @property
+    def enabled(self):
+        return self.retention_days > 0
+
+    def start(self):
+        """백그라운드 보존 작업을 시작합니다 (retention_days가 0이면 시작하지 않음)."""
+        if self.enabled and self._worker is None:
+            self._worker = threading.Thread(target=self._loop, name='chat-archiver', daemon=True)
+            self._worker.start()
+
+    def _loop(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.run_once()
+            except Exception as e:
+                print(f"대화 보관 오류: {e}")
+
+    def close(self):
+        self._stop.set()
+
+    def run_once(self):
+        """보존 기간이 지난 대화를 모두 보관 계층으로 옮기고 옮긴 행 수를 반환합니다.
+
+        다른 프로세스가 보관 작업 중이면 (임대를 얻지 못하면) 건너뛰고 0을 반환합니다.
+        """
+        with self._run_lock:
+            if not self.db.acquire_archive_lease(self._owner, self.lease_seconds):
+                with self._lock:
+                    self._stats['skipped'] += 1
+                return 0
+
+            moved = 0
+            try:
+                while True:
+                    count = self._archive_batch()
+                    moved += count
+                    if count < self.batch_size or not self.db.acquire_archive_lease(self._owner, self.lease_seconds):
+                        break
+            finally:
+                self.db.release_archive_lease(self._owner)
+
+            vacuumed = self.db.incremental_vacuum(self.vacuum_pages) if moved else 0
+            with self._lock:
+                self._stats['runs'] += 1
+                self._stats['archived'] += moved
+                self._stats['vacuumed_pages'] += vacuumed
+            return moved
+
+    def _archive_batch(self):
+        rows = self.db.get_expired_chats(self.retention_days, self.batch_size)
+        if not rows:
+            return 0
+
+        # 세션별로 묶어 세그먼트 하나에 기록
+        sessions = {}
+        for row in rows:
+            sessions.setdefault(row['session_id'], []).append(row)
+
+        segment = f"{datetime.utcnow().strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:8]}.jsonl.gz"
+        blocks = run_blocking(self._write_segment, segment, sessions)
+        if not self.db.commit_archived(segment, blocks, [row['id'] for row in rows]):
+            # 다른 프로세스가 먼저 보관함: 이 세그먼트는 참조되지 않으므로 삭제
+            run_blocking(os.remove, os.path.join(self.archive_dir, segment))
+            with self._lock:
+                self._stats['conflicts'] += 1
+            return 0
+
+        with self._lock:
+            self._stats['segments'] += 1
+        return len(rows)
+
+    def _write_segment(self, segment, sessions):
+        """세션마다 gzip 멤버 하나씩 기록하고 (세션, 오프셋, 길이, 최소 id, 최대 id, 행 수) 목록을 반환"""
+        os.makedirs(self.archive_dir, exist_ok=True)
+        path = os.path.join(self.archive_dir, segment)
+        tmp_path = path + '.tmp'
+
+        blocks = []
+        with open(tmp_path, 'wb') as f:
+            for session_id, rows in sessions.items():
+                body = ''.join(json.dumps(row, ensure_ascii=False) + '\n' for row in rows).encode('utf-8')
+                data = gzip.compress(body)
+                offset = f.tell()
+                f.write(data)
+                ids = [row['id'] for row in rows]
+                blocks.append((session_id, offset, len(data), min(ids), max(ids), len(rows)))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+        return blocks
+
+    def read(self, session_id, before_id=None, limit=20):
+        """보관된 대화를 최신순으로 limit개까지 반환합니다 (before_id보다 오래된 것만)."""
+        blocks = self.db.get_archive_blocks(session_id, before_id)
+        if not blocks:
+            return []
+
+        with self._lock:
+            self._stats['reads'] += 1
+
+        history = []
+        for segment, offset, length, max_id in blocks:
+            # 블록은 최대 id 내림차순: 이미 모은 상위 limit개보다 모두 오래된 블록이면 중단
+            if len(history) >= limit and max_id < history[limit - 1]['id']:
+                break
+            rows = run_blocking(self._read_block, segment, offset, length)
+            history.extend(
+                {'id': row['id'], 'user': row['user_message'], 'ai': row['ai_response'], 'timestamp': row['timestamp']}
+                for row in rows if before_id is None or row['id'] < before_id
+            )
+            history.sort(key=lambda item: item['id'], reverse=True)
+
+        return history[:limit]
+
+    def _read_block(self, segment, offset, length):
+        with open(os.path.join(self.archive_dir, segment), 'rb') as f:
+            f.seek(offset)
+            data = f.read(length)
+        return [json.loads(line) for line in gzip.decompress(data).decode('utf-8').splitlines() if line]
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+        stats['retention_days'] = self.retention_days
+        return stats
@@ -0,0 +1,193 @@
+import threading
+import time
+from collections import OrderedDict, deque
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+
+class CircuitOpenError(Exception):
+    """회로가 열려 있어 업스트림을 호출하지 않고 바로 실패했을 때 발생"""
+
+
+class CircuitBreaker:
+    """업스트림별 회로 차단기
+
+    최근 window개 호출 중 실패(예외, 5xx)나 slow_call초보다 오래 걸린 호출의
+    비율이 failure_rate 이상이면(최소 min_calls개) 회로를 열고, open_seconds
+    동안은 호출하지 않고 CircuitOpenError로 바로 실패합니다. 그 뒤 한 번의
+    시험 호출(half-open)이 성공하면 닫고, 실패하면 다시 엽니다.
+    failure_rate가 0이면 꺼집니다.
+    """
+
+    def __init__(self, name, failure_rate=0.5, slow_call=5.0, window=20, min_calls=5, open_seconds=30):
+        self.name = name
+        self.failure_rate = failure_rate
+        self.slow_call = slow_call
+        self.min_calls = min_calls
+        self.open_seconds = open_seconds
+
+        self._outcomes = deque(maxlen=window)
+        self._state = CLOSED
+        self._retry_at = 0.0
+        self._probing = False
+        self._lock = threading.Lock()
+        self._recovered = threading.Condition(self._lock)
+        self._stats = {'trips': 0, 'rejected': 0, 'failures': 0, 'slow_calls': 0}
+
+    @property
+    def enabled(self):
+        return self.failure_rate > 0
+
+    def is_open(self):
+        """지금 호출하면 바로 거절되는 상태인지 (시험 호출 시각이 되면 False)"""
+        with self._lock:
+            return (self._state == OPEN and time.monotonic() < self._retry_at) or \
+                (self._state == HALF_OPEN and self._probing)
+
+    def before_call(self):
+        """호출 전에 확인합니다. 열려 있으면 CircuitOpenError"""
+        if not self.enabled:
+            return
+        with self._lock:
+            if self._state == CLOSED:
+                return
+            if self._state == OPEN and time.monotonic() >= self._retry_at:
+                self._state = HALF_OPEN
+            if self._state == HALF_OPEN and not self._probing:
+                # 시험 호출은 한 번에 하나만
+                self._probing = True
+                return
+            self._stats['rejected'] += 1
+            raise CircuitOpenError(f"{self.name}: 회로 열림 ({max(0.0, self._retry_at - time.monotonic()):.0f}s 후 재시도)")
+
+    def record(self, failed, elapsed):
+        """호출 결과를 기록하고 상태를 갱신합니다."""
+        if not self.enabled:
+            return
+        slow = elapsed >= self.slow_call
+        bad = failed or slow
+        with self._lock:
+            if failed:
+                self._stats['failures'] += 1
+            elif slow:
+                self._stats['slow_calls'] += 1
+
+            if self._state == HALF_OPEN:
+                self._probing = False
+                if bad:
+                    self._trip()
+                else:
+                    self._state = CLOSED
+                    self._outcomes.clear()
+                    self._recovered.notify_all()
+                return
+
+            self._outcomes.append(bad)
+            if self._state == CLOSED and len(self._outcomes) >= self.min_calls and \
+                    sum(self._outcomes) / len(self._outcomes) >= self.failure_rate:
+                self._trip()
+
+    def release(self):
+        """결과 없이 끝난 호출(호출 한도 초과 등)의 시험 호출 자리를 돌려줍니다."""
+        with self._lock:
+            if self._state == HALF_OPEN:
+                self._probing = False
+
+    def _trip(self):
+        self._state = OPEN
+        self._retry_at = time.monotonic() + self.open_seconds
+        self._outcomes.clear()
+        self._stats['trips'] += 1
+
+    def wait_retry(self, timeout=None):
+        """시험 호출이 가능하거나 회로가 닫힐 때까지 기다립니다."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._lock:
+            while True:
+                now = time.monotonic()
+                if self._state == CLOSED or (self._state == OPEN and now >= self._retry_at) or \
+                        (self._state == HALF_OPEN and not self._probing):
+                    return True
+                wait = self._retry_at - now if self._state == OPEN else 1.0
+                if deadline is not None:
+                    if now >= deadline:
+                        return False
+                    wait = min(wait, deadline - now)
+                self._recovered.wait(max(wait, 0.01))
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats['state'] = self._state
+            stats['open'] = self._state != CLOSED
+        return stats
+
+
+class StaleRevalidator:
+    """회로가 열린 동안 stale 결과로 응답한 키를 모아 두었다가 업스트림이
+    회복되면 백그라운드에서 하나씩 다시 조회합니다.
+
+    첫 작업이 half-open 시험 호출을 겸하므로 사용자 요청이 시험 호출의 지연을
+    떠안지 않습니다. 같은 키는 한 번만 보관하며 max_pending을 넘으면 새 키는
+    버리고, max_attempts번 실패한 키도 포기합니다.
+    """
+
+    def __init__(self, breaker, max_pending=256, max_attempts=3):
+        self.breaker = breaker
+        self.max_pending = max_pending
+        self.max_attempts = max_attempts
+
+        self._tasks = OrderedDict()
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._worker = None
+        self._stats = {'deferred': 0, 'refreshed': 0, 'failed': 0, 'dropped': 0}
+
+    def defer(self, key, fn):
+        """fn()으로 key를 다시 조회하도록 예약합니다."""
+        with self._lock:
+            if key in self._tasks:
+                return
+            if len(self._tasks) >= self.max_pending:
+                self._stats['dropped'] += 1
+                return
+            self._tasks[key] = (fn, 0)
+            self._stats['deferred'] += 1
+            if self._worker is None:
+                self._worker = threading.Thread(target=self._run, name=f'revalidate-{self.breaker.name}',
+                                                daemon=True)
+                self._worker.start()
+        self._wake.set()
+
+    def _run(self):
+        while True:
+            self._wake.wait()
+            self.breaker.wait_retry()
+            with self._lock:
+                if not self._tasks:
+                    self._wake.clear()
+                    continue
+                key, (fn, attempts) = self._tasks.popitem(last=False)
+
+            try:
+                ok = fn() is not None
+            except Exception:
+                ok = False
+
+            with self._lock:
+                self._stats['refreshed' if ok else 'failed'] += 1
+                if not ok and attempts + 1 < self.max_attempts and len(self._tasks) < self.max_pending:
+                    # 아직 회복되지 않았으면 다음 시험 호출 때 다시 시도
+                    self._tasks.setdefault(key, (fn, attempts + 1))
+
+            if not ok:
+                # 실패가 쌓여 회로가 다시 열리기 전에 연달아 호출하지 않도록 잠시 쉼
+                time.sleep(1.0)
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats['pending'] = len(self._tasks)
+        return stats
@@ -0,0 +1,461 @@
+import os
+import threading
+import time
+
+from circuit import CircuitOpenError
+from geo_cache import ReverseGeocodeCache, PlacesTileCache
+from map_render import MapRenderer, preload_template
+from metrics import timed_method
+from poi_index import load_poi_index
+from prefetch import Prefetcher
+from ranking import rank_places
+from ratelimit import PRIORITY_BACKGROUND, PRIORITY_DEFAULT, RateLimitExceeded
+from singleflight import get_single_flight
+from upstream import get_upstream, reverse_geocode, run_concurrently
+
+# Nearby Search 한 페이지의 최대 결과 수
+PLACES_PAGE_SIZE = 20
+
+# 검색 가능한 장소 타입 (/get_place_types, 두 앱의 검색 요청 검증)
+PLACE_TYPES = [
+    {'value': 'tourist_attraction', 'label': '관광지'},
+    {'value': 'restaurant', 'label': '레스토랑'},
+    {'value': 'hotel', 'label': '호텔'},
+    {'value': 'museum', 'label': '박물관'},
+    {'value': 'park', 'label': '공원'},
+    {'value': 'shopping_mall', 'label': '쇼핑몰'},
+    {'value': 'cafe', 'label': '카페'},
+    {'value': 'bar', 'label': '바'},
+    {'value': 'movie_theater', 'label': '영화관'},
+    {'value': 'amusement_park', 'label': '놀이공원'}
+]
+PLACE_TYPE_VALUES = {place_type['value'] for place_type in PLACE_TYPES}
+
+
+def validate_place_type(place_type):
+    """검색 요청의 장소 타입을 검증해 그대로 반환합니다. 지원하지 않는 값이면 ValueError"""
+    if not isinstance(place_type, str) or place_type not in PLACE_TYPE_VALUES:
+        raise ValueError('지원하지 않는 place_type입니다')
+    return place_type
+
+
+class TravelRecommender:
+    """app.py(지도)와 chat_app.py(채팅)가 함께 쓰는 위치/장소 추천기
+
+    limit은 반환할 장소 수, zoom_start는 지도 확대 수준입니다.
+    sample_when_empty가 True면 반경 안에 장소가 없을 때도 샘플 데이터를
+    반환합니다. SQLite 캐시 연결을 열고 업스트림 클라이언트를 만들므로
+    모듈을 불러올 때가 아니라 lazy_instance로 처음 사용할 때 생성합니다.
+    """
+
+    def __init__(self, limit=10, zoom_start=13, sample_when_empty=False):
+        self.limit = limit
+        self.sample_when_empty = sample_when_empty
+        self.api_key = os.getenv('GOOGLE_PLACES_API_KEY')
+        self.places_api = get_upstream('google_places')
+        self.geocode_cache = ReverseGeocodeCache()
+        self.places_cache = PlacesTileCache()
+        # 같은 셀/타일에 대한 동시 업스트림 호출을 하나로 합침
+        self.geocode_flight = get_single_flight('reverse_geocode')
+        self.places_flight = get_single_flight('google_places')
+        self.map_renderer = MapRenderer(zoom_start=zoom_start)
+
+        # 장소 검색 제공자: google(기본) 또는 offline(로컬 POI 데이터셋)
+        self.provider = os.getenv('PLACES_PROVIDER', 'google')
+        self.poi_index = load_poi_index() if self.provider == 'offline' or not self.api_key else None
+
+        # 전체 페이지 조회 설정 (Nearby Search는 페이지당 20개, 최대 3페이지)
+        self.max_pages = int(os.getenv('PLACES_MAX_PAGES', 3))
+        self.page_token_delay = float(os.getenv('PLACES_PAGE_TOKEN_DELAY', 2.0))
+
+        # 위치 갱신 후 주변 타일/주소를 미리 채우는 백그라운드 프리페처
+        self.prefetcher = Prefetcher(self)
+
+        # 일괄 검색 한 번에 받을 최대 질의 수
+        self.batch_max = int(os.getenv('PLACES_BATCH_MAX', 20))
+
+    @timed_method('geocode.lookup')
+    def get_current_location(self, lat, lng, priority=PRIORITY_DEFAULT):
+        """좌표의 주소 정보를 조회합니다 (캐시 우선, 실패 시 마지막으로 알려진 주소를 stale로 표시)."""
+        location = {
+            'address': self.geocode_cache.get(lat, lng),
+            'latitude': lat,
+            'longitude': lng
+        }
+        if location['address'] is None:
+            try:
+                location['address'] = self.geocode_flight.do(
+                    self.geocode_cache.cell(lat, lng), lambda: self.resolve_address(lat, lng, priority)
+                )
+            except Exception as e:
+                location['address'] = self.geocode_cache.get_stale(lat, lng)
+                if location['address'] is not None:
+                    location['stale'] = True
+                    if not isinstance(e, RateLimitExceeded):
+                        self._revalidate_address(lat, lng)
+                else:
+                    location['address'] = f"위치: {lat}, {lng}"
+
+        return location
+
+    def search_nearby_places(self, lat, lng, radius=5000, place_type='tourist_attraction', priority=PRIORITY_DEFAULT):
+        """주변 장소를 검색합니다."""
+        return self.lookup_nearby_places(lat, lng, radius, place_type, priority)[0]
+
+    def lookup_nearby_places(self, lat, lng, radius=5000, place_type='tourist_attraction', priority=PRIORITY_DEFAULT):
+        """주변 장소를 검색해 (장소 목록, 출처)를 반환합니다.
+
+        출처는 live(업스트림 호출), cache(타일 캐시), stale(호출 한도 초과/오류로
+        만료된 캐시 사용), rate_limited(호출 한도 초과, 캐시 없음), offline, sample 입니다.
+        """
+        return self._lookup(lat, lng, radius, place_type, priority)[:2]
+
+    @timed_method('places.lookup')
+    def _lookup(self, lat, lng, radius, place_type, priority):
+        """(장소 목록, 출처, 타일, 타일 원본 레코드)를 반환합니다.
+
+        타일과 원본 레코드는 Places를 조회한 경우에만 있고 나머지는 None입니다.
+        """
+        if self.provider == 'offline' or not self.api_key:
+            # 오프라인 POI 인덱스 검색, 데이터셋이 없으면 샘플 데이터 반환
+            if self.poi_index is not None:
+                return self.poi_index.query(lat, lng, radius, place_type, limit=self.limit), 'offline', None, None
+            return self.get_sample_places(lat, lng, place_type), 'sample', None, None
+
+        # 같은 타일을 이미 조회했다면 캐시된 원본 결과를 재사용
+        tile = self.places_cache.tile(lat, lng, place_type, radius)
+        results = self.places_cache.get(tile)
+        source = 'cache'
+
+        if results is None:
+            source = 'live'
+            rate_limited = False
+            try:
+                results = self.places_flight.do(tile.key, lambda: self.fetch_tile(tile, place_type, priority))
+            except RateLimitExceeded as e:
+                print(f"Places API 호출 한도 초과: {e}")
+                rate_limited = True
+
+            if results is None:
+                # 샘플 데이터 대신 마지막으로 조회한 타일을 stale로 제공
+                results = self.places_cache.get_stale(tile)
+                if results is not None:
+                    source = 'stale'
+                    if not rate_limited:
+                        # 장애로 stale을 제공한 타일은 업스트림이 회복되면 백그라운드에서 갱신
+                        self.places_api.revalidate(('places',) + tile.key, lambda: self.places_flight.do(
+                            tile.key, lambda: self.fetch_tile(tile, place_type, PRIORITY_BACKGROUND)
+                        ))
+                elif rate_limited:
+                    return [], 'rate_limited', tile, None
+                else:
+                    return self.get_sample_places(lat, lng, place_type), 'sample', tile, None
+
+        # 타일은 요청 반경보다 넓게 조회하므로 반경 밖 장소는 제외하고
+        # 거리순 상위 limit개만 반환
+        places = self._rank(lat, lng, results, radius)
+        if len(places) < self.limit and len(results) >= PLACES_PAGE_SIZE and source != 'stale':
+            # 타일 첫 페이지가 20개로 잘려 반경 안 장소가 모자라면 요청 좌표/반경 그대로 다시 조회
+            exact = self._lookup_exact(lat, lng, radius, place_type, priority)
+            if exact is not None:
+                places = self._rank(lat, lng, exact, radius)
+        if not places and self.sample_when_empty:
+            return self.get_sample_places(lat, lng, place_type), 'sample', tile, results
+        return places, source, tile, results
+
+    @timed_method('places.batch')
+    def search_batch(self, queries, priority=PRIORITY_DEFAULT):
+        """여러 (위도, 경도, 반경, 유형) 질의를 동시에 검색해 질의 순서대로 결과를 반환합니다.
+
+        똑같은 질의는 한 번만, 역지오코딩은 좌표마다 한 번만 실행하고 나머지는
+        공용 실행기에서 동시에 수행합니다. 서로 다른 질의라도 같은 타일/셀로
+        모이면 타일 캐시와 single-flight가 업스트림 호출을 하나로 합칩니다.
+        결과 항목은 location, places, source, stale 입니다.
+        """
+        unique = list(dict.fromkeys(queries))
+        points = list(dict.fromkeys((lat, lng) for lat, lng, _, _ in unique))
+
+        results = run_concurrently(
+            *[lambda q=q: self.lookup_nearby_places(*q, priority=priority) for q in unique],
+            *[lambda p=p: self.get_current_location(*p, priority=priority) for p in points]
+        )
+        searches = dict(zip(unique, results[:len(unique)]))
+        locations = dict(zip(points, results[len(unique):]))
+
+        batch = []
+        for query in queries:
+            places, source = searches[query]
+            batch.append({
+                'location': locations[query[:2]],
+                'places': places,
+                'source': source,
+                'stale': source == 'stale'
+            })
+        return batch
+
+    def stream_nearby_places(self, lat, lng, radius=5000, place_type='tourist_attraction', priority=PRIORITY_DEFAULT):
+        """주변 장소를 모든 페이지(최대 60개)에서 찾아 페이지가 도착할 때마다 yield합니다.
+
+        (장소 목록, 출처, 완료 여부)를 yield합니다. 첫 결과는 lookup_nearby_places와
+        같아서 첫 화면은 기존과 같은 시간에 그려지고, 이후 next_page_token을 따라
+        받은 페이지를 누적해 다시 순위를 매긴 결과가 이어집니다. 첫 페이지의 반경
+        안에 장소가 없어 샘플을 보여 준 경우에도 나머지 페이지를 계속 찾아보고,
+        끝까지 없으면 샘플로 마무리합니다.
+        """
+        places, source, tile, records = self._lookup(lat, lng, radius, place_type, priority)
+        # 샘플이라도 Places 첫 페이지를 받았다면(records) 나머지 페이지에 장소가 있을 수 있음
+        sample = places if source == 'sample' and records is not None else None
+        if source not in ('live', 'cache') and sample is None:
+            yield places, source, True
+            return
+
+        merged = self.places_cache.get_pages(tile)
+        if merged is not None:
+            ranked = self._rank(lat, lng, merged, radius)
+            if ranked or sample is None:
+                places, source = ranked, 'cache'
+            yield places, source, True
+            return
+
+        token = self.places_cache.get_page_token(tile)
+        pages = 1
+
+        while True:
+            if token == '' or pages >= self.max_pages:
+                # 모든 페이지를 받았으면 합친 결과를 캐시
+                self.places_cache.set_pages(tile, records)
+                yield places, source, True
+                return
+
+            yield places, source, False
+
+            try:
+                # 같은 타일을 동시에 스트리밍하는 요청들은 페이지 조회도 하나로 합침
+                data = self.places_flight.do(
+                    (tile.key, token), lambda: self._fetch_page(tile, place_type, token, priority)
+                )
+                if token is None:
+                    # 첫 페이지는 캐시에서 왔지만 토큰이 만료됨: 다시 조회한 첫 페이지와 토큰을
+                    # 캐시에 넣어 다음 스트림은 토큰부터 이어 가도록 함
+                    if data is not None:
+                        self.places_cache.set(tile, data['results'], data.get('next_page_token'))
+                    records = []
+                else:
+                    pages += 1
+            except Exception as e:
+                print(f"다음 페이지 조회 오류: {e}")
+                data = None
+
+            if data is None:
+                # 지금까지 받은 결과로 마무리 (불완전하므로 캐시하지 않음)
+                yield places, source, True
+                return
+
+            records = records + data['results']
+            token = data.get('next_page_token', '')
+            places = self._rank(lat, lng, records, radius)
+            source = 'live'
+            if not places and sample is not None:
+                places, source = sample, 'sample'
+
+    def _lookup_exact(self, lat, lng, radius, place_type, priority):
+        """요청 좌표/반경 그대로 조회한 원본 레코드 (캐시, 실패하면 None)"""
+        tile = self.places_cache.exact_tile(lat, lng, place_type, radius)
+        results = self.places_cache.get(tile)
+        if results is None:
+            try:
+                results = self.places_flight.do(tile.key, lambda: self.fetch_tile(tile, place_type, priority))
+            except RateLimitExceeded as e:
+                print(f"Places API 호출 한도 초과: {e}")
+        return results
+
+    @timed_method('places.rank')
+    def _rank(self, lat, lng, records, radius):
+        """반경 안의 장소를 거리순으로 상위 limit개 선택"""
+        return rank_places(lat, lng, records, limit=self.limit, radius=radius)
+
+    def _revalidate_address(self, lat, lng):
+        """Nominatim 장애로 stale 주소를 제공한 셀을 회복 후 백그라운드에서 갱신합니다."""
+        cell = self.geocode_cache.cell(lat, lng)
+        get_upstream('nominatim').revalidate(('geocode', cell), lambda: self.geocode_flight.do(
+            cell, lambda: self.resolve_address(lat, lng, PRIORITY_BACKGROUND)
+        ))
+
+    @timed_method('geocode.upstream')
+    def resolve_address(self, lat, lng, priority=PRIORITY_DEFAULT):
+        """Nominatim으로 주소를 조회하고 캐시에 저장합니다 (캐시를 거치지 않음, 프리페처도 사용)."""
+        address = reverse_geocode(lat, lng, priority)
+        self.geocode_cache.set(lat, lng, address)
+        return address
+
+    def fetch_tile(self, tile, place_type, priority=PRIORITY_DEFAULT):
+        """타일 하나를 Nearby Search로 조회해 캐시에 저장합니다 (캐시를 거치지 않음, 프리페처도 사용).
+
+        실패하면 None을 반환하고, 호출 한도 초과는 RateLimitExceeded로 전달합니다.
+        """
+        try:
+            data = self._fetch_page(tile, place_type, priority=priority)
+        except RateLimitExceeded:
+            raise
+        except CircuitOpenError:
+            # 회로가 열려 있으면 기다리지 않고 바로 실패 (호출자가 stale 제공)
+            return None
+        except Exception as e:
+            print(f"Places API 오류: {e}")
+            return None
+
+        if data is None:
+            return None
+
+        self.places_cache.set(tile, data['results'], data.get('next_page_token'))
+        return data['results']
+
+    @timed_method('places.upstream')
+    def _fetch_page(self, tile, place_type, page_token=None, priority=PRIORITY_DEFAULT):
+        """Nearby Search 한 페이지를 조회합니다. status가 OK가 아니면 None을 반환합니다.
+
+        next_page_token은 발급 후 잠시 동안 INVALID_REQUEST를 반환하므로
+        PLACES_PAGE_TOKEN_DELAY만큼 기다렸다가 요청하고, 아직 활성화되지 않았으면
+        같은 간격으로 몇 번 더 시도합니다.
+        """
+        if page_token:
+            params = {'pagetoken': page_token, 'key': self.api_key}
+            attempts = 3
+        else:
+            params = {
+                'location': f"{tile.latitude},{tile.longitude}",
+                'radius': tile.radius,
+                'type': place_type,
+                'key': self.api_key
+            }
+            attempts = 1
+
+        for _ in range(attempts):
+            if page_token:
+                time.sleep(self.page_token_delay)
+            response = self.places_api.get('/maps/api/place/nearbysearch/json', params=params, priority=priority)
+            data = response.json()
+            if data['status'] != 'INVALID_REQUEST':
+                break
+
+        if data['status'] != 'OK':
+            return None
+        return data
+
+    def get_sample_places(self, lat, lng, place_type):
+        """API 키와 오프라인 데이터셋이 모두 없을 때의 샘플 여행지 (좌표 주변에 배치)"""
+        return [
+            {
+                'name': '한강공원',
+                'address': '서울특별시 영등포구 여의도동',
+                'rating': 4.5,
+                'types': ['park', 'tourist_attraction'],
+                'latitude': lat + 0.01,
+                'longitude': lng + 0.01,
+                'distance': 1.2
+            },
+            {
+                'name': '남산타워',
+                'address': '서울특별시 용산구 남산공원길',
+                'rating': 4.3,
+                'types': ['tourist_attraction', 'point_of_interest'],
+                'latitude': lat - 0.008,
+                'longitude': lng + 0.005,
+                'distance': 2.1
+            },
+            {
+                'name': '경복궁',
+                'address': '서울특별시 종로구 사직로',
+                'rating': 4.7,
+                'types': ['tourist_attraction', 'museum'],
+                'latitude': lat + 0.015,
+                'longitude': lng - 0.003,
+                'distance': 3.5
+            },
+            {
+                'name': '홍대거리',
+                'address': '서울특별시 마포구 홍대로',
+                'rating': 4.2,
+                'types': ['tourist_attraction', 'shopping'],
+                'latitude': lat - 0.012,
+                'longitude': lng - 0.008,
+                'distance': 4.2
+            },
+            {
+                'name': '동대문디자인플라자',
+                'address': '서울특별시 중구 을지로',
+                'rating': 4.0,
+                'types': ['tourist_attraction', 'shopping'],
+                'latitude': lat + 0.018,
+                'longitude': lng + 0.002,
+                'distance': 5.1
+            }
+        ]
+
+    def create_map(self, current_location, places):
+        """folium 지도를 생성합니다 (렌더 템플릿을 만들지 못했을 때만 사용)."""
+        import folium
+
+        map_obj = folium.Map(
+            location=[current_location['latitude'], current_location['longitude']],
+            zoom_start=self.map_renderer.zoom_start
+        )
+
+        # 현재 위치 마커
+        folium.Marker(
+            [current_location['latitude'], current_location['longitude']],
+            popup=f"현재 위치<br>{current_location['address']}",
+            icon=folium.Icon(color='red', icon='info-sign')
+        ).add_to(map_obj)
+
+        # 추천 장소 마커 (위치 정보가 없는 장소는 제외)
+        for place in places:
+            lat = place.get('latitude')
+            lng = place.get('longitude')
+            if lat is None or lng is None:
+                continue
+            folium.Marker(
+                [lat, lng],
+                popup=f"<b>{place.get('name', '')}</b><br>"
+                      f"주소: {place.get('address', '')}<br>"
+                      f"평점: {place.get('rating', '')}<br>"
+                      f"거리: {place.get('distance', 0):.1f}km",
+                icon=folium.Icon(color='blue', icon='star')
+            ).add_to(map_obj)
+
+        return map_obj
+
+    @timed_method('map.render')
+    def render_map_html(self, current_location, places):
+        """지도 HTML을 반환합니다 (렌더 캐시 사용)."""
+        return self.map_renderer.render(current_location, places, fallback=self.create_map)
+
+
+def lazy_instance(factory):
+    """factory()를 처음 호출될 때 한 번만 실행해 공유하는 접근 함수를 만듭니다.
+
+    SQLite 연결, 백그라운드 스레드, 업스트림 세션은 fork 후에 자식 프로세스로
+    넘어가면 안 되므로 모듈 수준에서 바로 만들지 않고 이 함수로 감쌉니다.
+    """
+    instance = []
+    lock = threading.Lock()
+
+    def get():
+        if not instance:
+            with lock:
+                if not instance:
+                    instance.append(factory())
+        return instance[0]
+    return get
+
+
+def preload():
+    """fork해도 안전한 무거운 준비 작업을 미리 실행합니다.
+
+    folium 불러오기와 지도 템플릿 렌더링, 오프라인 POI 인덱스 로드는 프로세스
+    상태(연결, 스레드)를 만들지 않으므로, preload 후 fork하는 서버에서는 부모
+    프로세스에서 한 번만 실행하고 워커들이 메모리를 공유합니다.
+    """
+    preload_template()
+    if os.getenv('PLACES_PROVIDER', 'google') == 'offline' or not os.getenv('GOOGLE_PLACES_API_KEY'):
+        load_poi_index()
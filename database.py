@@ -0,0 +1,405 @@
+import atexit
+import json
+import os
+import queue
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+from blocking import run_blocking
+from chat_archive import ChatArchive
+from metrics import timed, timed_method
+
+# 스키마 마이그레이션 목록. PRAGMA user_version에 적용된 단계 수를 기록합니다
+MIGRATIONS = [
+    # 1: 세션별 히스토리 조회/키셋 페이지네이션 인덱스, 세션 활동 시각 인덱스
+    [
+        'CREATE INDEX IF NOT EXISTS idx_chat_history_session_id ON chat_history (session_id, id)',
+        'CREATE INDEX IF NOT EXISTS idx_user_sessions_last_activity ON user_sessions (last_activity)',
+    ],
+    # 2: 보관 세그먼트 인덱스, 보존 기간 조회용 인덱스
+    #    (기존 DB의 auto_vacuum 변환은 파일 전체를 다시 쓰므로 마이그레이션이 아니라
+    #    convert_auto_vacuum / python database.py --vacuum 으로 따로 실행합니다)
+    [
+        '''CREATE TABLE IF NOT EXISTS chat_archive_index (
+            session_id TEXT,
+            segment TEXT,
+            byte_offset INTEGER,
+            byte_length INTEGER,
+            min_id INTEGER,
+            max_id INTEGER,
+            row_count INTEGER
+        )''',
+        'CREATE INDEX IF NOT EXISTS idx_chat_archive_index_session ON chat_archive_index (session_id, max_id)',
+        'CREATE INDEX IF NOT EXISTS idx_chat_history_timestamp ON chat_history (timestamp)',
+    ],
+    # 3: 여러 워커 프로세스 중 한 곳에서만 보관 작업을 실행하기 위한 임대(lease)
+    [
+        'CREATE TABLE IF NOT EXISTS chat_archive_lease (name TEXT PRIMARY KEY, owner TEXT, expires_at REAL)',
+    ],
+]
+
+
+class DatabaseManager:
+    """대화 히스토리/세션 저장소
+
+    WAL 모드 연결을 풀에 보관해 요청마다 재사용합니다. write_behind를 켜면
+    대화 저장은 큐에 넣고 바로 반환하며, 백그라운드 작성 스레드가 모인
+    INSERT를 한 트랜잭션으로 묶어 커밋합니다. 보존 기간이 지난 대화는
+    ChatArchive가 압축 세그먼트로 옮기며, 히스토리 조회는 두 계층을 이어서 읽습니다.
+    """
+
+    def __init__(self, db_path=None, write_behind=None):
+        self.db_path = db_path or os.getenv('CHAT_DB_PATH', 'chat_history.db')
+        self._pool = queue.LifoQueue(maxsize=int(os.getenv('CHAT_DB_POOL_SIZE', 8)))
+        self.init_database()
+
+        if write_behind is None:
+            write_behind = os.getenv('CHAT_DB_WRITE_BEHIND', '0') == '1'
+        self.write_behind = write_behind
+        self.batch_size = int(os.getenv('CHAT_DB_BATCH_SIZE', 256))
+
+        if self.write_behind:
+            self._queue = queue.Queue()
+            self._writer = threading.Thread(target=self._writer_loop, name='chat-db-writer', daemon=True)
+            self._writer.start()
+            atexit.register(self.flush)
+
+        self.archive = ChatArchive(self)
+        self.archive.start()
+
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=30, check_same_thread=False)
+        # 새 DB 파일은 처음부터 incremental vacuum 모드로 만듦 (WAL 설정보다 먼저 해야 적용되며,
+        # 이미 테이블이 있는 auto_vacuum=NONE DB에서는 아무 효과가 없음)
+        conn.execute('PRAGMA auto_vacuum = INCREMENTAL')
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        return conn
+
+    @contextmanager
+    def _connection(self):
+        """풀에서 연결을 빌려주고 사용이 끝나면 돌려받습니다."""
+        try:
+            conn = self._pool.get_nowait()
+        except queue.Empty:
+            conn = self._connect()
+
+        try:
+            yield conn
+        finally:
+            if conn.in_transaction:
+                conn.rollback()
+            try:
+                self._pool.put_nowait(conn)
+            except queue.Full:
+                conn.close()
+
+    def _run(self, fn):
+        """풀의 연결로 SQLite 작업 fn(conn)을 실행하고 결과를 반환합니다.
+
+        eventlet 모드에서는 제한된 실행기의 네이티브 스레드에서 실행되어 이벤트
+        루프를 막지 않습니다. fn 안에서는 SQLite 호출만 합니다.
+        """
+        with self._connection() as conn:
+            return run_blocking(fn, conn)
+
+    def init_database(self):
+        """데이터베이스 초기화 (스키마 생성, 마이그레이션, 작은 기존 DB의 auto_vacuum 변환)"""
+        self._run(self._create_schema)
+
+        # 기존 auto_vacuum=NONE DB는 VACUUM으로만 바뀌므로 파일이 작을 때만 시작 시 변환
+        max_bytes = float(os.getenv('CHAT_DB_AUTO_VACUUM_MAX_MB', 16)) * 1024 * 1024
+        if os.path.exists(self.db_path) and os.path.getsize(self.db_path) <= max_bytes:
+            self.convert_auto_vacuum()
+
+    def _create_schema(self, conn):
+        cursor = conn.cursor()
+
+        # 대화 히스토리 테이블
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS chat_history (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                session_id TEXT,
+                user_message TEXT,
+                ai_response TEXT,
+                location_data TEXT,
+                timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
+                intent TEXT,
+                entities TEXT
+            )
+        ''')
+
+        # 사용자 세션 테이블
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS user_sessions (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                session_id TEXT UNIQUE,
+                current_location TEXT,
+                preferences TEXT,
+                created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+                last_activity DATETIME DEFAULT CURRENT_TIMESTAMP
+            )
+        ''')
+
+        conn.commit()
+        self.migrate(conn)
+
+    def migrate(self, conn):
+        """적용되지 않은 스키마 마이그레이션을 순서대로 적용합니다."""
+        version = conn.execute('PRAGMA user_version').fetchone()[0]
+        for step in range(version, len(MIGRATIONS)):
+            for statement in MIGRATIONS[step]:
+                conn.execute(statement)
+            conn.execute(f'PRAGMA user_version = {step + 1}')
+            conn.commit()
+
+    @timed_method('db.save_chat')
+    def save_chat(self, session_id, user_message, ai_response, location_data=None, intent=None, entities=None):
+        """대화 저장"""
+        row = (session_id, user_message, ai_response,
+               json.dumps(location_data) if location_data else None,
+               intent, json.dumps(entities) if entities else None)
+
+        if self.write_behind:
+            self._queue.put(row)
+            return
+
+        def insert(conn):
+            conn.execute('''
+                INSERT INTO chat_history (session_id, user_message, ai_response, location_data, intent, entities)
+                VALUES (?, ?, ?, ?, ?, ?)
+            ''', row)
+            conn.commit()
+        self._run(insert)
+
+    def _writer_loop(self):
+        """큐에 쌓인 대화를 모아 한 번에 커밋합니다."""
+        conn = self._connect()
+        while True:
+            rows = [self._queue.get()]
+            while len(rows) < self.batch_size:
+                try:
+                    rows.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            try:
+                with timed('db.write_batch'):
+                    run_blocking(self._insert_rows, conn, rows)
+            except Exception as e:
+                conn.rollback()
+                print(f"대화 저장 오류: {e}")
+            finally:
+                for _ in rows:
+                    self._queue.task_done()
+
+    @staticmethod
+    def _insert_rows(conn, rows):
+        conn.executemany('''
+            INSERT INTO chat_history (session_id, user_message, ai_response, location_data, intent, entities)
+            VALUES (?, ?, ?, ?, ?, ?)
+        ''', rows)
+        conn.commit()
+
+    def flush(self):
+        """write-behind 큐가 모두 기록될 때까지 기다립니다."""
+        if self.write_behind:
+            self._queue.join()
+
+    def get_chat_history(self, session_id, limit=10):
+        """대화 히스토리 조회"""
+        return self.get_chat_history_page(session_id, limit)['history']
+
+    @timed_method('db.history_page')
+    def get_chat_history_page(self, session_id, limit=20, cursor=None):
+        """대화 히스토리를 최신순으로 한 페이지 조회 (키셋 페이지네이션)
+
+        cursor는 이전 페이지의 next_cursor 값으로, 그 대화보다 오래된
+        대화부터 반환합니다. (session_id, id) 인덱스를 따라 읽으므로
+        OFFSET처럼 앞 페이지를 건너뛰며 스캔하지 않습니다.
+        """
+        query = '''
+            SELECT id, user_message, ai_response, timestamp 
+            FROM chat_history 
+            WHERE session_id = ? {}
+            ORDER BY id DESC 
+            LIMIT ?
+        '''
+        if cursor is None:
+            query, params = query.format(''), (session_id, limit + 1)
+        else:
+            query, params = query.format('AND id < ?'), (session_id, int(cursor), limit + 1)
+
+        rows = self._run(lambda conn: conn.execute(query, params).fetchall())
+
+        items = [{'id': row_id, 'user': msg, 'ai': response, 'timestamp': ts}
+                 for row_id, msg, response, ts in rows]
+        if len(items) <= limit:
+            # 라이브 DB에서 모자라는 만큼 보관 세그먼트에서 이어서 읽음 (보관된 대화의 id가 더 작음)
+            before = items[-1]['id'] if items else cursor
+            items += self.archive.read(session_id, int(before) if before is not None else None,
+                                       limit + 1 - len(items))
+
+        history = items[:limit]
+        next_cursor = history[-1]['id'] if len(items) > limit else None
+        return {'history': history, 'next_cursor': next_cursor}
+
+    def get_expired_chats(self, retention_days, limit):
+        """보존 기간이 지난 대화를 세션, id 순으로 limit개까지 조회"""
+        rows = self._run(lambda conn: conn.execute('''
+            SELECT id, session_id, user_message, ai_response, location_data, timestamp, intent, entities
+            FROM chat_history
+            WHERE timestamp < datetime('now', ?)
+            ORDER BY session_id, id
+            LIMIT ?
+        ''', (f'-{retention_days} days', limit)).fetchall())
+        columns = ('id', 'session_id', 'user_message', 'ai_response', 'location_data', 'timestamp',
+                   'intent', 'entities')
+        return [dict(zip(columns, row)) for row in rows]
+
+    def commit_archived(self, segment, blocks, ids):
+        """세그먼트 블록 인덱스 추가와 보관한 대화 삭제를 한 트랜잭션으로 커밋
+
+        다른 프로세스가 그사이 같은 대화를 먼저 보관해 일부 행이 이미 삭제됐으면
+        아무것도 반영하지 않고 False를 반환합니다 (호출자가 세그먼트를 버림).
+        """
+        def commit(conn):
+            conn.execute('BEGIN IMMEDIATE')
+            deleted = conn.executemany('DELETE FROM chat_history WHERE id = ?', [(row_id,) for row_id in ids]).rowcount
+            if deleted != len(ids):
+                conn.rollback()
+                return False
+            conn.executemany('''
+                INSERT INTO chat_archive_index (session_id, segment, byte_offset, byte_length, min_id, max_id, row_count)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+            ''', [(session_id, segment, offset, length, min_id, max_id, count)
+                  for session_id, offset, length, min_id, max_id, count in blocks])
+            conn.commit()
+            return True
+        return self._run(commit)
+
+    def acquire_archive_lease(self, owner, seconds):
+        """보관 작업 임대를 얻거나 연장합니다. 다른 프로세스의 임대가 유효하면 False"""
+        def acquire(conn):
+            conn.execute('BEGIN IMMEDIATE')
+            now = time.time()
+            row = conn.execute("SELECT owner, expires_at FROM chat_archive_lease WHERE name = 'archive'").fetchone()
+            if row and row[0] != owner and row[1] > now:
+                conn.rollback()
+                return False
+            conn.execute("INSERT OR REPLACE INTO chat_archive_lease (name, owner, expires_at) VALUES ('archive', ?, ?)",
+                         (owner, now + seconds))
+            conn.commit()
+            return True
+        return self._run(acquire)
+
+    def release_archive_lease(self, owner):
+        def release(conn):
+            conn.execute("DELETE FROM chat_archive_lease WHERE name = 'archive' AND owner = ?", (owner,))
+            conn.commit()
+        self._run(release)
+
+    def get_archive_blocks(self, session_id, before_id=None):
+        """세션의 보관 블록 (세그먼트, 오프셋, 길이, 최대 id)을 최대 id 내림차순으로 조회"""
+        query = '''
+            SELECT segment, byte_offset, byte_length, max_id
+            FROM chat_archive_index
+            WHERE session_id = ? {}
+            ORDER BY max_id DESC
+        '''
+        if before_id is None:
+            query, params = query.format(''), (session_id,)
+        else:
+            query, params = query.format('AND min_id < ?'), (session_id, before_id)
+        return self._run(lambda conn: conn.execute(query, params).fetchall())
+
+    def incremental_vacuum(self, pages):
+        """빈 페이지를 최대 pages개 파일 시스템에 반환하고 반환한 페이지 수를 돌려줍니다."""
+        def vacuum(conn):
+            before = conn.execute('PRAGMA freelist_count').fetchone()[0]
+            # execute()는 행을 돌려주지 않는 PRAGMA를 한 단계만 실행하므로 끝까지 실행되는 executescript 사용
+            conn.executescript(f'PRAGMA incremental_vacuum({int(pages)});')
+            return before - conn.execute('PRAGMA freelist_count').fetchone()[0]
+        return self._run(vacuum)
+
+    def convert_auto_vacuum(self):
+        """auto_vacuum=NONE인 기존 DB를 INCREMENTAL로 바꿉니다 (VACUUM으로 파일 전체를 다시 씀).
+
+        큰 DB에서는 오래 걸리고 그동안 쓰기가 막히므로 운영 중에는
+        python database.py --vacuum 으로 점검 시간에 실행합니다. 바꿨으면 True
+        """
+        def convert(conn):
+            if conn.execute('PRAGMA auto_vacuum').fetchone()[0] == 2:
+                return False
+            conn.executescript('PRAGMA auto_vacuum = INCREMENTAL; VACUUM;')
+            return conn.execute('PRAGMA auto_vacuum').fetchone()[0] == 2
+        return self._run(convert)
+
+    @timed_method('db.get_session')
+    def get_session(self, session_id):
+        """세션 위치/환경설정 조회 (없으면 None)"""
+        row = self._run(lambda conn: conn.execute('''
+            SELECT current_location, preferences, last_activity
+            FROM user_sessions WHERE session_id = ?
+        ''', (session_id,)).fetchone())
+        if row is None:
+            return None
+        current_location, preferences, last_activity = row
+        return {
+            'current_location': json.loads(current_location) if current_location else None,
+            'preferences': json.loads(preferences) if preferences else {},
+            'last_activity': last_activity
+        }
+
+    @timed_method('db.upsert_sessions')
+    def upsert_sessions(self, rows):
+        """(session_id, 위치, 환경설정, 마지막 활동 시각) 목록을 한 트랜잭션으로 upsert
+
+        INSERT OR REPLACE는 행을 지웠다 다시 넣어 created_at 등 나머지 컬럼을
+        잃으므로, 이미 있는 세션은 해당 컬럼만 갱신합니다. 여러 프로세스가 같은
+        세션을 들고 있을 때 오래된 사본이 새 값을 덮지 않도록 DB의 마지막 활동
+        시각보다 이전인 행은 건너뜁니다.
+        """
+        params = [(session_id,
+                   json.dumps(location_data) if location_data else None,
+                   json.dumps(preferences) if preferences else None,
+                   last_activity)
+                  for session_id, location_data, preferences, last_activity in rows]
+
+        def upsert(conn):
+            conn.executemany('''
+                INSERT INTO user_sessions (session_id, current_location, preferences, last_activity)
+                VALUES (?, ?, ?, COALESCE(?, CURRENT_TIMESTAMP))
+                ON CONFLICT(session_id) DO UPDATE SET
+                    current_location = excluded.current_location,
+                    preferences = excluded.preferences,
+                    last_activity = excluded.last_activity
+                WHERE user_sessions.last_activity IS NULL
+                   OR excluded.last_activity >= user_sessions.last_activity
+            ''', params)
+            conn.commit()
+        self._run(upsert)
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='대화 DB 점검 작업')
+    parser.add_argument('--db', help='DB 경로 (기본: CHAT_DB_PATH)')
+    parser.add_argument('--vacuum', action='store_true',
+                        help='기존 DB를 incremental vacuum 모드로 변환 (VACUUM 한 번, 점검 시간에 실행)')
+    args = parser.parse_args()
+
+    if args.vacuum:
+        # 시작 시 자동 변환과 보관 작업은 끄고 변환만 실행
+        os.environ['CHAT_DB_AUTO_VACUUM_MAX_MB'] = '0'
+        os.environ['CHAT_RETENTION_DAYS'] = '0'
+        db = DatabaseManager(args.db)
+        size = os.path.getsize(db.db_path)
+        converted = db.convert_auto_vacuum()
+        print(f"{db.db_path}: {'변환 완료' if converted else '이미 incremental 모드'} "
+              f"({size / 1024 / 1024:.1f}MB -> {os.path.getsize(db.db_path) / 1024 / 1024:.1f}MB)")
+    else:
+        parser.print_help()
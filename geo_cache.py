@@ -0,0 +1,378 @@
+import math
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict, namedtuple
+
+from blocking import run_blocking
+
+_GEOHASH_BASE32 = '0123456789bcdefghjkmnpqrstuvwxyz'
+
+
+def geohash_encode(lat, lng, precision=7):
+    """위도/경도를 geohash 문자열로 변환합니다."""
+    lat_range = [-90.0, 90.0]
+    lng_range = [-180.0, 180.0]
+    chars = []
+    bits = 0
+    bit_count = 0
+    even = True
+
+    while len(chars) < precision:
+        if even:
+            mid = (lng_range[0] + lng_range[1]) / 2
+            if lng >= mid:
+                bits = (bits << 1) | 1
+                lng_range[0] = mid
+            else:
+                bits <<= 1
+                lng_range[1] = mid
+        else:
+            mid = (lat_range[0] + lat_range[1]) / 2
+            if lat >= mid:
+                bits = (bits << 1) | 1
+                lat_range[0] = mid
+            else:
+                bits <<= 1
+                lat_range[1] = mid
+        even = not even
+        bit_count += 1
+
+        if bit_count == 5:
+            chars.append(_GEOHASH_BASE32[bits])
+            bits = 0
+            bit_count = 0
+
+    return ''.join(chars)
+
+
+def geohash_decode(geohash):
+    """geohash 셀의 중심 좌표와 위도/경도 방향 반폭을 반환합니다."""
+    lat_range = [-90.0, 90.0]
+    lng_range = [-180.0, 180.0]
+    even = True
+
+    for char in geohash:
+        value = _GEOHASH_BASE32.index(char)
+        for shift in range(4, -1, -1):
+            bit = (value >> shift) & 1
+            target = lng_range if even else lat_range
+            mid = (target[0] + target[1]) / 2
+            if bit:
+                target[0] = mid
+            else:
+                target[1] = mid
+            even = not even
+
+    lat = (lat_range[0] + lat_range[1]) / 2
+    lng = (lng_range[0] + lng_range[1]) / 2
+    return lat, lng, (lat_range[1] - lat_range[0]) / 2, (lng_range[1] - lng_range[0]) / 2
+
+
+def geohash_neighbors(geohash):
+    """geohash 셀을 둘러싼 이웃 셀 8개 (경도는 날짜변경선을 넘어 순환, 극 너머는 제외)"""
+    lat, lng, lat_err, lng_err = geohash_decode(geohash)
+    neighbors = []
+    for dlat in (-1, 0, 1):
+        for dlng in (-1, 0, 1):
+            if not dlat and not dlng:
+                continue
+            neighbor_lat = lat + dlat * 2 * lat_err
+            if not -90.0 < neighbor_lat < 90.0:
+                continue
+            neighbor_lng = (lng + dlng * 2 * lng_err + 180.0) % 360.0 - 180.0
+            neighbors.append(geohash_encode(neighbor_lat, neighbor_lng, len(geohash)))
+    return neighbors
+
+
+class LRUCache:
+    """TTL을 지원하는 스레드 안전 LRU 캐시"""
+
+    def __init__(self, maxsize=1024, ttl=None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """키에 해당하는 값을 반환합니다. 없거나 만료되었으면 None"""
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at is not None and expires_at < time.time():
+                # 만료된 항목은 LRU로 밀려날 때까지 get_stale용으로 남겨 둡니다
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def get_stale(self, key):
+        """만료 여부와 관계없이 마지막으로 저장된 값을 반환합니다."""
+        with self._lock:
+            entry = self._data.get(key)
+            return entry[0] if entry is not None else None
+
+    def set(self, key, value, ttl=None):
+        """값을 저장하고 용량을 넘으면 가장 오래된 항목을 제거합니다."""
+        ttl = self.ttl if ttl is None else ttl
+        expires_at = time.time() + ttl if ttl else None
+        with self._lock:
+            self._data[key] = (value, expires_at)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+class ReverseGeocodeCache:
+    """역지오코딩 결과 캐시 (메모리 LRU + SQLite TTL 2단계)
+
+    좌표를 geohash 셀 단위로 묶어 같은 셀 안의 요청은 한 번의
+    Nominatim 호출 결과를 공유합니다. 만료된 항목도 Nominatim 장애 때 stale로
+    제공할 수 있도록 stale_max_age 동안 남겨 두고, 그보다 오래된 SQLite 항목은
+    백그라운드 스레드가 purge_interval마다 삭제합니다.
+    """
+
+    def __init__(self, db_path=None, precision=None, ttl=None, maxsize=None, stale_max_age=None,
+                 purge_interval=None):
+        self.db_path = db_path or os.getenv('GEOCODE_CACHE_DB', 'geocode_cache.db')
+        self.precision = int(precision or os.getenv('GEOCODE_CACHE_PRECISION', 7))
+        self.ttl = int(ttl or os.getenv('GEOCODE_CACHE_TTL', 7 * 24 * 3600))
+        self.stale_max_age = int(stale_max_age if stale_max_age is not None
+                                 else os.getenv('GEOCODE_CACHE_STALE_MAX_AGE', 30 * 24 * 3600))
+        self.purge_interval = float(purge_interval if purge_interval is not None
+                                    else os.getenv('GEOCODE_CACHE_PURGE_INTERVAL', 3600))
+        self.memory = LRUCache(int(maxsize or os.getenv('GEOCODE_CACHE_SIZE', 4096)), self.ttl)
+
+        self._lock = threading.Lock()
+        self._stats = {'memory_hits': 0, 'db_hits': 0, 'misses': 0, 'stale_hits': 0}
+        self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        self._conn.execute('''
+            CREATE TABLE IF NOT EXISTS reverse_geocode (
+                cell TEXT PRIMARY KEY,
+                address TEXT,
+                expires_at REAL
+            )
+        ''')
+        self._conn.commit()
+
+        self._stop = threading.Event()
+        if self.purge_interval > 0:
+            threading.Thread(target=self._purge_loop, name='geocode-cache-purge', daemon=True).start()
+
+    def cell(self, lat, lng):
+        """좌표가 속한 캐시 셀 키"""
+        return geohash_encode(lat, lng, self.precision)
+
+    def get(self, lat, lng):
+        """캐시된 주소를 반환합니다. 없으면 None"""
+        cell = self.cell(lat, lng)
+
+        address = self.memory.get(cell)
+        if address is not None:
+            self._count('memory_hits')
+            return address
+
+        with self._lock:
+            row = run_blocking(lambda: self._conn.execute(
+                'SELECT address, expires_at FROM reverse_geocode WHERE cell = ?', (cell,)
+            ).fetchone())
+
+        if row and row[1] > time.time():
+            # 남은 TTL만큼만 메모리에 올립니다
+            self.memory.set(cell, row[0], ttl=row[1] - time.time())
+            self._count('db_hits')
+            return row[0]
+
+        self._count('misses')
+        return None
+
+    def contains(self, lat, lng):
+        """유효한 캐시 항목이 있는지 확인합니다 (히트/미스 통계에 포함하지 않음)."""
+        cell = self.cell(lat, lng)
+        if self.memory.get(cell) is not None:
+            return True
+        with self._lock:
+            row = run_blocking(lambda: self._conn.execute(
+                'SELECT 1 FROM reverse_geocode WHERE cell = ? AND expires_at > ?', (cell, time.time())
+            ).fetchone())
+        return row is not None
+
+    def get_stale(self, lat, lng):
+        """만료된 항목까지 포함해 마지막으로 알려진 주소를 반환합니다. 없으면 None"""
+        cell = self.cell(lat, lng)
+        address = self.memory.get_stale(cell)
+        if address is None:
+            with self._lock:
+                row = run_blocking(lambda: self._conn.execute(
+                    'SELECT address FROM reverse_geocode WHERE cell = ?', (cell,)
+                ).fetchone())
+            address = row[0] if row else None
+
+        if address is not None:
+            self._count('stale_hits')
+        return address
+
+    def set(self, lat, lng, address):
+        """주소를 두 단계 캐시에 모두 저장합니다."""
+        cell = self.cell(lat, lng)
+        self.memory.set(cell, address)
+
+        expires_at = time.time() + self.ttl
+        with self._lock:
+            run_blocking(self._write,
+                         'INSERT OR REPLACE INTO reverse_geocode (cell, address, expires_at) VALUES (?, ?, ?)',
+                         (cell, address, expires_at))
+
+    def purge_expired(self):
+        """만료된 뒤 stale_max_age가 지나 stale로도 쓰지 않는 SQLite 항목을 삭제합니다."""
+        with self._lock:
+            run_blocking(self._write, 'DELETE FROM reverse_geocode WHERE expires_at <= ?',
+                         (time.time() - self.stale_max_age,))
+
+    def _purge_loop(self):
+        while not self._stop.wait(self.purge_interval):
+            try:
+                self.purge_expired()
+            except Exception as e:
+                print(f"역지오코딩 캐시 정리 오류: {e}")
+
+    def close(self):
+        self._stop.set()
+
+    def _write(self, sql, params):
+        # eventlet 모드에서는 네이티브 스레드에서 실행됨 (SQLite 호출만)
+        self._conn.execute(sql, params)
+        self._conn.commit()
+
+    def _count(self, name):
+        with self._lock:
+            self._stats[name] += 1
+
+    def stats(self):
+        """히트/미스 카운터"""
+        with self._lock:
+            stats = dict(self._stats)
+        lookups = stats['memory_hits'] + stats['db_hits'] + stats['misses']
+        stats['hit_rate'] = (lookups - stats['misses']) / lookups if lookups else 0.0
+        stats['memory_size'] = len(self.memory)
+        stats['precision'] = self.precision
+        return stats
+
+
+# Nearby Search 반경 버킷 (미터). 이웃 버킷 간격을 1.5배 이하로 두어 조회 반경이 요청 반경보다
+# 크게 넓어지지 않게 합니다 (1~50km 정수 반경은 대부분 버킷과 같거나 1.3배 이내). 최대 반경은 50km
+RADIUS_BUCKETS = (500, 750, 1000, 1500, 2000, 2500, 3000, 4000, 5000, 6000, 8000, 10000, 12500, 15000,
+                  20000, 25000, 30000, 40000, 50000)
+MAX_PLACES_RADIUS = 50000
+
+PlacesTile = namedtuple('PlacesTile', ['key', 'latitude', 'longitude', 'radius'])
+
+
+class PlacesTileCache:
+    """Nearby Search 원본 결과를 (geohash 셀, place_type, 반경 버킷) 타일 단위로 캐시
+
+    타일은 셀 중심에서 "버킷 반경 + 셀 반대각선" 반경으로 한 번 조회합니다.
+    그러면 셀 안의 어느 지점에서 버킷 이하 반경으로 검색하더라도 검색 원이
+    타일 조회 범위 안에 들어가므로, 캐시된 원본 레코드를 거리로 필터링하고
+    다시 정렬하는 것만으로 응답할 수 있습니다.
+
+    Nearby Search는 한 페이지에 20개까지만 돌려주므로 조회 범위가 넓을수록 요청
+    반경 안에 남는 장소가 줄어듭니다. 셀 정밀도는 버킷마다 셀 반대각선이 버킷
+    반경의 cell_ratio 이하가 되는 가장 큰 셀로 정합니다.
+    """
+
+    def __init__(self, cell_ratio=None, ttl=None, maxsize=None):
+        self.cell_ratio = float(cell_ratio or os.getenv('PLACES_CACHE_CELL_RATIO', 0.25))
+        self.precisions = {bucket: _cell_precision(bucket * self.cell_ratio) for bucket in RADIUS_BUCKETS}
+        self.ttl = int(ttl or os.getenv('PLACES_CACHE_TTL', 3600))
+        self.memory = LRUCache(int(maxsize or os.getenv('PLACES_CACHE_SIZE', 2048)), self.ttl)
+        # 첫 페이지의 next_page_token은 발급 후 몇 분 안에 만료되므로 짧게 보관
+        self.page_tokens = LRUCache(self.memory.maxsize, int(os.getenv('PLACES_PAGE_TOKEN_TTL', 120)))
+
+        self._lock = threading.Lock()
+        self._stats = {'hits': 0, 'misses': 0, 'stale_hits': 0, 'page_hits': 0, 'page_misses': 0}
+
+    def tile(self, lat, lng, place_type, radius):
+        """검색 조건이 속한 타일과 타일 조회 파라미터를 계산합니다."""
+        bucket = next((b for b in RADIUS_BUCKETS if b >= radius), MAX_PLACES_RADIUS)
+        cell = geohash_encode(lat, lng, self.precisions[bucket])
+
+        center_lat, center_lng, lat_err, lng_err = geohash_decode(cell)
+        half_height = lat_err * 111320
+        half_width = lng_err * 111320 * math.cos(math.radians(center_lat))
+        fetch_radius = min(bucket + math.hypot(half_height, half_width), MAX_PLACES_RADIUS)
+
+        return PlacesTile((cell, place_type, bucket), center_lat, center_lng, int(math.ceil(fetch_radius)))
+
+    def exact_tile(self, lat, lng, place_type, radius):
+        """요청 좌표와 반경 그대로 조회하는 타일 (타일 결과가 20개 제한으로 잘렸을 때 사용)"""
+        return PlacesTile(('exact', round(lat, 6), round(lng, 6), place_type, radius), lat, lng, radius)
+
+    def get(self, tile):
+        """타일의 원본 레코드 목록을 반환합니다. 없으면 None"""
+        records = self.memory.get(tile.key)
+        self._count('hits' if records is not None else 'misses')
+        return records
+
+    def contains(self, tile):
+        """유효한 타일이 있는지 확인합니다 (히트/미스 통계에 포함하지 않음)."""
+        return self.memory.get(tile.key) is not None
+
+    def get_stale(self, tile):
+        """만료된 타일까지 포함해 마지막으로 조회한 레코드 목록을 반환합니다. 없으면 None"""
+        records = self.memory.get_stale(tile.key)
+        if records is not None:
+            self._count('stale_hits')
+        return records
+
+    def set(self, tile, records, next_page_token=None):
+        self.memory.set(tile.key, records)
+        self.page_tokens.set(tile.key, next_page_token or '')
+
+    def get_page_token(self, tile):
+        """첫 페이지의 next_page_token. 다음 페이지가 없으면 '', 토큰이 만료되었으면 None"""
+        return self.page_tokens.get(tile.key)
+
+    def get_pages(self, tile):
+        """모든 페이지를 합친 레코드 목록을 반환합니다. 없으면 None"""
+        records = self.memory.get(tile.key + ('pages',))
+        self._count('page_hits' if records is not None else 'page_misses')
+        return records
+
+    def set_pages(self, tile, records):
+        self.memory.set(tile.key + ('pages',), records)
+
+    def _count(self, name):
+        with self._lock:
+            self._stats[name] += 1
+
+    def stats(self):
+        """히트/미스 카운터"""
+        with self._lock:
+            stats = dict(self._stats)
+        lookups = stats['hits'] + stats['misses']
+        stats['hit_rate'] = stats['hits'] / lookups if lookups else 0.0
+        stats['tiles'] = len(self.memory)
+        stats['cell_ratio'] = self.cell_ratio
+        return stats
+
+
+def _cell_precision(max_half_diagonal):
+    """셀 반대각선(적도 기준, 미터)이 max_half_diagonal 이하인 가장 낮은 geohash 정밀도 (최대 9)"""
+    for precision in range(1, 10):
+        lat_bits = precision * 5 // 2
+        lng_bits = precision * 5 - lat_bits
+        half_height = 90.0 / 2 ** lat_bits * 111320
+        half_width = 180.0 / 2 ** lng_bits * 111320
+        if math.hypot(half_height, half_width) <= max_half_diagonal:
+            return precision
+    return 9
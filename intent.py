@@ -0,0 +1,129 @@
+import json
+import os
+from collections import deque
+
+# 설정 파일이 없거나 어떤 의도에도 해당하지 않을 때의 응답
+DEFAULT_RESPONSE = '안녕하세요! 여행지 추천을 도와드릴게요. 어떤 종류의 장소를 찾고 계신가요? (맛집, 관광지, 호텔 등)'
+
+
+class AhoCorasick:
+    """여러 키워드를 한 번의 순회로 찾는 Aho-Corasick 오토마톤
+
+    키워드마다 payload를 붙여 등록하면 search가 본문을 한 글자씩 한 번만 읽으며
+    겹치는 매치까지 모두 (시작 위치, 끝 위치, payload)로 반환합니다. 검색 시간은
+    키워드 수와 관계없이 본문 길이 + 매치 수에 비례합니다.
+    """
+
+    def __init__(self, keywords=()):
+        self._goto = [{}]
+        self._fail = [0]
+        self._out = [[]]
+        for keyword, payload in keywords:
+            self.add(keyword, payload)
+        self.build()
+
+    def add(self, keyword, payload):
+        if not keyword:
+            return
+        node = 0
+        for ch in keyword:
+            nxt = self._goto[node].get(ch)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto[node][ch] = nxt
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append([])
+            node = nxt
+        self._out[node].append((len(keyword), payload))
+
+    def build(self):
+        """BFS로 실패 링크를 만들고 실패 노드의 출력을 합칩니다."""
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for ch, nxt in self._goto[node].items():
+                queue.append(nxt)
+                fail = self._fail[node]
+                while fail and ch not in self._goto[fail]:
+                    fail = self._fail[fail]
+                # 루트의 자식은 항상 루트로 실패
+                self._fail[nxt] = self._goto[fail].get(ch, 0) if node else 0
+                self._out[nxt] = self._out[nxt] + self._out[self._fail[nxt]]
+
+    def search(self, text):
+        goto, fail, out = self._goto, self._fail, self._out
+        matches = []
+        node = 0
+        for i, ch in enumerate(text):
+            while node and ch not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(ch, 0)
+            for length, payload in out[node]:
+                matches.append((i + 1 - length, i + 1, payload))
+        return matches
+
+    def __len__(self):
+        return len(self._goto)
+
+
+class IntentMatcher:
+    """설정 파일 기반 의도/엔티티 분류기
+
+    모든 의도 키워드와 엔티티 동의어를 오토마톤 하나로 컴파일해 두고,
+    메시지를 한 번만 순회해 의도(키워드가 가장 많이 나온 의도, 같으면 설정 순서)와
+    엔티티({유형: [대표값, ...]})를 함께 뽑습니다.
+    """
+
+    def __init__(self, config=None):
+        config = config or {}
+        self.intents = config.get('intents', {})
+        self.default_response = config.get('default_response', DEFAULT_RESPONSE)
+        self._order = {name: i for i, name in enumerate(self.intents)}
+
+        keywords = []
+        for name, spec in self.intents.items():
+            for keyword in spec.get('keywords', []):
+                keywords.append((keyword.lower(), ('intent', name)))
+        for entity_type, values in config.get('entities', {}).items():
+            for value, synonyms in values.items():
+                for synonym in [value] + list(synonyms):
+                    keywords.append((synonym.lower(), (entity_type, value)))
+        self.automaton = AhoCorasick(keywords)
+
+    @classmethod
+    def load(cls, path):
+        with open(path, encoding='utf-8') as f:
+            return cls(json.load(f))
+
+    def classify(self, text):
+        """메시지의 의도와 엔티티를 반환합니다. 해당 의도가 없으면 intent는 None"""
+        scores = {}
+        entities = {}
+        for _, _, (kind, value) in self.automaton.search((text or '').lower()):
+            if kind == 'intent':
+                scores[value] = scores.get(value, 0) + 1
+            else:
+                values = entities.setdefault(kind, [])
+                if value not in values:
+                    values.append(value)
+
+        intent = None
+        if scores:
+            intent = min(scores, key=lambda name: (-scores[name], self._order[name]))
+        return {'intent': intent, 'entities': entities}
+
+    def response(self, intent):
+        """의도에 해당하는 기본 응답 문구"""
+        spec = self.intents.get(intent) or {}
+        return spec.get('response', self.default_response)
+
+
+def load_intent_matcher(path=None):
+    """INTENT_CONFIG_PATH 설정 파일로 분류기를 만듭니다. 읽지 못하면 빈 분류기"""
+    path = path or os.getenv('INTENT_CONFIG_PATH', os.path.join(os.path.dirname(__file__), 'data', 'intents.json'))
+    try:
+        return IntentMatcher.load(path)
+    except Exception as e:
+        print(f"의도 설정 로드 오류: {e}")
+        return IntentMatcher()
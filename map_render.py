@@ -0,0 +1,299 @@
+import gzip
+import hashlib
+import html
+import json
+import os
+import re
+import threading
+from collections import OrderedDict
+
+from metrics import timed_method
+
+
+def _point_feature(lat, lng, properties):
+    return {
+        'type': 'Feature',
+        'geometry': {'type': 'Point', 'coordinates': [round(lng, 6), round(lat, 6)]},
+        'properties': properties
+    }
+
+
+@timed_method('map.geojson')
+def places_geojson(current_location, places):
+    """현재 위치와 장소 목록을 지도 마커용 GeoJSON FeatureCollection으로 변환합니다.
+
+    folium HTML 대신 이 페이로드만 내려보내면 브라우저는 Leaflet 지도를 한 번만
+    만들고 마커만 갱신합니다.
+    """
+    features = [_point_feature(
+        current_location['latitude'],
+        current_location['longitude'],
+        {'kind': 'current', 'address': current_location.get('address', '')}
+    )]
+
+    for place in places:
+        lat = place.get('latitude')
+        lng = place.get('longitude')
+        if lat is None or lng is None:
+            continue  # 위치 정보가 없으면 마커 추가하지 않음
+        features.append(_point_feature(lat, lng, {
+            'kind': 'place',
+            'name': place.get('name', ''),
+            'address': place.get('address', ''),
+            'rating': place.get('rating', 0),
+            'distance': round(place.get('distance', 0), 2)
+        }))
+
+    return {'type': 'FeatureCollection', 'features': features}
+
+
+@timed_method('map.geojson')
+def itinerary_geojson(stops):
+    """여러 정류지의 (현재 위치, 장소 목록)을 하나의 GeoJSON FeatureCollection으로 합칩니다.
+
+    정류지 마커는 kind='stop'과 순서(index)를, 장소 마커는 그 장소가 검색된
+    정류지 번호 목록(stops)을 가집니다. 여러 정류지에서 검색된 같은 장소는
+    마커 하나로 합칩니다.
+    """
+    features = []
+    places_by_key = {}
+
+    for index, (location, places) in enumerate(stops):
+        features.append(_point_feature(location['latitude'], location['longitude'], {
+            'kind': 'stop',
+            'index': index,
+            'address': location.get('address', '')
+        }))
+
+        for place in places:
+            lat = place.get('latitude')
+            lng = place.get('longitude')
+            if lat is None or lng is None:
+                continue
+            key = (place.get('name', ''), round(lat, 6), round(lng, 6))
+            feature = places_by_key.get(key)
+            if feature is None:
+                feature = places_by_key[key] = _point_feature(lat, lng, {
+                    'kind': 'place',
+                    'name': place.get('name', ''),
+                    'address': place.get('address', ''),
+                    'rating': place.get('rating', 0),
+                    'stops': []
+                })
+            if index not in feature['properties']['stops']:
+                feature['properties']['stops'].append(index)
+
+    return {'type': 'FeatureCollection', 'features': features + list(places_by_key.values())}
+
+
+# 템플릿 추출에 쓰는 표식 값 (실제 좌표/줌과 겹치지 않는 값)
+_SENTINEL_CENTER = [11.123456, 22.654321]
+_SENTINEL_ZOOM = 17
+
+_template = None
+_template_ready = False
+_template_lock = threading.Lock()
+
+_CURRENT_ICON = {'extraClasses': 'fa-rotate-0', 'icon': 'info-sign', 'iconColor': 'white',
+                 'markerColor': 'red', 'prefix': 'glyphicon'}
+_PLACE_ICON = {'extraClasses': 'fa-rotate-0', 'icon': 'star', 'iconColor': 'white',
+               'markerColor': 'blue', 'prefix': 'glyphicon'}
+
+
+class MapRenderCache:
+    """렌더링된 지도 HTML 캐시 (바이트 크기 제한 메모리 LRU + 선택적 gzip 디스크 계층)"""
+
+    def __init__(self, max_bytes=None, disk_dir=None):
+        self.max_bytes = int(max_bytes or os.getenv('MAP_CACHE_MAX_BYTES', 32 * 1024 * 1024))
+        self.disk_dir = disk_dir or os.getenv('MAP_CACHE_DIR')
+        if self.disk_dir:
+            os.makedirs(self.disk_dir, exist_ok=True)
+
+        self._data = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._stats = {'memory_hits': 0, 'disk_hits': 0, 'misses': 0}
+
+    def get(self, key):
+        with self._lock:
+            html = self._data.get(key)
+            if html is not None:
+                self._data.move_to_end(key)
+                self._stats['memory_hits'] += 1
+                return html
+
+        html = self._read_disk(key)
+        with self._lock:
+            self._stats['disk_hits' if html is not None else 'misses'] += 1
+        if html is not None:
+            self._set_memory(key, html)
+        return html
+
+    def set(self, key, html):
+        self._set_memory(key, html)
+        if self.disk_dir:
+            path = os.path.join(self.disk_dir, f'{key}.html.gz')
+            tmp_path = f'{path}.{threading.get_ident()}.tmp'
+            with gzip.open(tmp_path, 'wt', encoding='utf-8') as f:
+                f.write(html)
+            os.replace(tmp_path, path)
+
+    def _set_memory(self, key, html):
+        size = len(html)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            previous = self._data.pop(key, None)
+            if previous is not None:
+                self._bytes -= len(previous)
+            self._data[key] = html
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                _, evicted = self._data.popitem(last=False)
+                self._bytes -= len(evicted)
+
+    def _read_disk(self, key):
+        if not self.disk_dir:
+            return None
+        try:
+            with gzip.open(os.path.join(self.disk_dir, f'{key}.html.gz'), 'rt', encoding='utf-8') as f:
+                return f.read()
+        except (OSError, EOFError):
+            return None
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats['entries'] = len(self._data)
+            stats['bytes'] = self._bytes
+        return stats
+
+
+class MapRenderer:
+    """folium 지도 HTML 렌더러
+
+    처음 렌더링할 때(또는 preload_template 호출 시) 빈 folium 지도를 한 번
+    렌더링해 Leaflet/folium 기본 문서를 이스케이프된 조각으로 만들어 프로세스
+    전체에서 공유하고, 요청마다 중심 좌표·줌과 마커 스크립트만 끼워 넣습니다.
+    결과는 (중심, 줌, 장소 목록) 내용 해시로 MapRenderCache에 저장합니다.
+    folium 출력 형식이 달라 템플릿을 만들지 못하면 folium으로 직접 렌더링합니다.
+    """
+
+    def __init__(self, zoom_start=13, cache=None):
+        self.zoom_start = zoom_start
+        self.cache = cache or MapRenderCache()
+
+    @property
+    def _template(self):
+        return preload_template()
+
+    @staticmethod
+    def _build_template():
+        import folium
+
+        map_obj = folium.Map(location=_SENTINEL_CENTER, zoom_start=_SENTINEL_ZOOM)
+        document = map_obj.get_root().render()
+
+        map_var = re.search(r'var (map_[0-9a-f]+) = L\.map\(', document)
+        center_text = f'center: {_SENTINEL_CENTER},'
+        zoom_text = f'zoom: {_SENTINEL_ZOOM},'
+        script_end = document.rfind('</script>')
+        if not map_var or document.count(center_text) != 1 or document.count(zoom_text) != 1 or script_end < 0:
+            print("지도 템플릿 생성 실패: folium 렌더링으로 대체합니다")
+            return None
+
+        head, rest = document.split(center_text)
+        middle, rest = rest.split(zoom_text)
+        body, tail = rest[:rest.rfind('</script>')], rest[rest.rfind('</script>'):]
+
+        iframe_head, iframe_tail = map_obj._repr_html_().split(html.escape(document))
+        return {
+            'map_var': map_var.group(1),
+            'head': iframe_head + html.escape(head),
+            'middle': html.escape(middle),
+            'body': html.escape(body),
+            'tail': html.escape(tail) + iframe_tail,
+        }
+
+    def cache_key(self, current_location, places):
+        """중심(반올림), 줌, 마커 내용으로 만든 캐시 키"""
+        payload = [
+            round(current_location['latitude'], 5),
+            round(current_location['longitude'], 5),
+            self.zoom_start,
+            current_location.get('address', ''),
+            [
+                [place.get('name', ''), place.get('address', ''), place.get('rating', ''),
+                 round(place['latitude'], 6), round(place['longitude'], 6),
+                 f"{place.get('distance', 0):.1f}"]
+                for place in places
+                if place.get('latitude') is not None and place.get('longitude') is not None
+            ]
+        ]
+        return hashlib.sha256(json.dumps(payload, ensure_ascii=False).encode('utf-8')).hexdigest()
+
+    def render(self, current_location, places, fallback=None):
+        """지도 HTML(iframe)을 반환합니다. fallback은 템플릿이 없을 때 folium.Map을 만드는 함수"""
+        key = self.cache_key(current_location, places)
+        cached = self.cache.get(key)
+        if cached is not None:
+            return cached
+
+        if self._template is None:
+            rendered = fallback(current_location, places)._repr_html_()
+        else:
+            rendered = self._splice(current_location, places)
+
+        self.cache.set(key, rendered)
+        return rendered
+
+    def _splice(self, current_location, places):
+        template = self._template
+        center = [round(current_location['latitude'], 5), round(current_location['longitude'], 5)]
+
+        markers = [self._marker_js(0, center, f"현재 위치<br>{current_location.get('address', '')}", _CURRENT_ICON)]
+        for place in places:
+            lat = place.get('latitude')
+            lng = place.get('longitude')
+            if lat is None or lng is None:
+                continue  # 위치 정보가 없으면 마커 추가하지 않음
+            popup = (f"<b>{place.get('name', '')}</b><br>주소: {place.get('address', '')}<br>"
+                     f"평점: {place.get('rating', '')}<br>거리: {place.get('distance', 0):.1f}km")
+            markers.append(self._marker_js(len(markers), [lat, lng], popup, _PLACE_ICON))
+
+        return ''.join([
+            template['head'],
+            html.escape(f'center: {center},'),
+            template['middle'],
+            html.escape(f'zoom: {self.zoom_start},'),
+            template['body'],
+            html.escape(''.join(markers)),
+            template['tail'],
+        ])
+
+    def _marker_js(self, index, location, popup, icon):
+        map_var = self._template['map_var']
+        content = f'<div style="width: 100.0%; height: 100.0%;">{popup}</div>'
+        # 스크립트 블록 안에서 </script>로 끊기지 않도록 이스케이프
+        content = json.dumps(content, ensure_ascii=False).replace('</', '<\\/')
+        return (
+            f'\n            var marker_{index} = L.marker({json.dumps(location)}, {{}}).addTo({map_var});'
+            f'\n            marker_{index}.setIcon(L.AwesomeMarkers.icon({json.dumps(icon)}));'
+            f'\n            marker_{index}.bindPopup(L.popup({{"maxWidth": "100%"}}).setContent({content}));\n'
+        )
+
+
+def preload_template():
+    """지도 템플릿을 만들어 반환합니다 (folium 불러오기 포함, 프로세스당 한 번).
+
+    folium은 불러오는 데만 수백 ms가 걸리므로 모듈을 불러올 때가 아니라 첫 렌더링
+    때 실행하고, preload 후 fork하는 서버는 부모 프로세스에서 미리 호출합니다.
+    템플릿을 만들지 못했으면 None입니다.
+    """
+    global _template, _template_ready
+    if not _template_ready:
+        with _template_lock:
+            if not _template_ready:
+                _template = MapRenderer._build_template()
+                _template_ready = True
+    return _template
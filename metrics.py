@@ -0,0 +1,279 @@
+import functools
+import os
+import sys
+import threading
+import time
+import traceback
+from collections import Counter, deque
+from contextlib import contextmanager
+
+from blocking import is_green
+
+# Prometheus 히스토그램 버킷 (초)
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class Histogram:
+    """레이블 조합별 누적 버킷/합계/개수"""
+
+    def __init__(self, name, help_text, label_names, buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = label_names
+        self.buckets = buckets
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, *labels):
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * len(self.buckets), 0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[0][i] += 1
+            series[1] += value
+            series[2] += 1
+
+    def render(self, prefix):
+        name = f'{prefix}_{self.name}'
+        lines = [f'# HELP {name} {self.help_text}', f'# TYPE {name} histogram']
+        with self._lock:
+            series = {labels: ([*counts], total, count) for labels, (counts, total, count) in self._series.items()}
+        for labels, (counts, total, count) in sorted(series.items()):
+            base = _labels(zip(self.label_names, labels))
+            for bound, bucket_count in zip(self.buckets, counts):
+                lines.append(f'{name}_bucket{_labels(zip(self.label_names, labels), le=bound)} {bucket_count}')
+            lines.append(f'{name}_bucket{_labels(zip(self.label_names, labels), le="+Inf")} {count}')
+            lines.append(f'{name}_sum{base} {total:.6f}')
+            lines.append(f'{name}_count{base} {count}')
+        return lines
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(pairs, **extra):
+    items = list(pairs) + list(extra.items())
+    if not items:
+        return ''
+    return '{' + ','.join(f'{key}="{_escape(value)}"' for key, value in items) + '}'
+
+
+class MetricsRegistry:
+    """단계별 소요 시간, HTTP 요청 지연과 캐시/업스트림 카운터를 모아 Prometheus 형식으로 내보냅니다.
+
+    카운터는 각 모듈의 stats() 함수를 collector로 등록해 두고 /metrics 요청 때
+    읽어 옵니다. 중첩 dict는 키를 '_'로 이어 메트릭 이름으로, label을 지정하면
+    첫 단계 키를 레이블 값으로 사용합니다.
+    """
+
+    def __init__(self, prefix=None):
+        self.prefix = prefix or os.getenv('METRICS_PREFIX', 'haru')
+        self.stages = Histogram('stage_duration_seconds', '처리 단계별 소요 시간', ('stage',))
+        self.requests = Histogram('http_request_duration_seconds', 'HTTP 요청 처리 시간',
+                                  ('app', 'endpoint', 'method', 'status'))
+        self._collectors = {}
+        self._lock = threading.Lock()
+
+    def observe(self, stage, seconds):
+        self.stages.observe(seconds, stage)
+
+    def register_collector(self, name, fn, label=None):
+        """stats() 형태의 함수를 메트릭으로 등록합니다 (같은 이름은 교체).
+
+        누적 카운터와 현재 크기가 섞여 있으므로 untyped로 내보냅니다.
+        """
+        with self._lock:
+            self._collectors[name] = (fn, label)
+
+    def render(self):
+        lines = self.stages.render(self.prefix) + self.requests.render(self.prefix)
+
+        with self._lock:
+            collectors = sorted(self._collectors.items())
+        for name, (fn, label) in collectors:
+            try:
+                stats = fn()
+            except Exception as e:
+                print(f"메트릭 수집 오류 ({name}): {e}")
+                continue
+
+            samples = {}
+            if label:
+                for label_value, values in stats.items():
+                    _flatten(samples, f'{self.prefix}_{name}', values, ((label, label_value),))
+            else:
+                _flatten(samples, f'{self.prefix}_{name}', stats, ())
+
+            for metric in sorted(samples):
+                lines.append(f'# TYPE {metric} untyped')
+                for labels, value in samples[metric]:
+                    lines.append(f'{metric}{_labels(labels)} {value}')
+
+        return '\n'.join(lines) + '\n'
+
+
+def _flatten(samples, name, value, labels):
+    if isinstance(value, dict):
+        for key, child in value.items():
+            _flatten(samples, f'{name}_{key}', child, labels)
+    elif isinstance(value, (bool, int, float)):
+        samples.setdefault(name, []).append((labels, float(value)))
+
+
+REGISTRY = MetricsRegistry()
+
+
+@contextmanager
+def timed(stage):
+    """with 블록의 소요 시간을 stage 단계로 기록합니다."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        REGISTRY.observe(stage, time.perf_counter() - started)
+
+
+def timed_method(stage):
+    """함수/메서드 전체 소요 시간을 기록하는 데코레이터"""
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with timed(stage):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+class SlowRequestProfiler:
+    """느린 요청용 샘플링 프로파일러
+
+    처리 중인 요청 스레드의 스택을 interval마다 sys._current_frames()로
+    샘플링하고, 요청이 threshold_ms보다 오래 걸렸을 때만 모인 샘플을 hook에
+    넘깁니다. 기본 hook은 가장 많이 잡힌 스택 몇 개를 출력하고 최근 결과를
+    보관합니다. threshold_ms가 0이면 꺼지며, OS 스레드 단위로 샘플링하므로
+    eventlet 모드에서는 사용하지 않습니다.
+    """
+
+    def __init__(self, threshold_ms=None, interval=None, hook=None, keep=20):
+        self.threshold = float(threshold_ms if threshold_ms is not None else os.getenv('PROFILE_SLOW_MS', 0)) / 1000
+        self.interval = float(interval or os.getenv('PROFILE_SAMPLE_INTERVAL', 0.005))
+        self.hook = hook or self._default_hook
+        if self.threshold > 0 and is_green():
+            # 그린 스레드는 sys._current_frames()에 잡히지 않음
+            print("eventlet 모드에서는 느린 요청 프로파일러를 사용하지 않습니다")
+            self.threshold = 0
+        self.recent = deque(maxlen=keep)
+
+        self._active = {}
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._sampler = None
+
+    @property
+    def enabled(self):
+        return self.threshold > 0
+
+    def start(self, request_id):
+        if not self.enabled:
+            return
+        with self._lock:
+            self._active[request_id] = (threading.get_ident(), Counter())
+            if self._sampler is None:
+                self._sampler = threading.Thread(target=self._sample_loop, name='slow-request-profiler', daemon=True)
+                self._sampler.start()
+        self._wake.set()
+
+    def stop(self, request_id, info, seconds):
+        if not self.enabled:
+            return
+        with self._lock:
+            entry = self._active.pop(request_id, None)
+        if entry is not None and seconds >= self.threshold:
+            try:
+                self.hook(info, seconds, entry[1])
+            except Exception as e:
+                print(f"프로파일러 hook 오류: {e}")
+
+    def _sample_loop(self):
+        own = threading.get_ident()
+        while True:
+            self._wake.wait()
+            with self._lock:
+                active = list(self._active.values())
+                if not active:
+                    self._wake.clear()
+                    continue
+            frames = sys._current_frames()
+            for thread_id, samples in active:
+                frame = frames.get(thread_id)
+                if frame is not None and thread_id != own:
+                    stack = traceback.extract_stack(frame)
+                    samples[';'.join(f'{f.name} ({os.path.basename(f.filename)}:{f.lineno})' for f in stack)] += 1
+            time.sleep(self.interval)
+
+    def _default_hook(self, info, seconds, samples):
+        top = samples.most_common(5)
+        self.recent.append({'request': info, 'duration_ms': round(seconds * 1000, 1),
+                            'samples': sum(samples.values()),
+                            'top_stacks': [{'stack': stack, 'count': count} for stack, count in top]})
+        print(f"느린 요청 {info} {seconds * 1000:.0f}ms (샘플 {sum(samples.values())}개)")
+        for stack, count in top[:3]:
+            print(f"  {count:>4}  {stack.split(';')[-1]}")
+
+
+def init_app(app, name):
+    """Flask 앱에 요청 지연 기록, /metrics, 느린 요청 프로파일러를 연결합니다."""
+    from flask import Response, g, jsonify, request
+
+    profiler = SlowRequestProfiler()
+    app.extensions['slow_request_profiler'] = profiler
+
+    def finish(started, request_id, endpoint, method, path, status):
+        seconds = time.perf_counter() - started
+        REGISTRY.requests.observe(seconds, name, endpoint, method, status)
+        profiler.stop(request_id, f'{method} {path}', seconds)
+
+    def pending(status):
+        """기록하지 않은 요청이면 finish 인자를 반환하고 기록한 것으로 표시합니다."""
+        started = g.pop('_metrics_started', None)
+        if started is None:
+            return None
+        return (started, g.pop('_metrics_request_id'), request.endpoint or 'unknown', request.method,
+                request.path, status)
+
+    @app.before_request
+    def _start_timer():
+        g._metrics_started = time.perf_counter()
+        g._metrics_request_id = id(g._get_current_object())
+        profiler.start(g._metrics_request_id)
+
+    @app.after_request
+    def _record_request(response):
+        args = pending(str(response.status_code))
+        if args is not None:
+            # 응답이 닫힐 때 기록: 스트리밍(NDJSON/SSE) 응답은 본문을 모두 보낸 뒤까지 포함
+            response.call_on_close(lambda: finish(*args))
+        return response
+
+    @app.teardown_request
+    def _record_failed(exc):
+        # after_request가 실행되지 않은 요청(예외 전파 등)도 500으로 기록하고 프로파일러에서 제거
+        args = pending('500')
+        if args is not None:
+            finish(*args)
+
+    @app.route('/metrics')
+    def metrics():
+        """Prometheus 형식 메트릭"""
+        return Response(REGISTRY.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+    @app.route('/metrics/slow')
+    def slow_requests():
+        """최근 느린 요청 프로파일 (PROFILE_SLOW_MS 설정 시)"""
+        return jsonify({'enabled': profiler.enabled, 'threshold_ms': profiler.threshold * 1000,
+                        'requests': list(profiler.recent)})
+
+    return profiler
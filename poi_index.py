@@ -0,0 +1,231 @@
+import csv
+import json
+import math
+import os
+import threading
+
+import numpy as np
+
+from ranking import haversine_km, top_k_indices
+
+# 위도 1도당 거리 (km)
+KM_PER_DEGREE = 111.32
+
+# 격자 셀 id = 행 * _ROW_STRIDE + 열. 열 인덱스(경도/셀 크기)보다 충분히 커야 합니다
+_ROW_STRIDE = 1 << 32
+
+# OSM 태그 → Google Places 장소 유형
+OSM_TYPE_MAP = {
+    ('amenity', 'restaurant'): 'restaurant',
+    ('amenity', 'fast_food'): 'restaurant',
+    ('amenity', 'cafe'): 'cafe',
+    ('amenity', 'bar'): 'bar',
+    ('amenity', 'pub'): 'bar',
+    ('amenity', 'cinema'): 'movie_theater',
+    ('tourism', 'attraction'): 'tourist_attraction',
+    ('tourism', 'viewpoint'): 'tourist_attraction',
+    ('tourism', 'museum'): 'museum',
+    ('tourism', 'gallery'): 'museum',
+    ('tourism', 'hotel'): 'hotel',
+    ('tourism', 'guest_house'): 'hotel',
+    ('tourism', 'hostel'): 'hotel',
+    ('tourism', 'theme_park'): 'amusement_park',
+    ('leisure', 'park'): 'park',
+    ('shop', 'mall'): 'shopping_mall',
+    ('historic', 'castle'): 'tourist_attraction',
+    ('historic', 'monument'): 'tourist_attraction',
+}
+
+
+def _split_types(value):
+    if isinstance(value, list):
+        return [t for t in value if t]
+    if not value:
+        return []
+    return [t.strip() for t in str(value).replace(';', '|').split('|') if t.strip()]
+
+
+class POIIndex:
+    """오프라인 POI 데이터셋에 대한 격자 기반 공간 인덱스
+
+    좌표, 평점 등 각 속성을 열 단위 배열로 보관하고 전체 레코드를
+    (위도 행, 경도 열) 격자 셀 id 순으로 정렬해 둡니다. 같은 행의 연속된
+    셀은 배열에서도 연속 구간이므로, 반경 검색은 검색 영역이 걸치는 행마다
+    searchsorted로 구간 하나를 잘라낸 뒤 후보만 거리 계산하면 됩니다.
+    """
+
+    def __init__(self, names, addresses, ratings, lats, lngs, types, cell_size=0.01):
+        self.cell_size = cell_size
+
+        lats = np.asarray(lats, dtype=np.float64)
+        lngs = np.asarray(lngs, dtype=np.float64)
+        cell_ids = self._cell_ids(lats, lngs)
+        order = np.argsort(cell_ids, kind='stable')
+
+        self.cell_ids = cell_ids[order]
+        self.lats = lats[order]
+        self.lngs = lngs[order]
+        self.ratings = np.asarray(ratings, dtype=np.float64)[order]
+        self.names = np.asarray(names, dtype=object)[order]
+        self.addresses = np.asarray(addresses, dtype=object)[order]
+        self.types = [types[i] for i in order]
+
+        # 장소 유형별 소속 여부 마스크
+        self.type_masks = {}
+        for i, place_types in enumerate(self.types):
+            for place_type in place_types:
+                mask = self.type_masks.get(place_type)
+                if mask is None:
+                    mask = self.type_masks[place_type] = np.zeros(len(self.types), dtype=bool)
+                mask[i] = True
+
+    def __len__(self):
+        return len(self.lats)
+
+    def _cell_ids(self, lats, lngs):
+        rows = np.floor((np.asarray(lats) + 90.0) / self.cell_size).astype(np.int64)
+        cols = np.floor((np.asarray(lngs) + 180.0) / self.cell_size).astype(np.int64)
+        return rows * _ROW_STRIDE + cols
+
+    @classmethod
+    def load(cls, path, cell_size=0.01):
+        """CSV 또는 GeoJSON(OSM 추출 포함) 파일에서 인덱스를 생성합니다."""
+        if path.lower().endswith(('.geojson', '.json')):
+            rows = cls._read_geojson(path)
+        else:
+            rows = cls._read_csv(path)
+
+        columns = list(zip(*rows)) if rows else [[] for _ in range(6)]
+        return cls(*columns, cell_size=cell_size)
+
+    @staticmethod
+    def _read_csv(path):
+        """name, address, rating, latitude, longitude, types('|' 구분) 열을 읽습니다."""
+        rows = []
+        with open(path, newline='', encoding='utf-8') as f:
+            for record in csv.DictReader(f):
+                try:
+                    lat = float(record['latitude'])
+                    lng = float(record['longitude'])
+                except (KeyError, TypeError, ValueError):
+                    continue
+                rows.append((
+                    record.get('name', ''),
+                    record.get('address', ''),
+                    float(record.get('rating') or 0),
+                    lat,
+                    lng,
+                    _split_types(record.get('types'))
+                ))
+        return rows
+
+    @staticmethod
+    def _read_geojson(path):
+        """Point 피처만 읽습니다. types가 없으면 OSM 태그에서 장소 유형을 추론합니다."""
+        with open(path, encoding='utf-8') as f:
+            data = json.load(f)
+
+        rows = []
+        for feature in data.get('features', []):
+            geometry = feature.get('geometry') or {}
+            if geometry.get('type') != 'Point':
+                continue
+            lng, lat = geometry['coordinates'][:2]
+            props = feature.get('properties') or {}
+
+            types = _split_types(props.get('types'))
+            if not types:
+                types = sorted({
+                    place_type for (key, value), place_type in OSM_TYPE_MAP.items()
+                    if props.get(key) == value
+                })
+
+            address = props.get('address') or props.get('vicinity') or ' '.join(
+                props[k] for k in ('addr:city', 'addr:district', 'addr:street', 'addr:housenumber')
+                if props.get(k)
+            )
+            rows.append((
+                props.get('name', ''),
+                address,
+                float(props.get('rating') or 0),
+                float(lat),
+                float(lng),
+                types
+            ))
+        return rows
+
+    def _candidates(self, lat, lng, radius_km):
+        """검색 원을 감싸는 격자 영역에 속한 레코드 인덱스"""
+        dlat = radius_km / KM_PER_DEGREE
+        dlng = radius_km / (KM_PER_DEGREE * max(math.cos(math.radians(lat)), 1e-6))
+
+        row_min = int(math.floor((lat - dlat + 90.0) / self.cell_size))
+        row_max = int(math.floor((lat + dlat + 90.0) / self.cell_size))
+        col_min = int(math.floor((lng - dlng + 180.0) / self.cell_size))
+        col_max = int(math.floor((lng + dlng + 180.0) / self.cell_size))
+
+        rows = np.arange(row_min, row_max + 1, dtype=np.int64) * _ROW_STRIDE
+        starts = np.searchsorted(self.cell_ids, rows + col_min, side='left')
+        ends = np.searchsorted(self.cell_ids, rows + col_max, side='right')
+
+        ranges = [np.arange(s, e) for s, e in zip(starts, ends) if e > s]
+        if not ranges:
+            return np.array([], dtype=np.intp)
+        return np.concatenate(ranges)
+
+    def query(self, lat, lng, radius=5000, place_type=None, limit=10):
+        """반경(미터)과 장소 유형으로 검색해 거리순 장소 정보를 반환합니다."""
+        if not len(self):
+            return []
+
+        candidates = self._candidates(lat, lng, radius / 1000)
+        if place_type:
+            mask = self.type_masks.get(place_type)
+            if mask is None:
+                return []
+            candidates = candidates[mask[candidates]]
+
+        distances = haversine_km(lat, lng, self.lats[candidates], self.lngs[candidates])
+        inside = distances * 1000 <= radius
+        candidates = candidates[inside]
+        distances = distances[inside]
+
+        places = []
+        for i in top_k_indices(distances, limit):
+            idx = candidates[i]
+            places.append({
+                'name': self.names[idx],
+                'address': self.addresses[idx],
+                'rating': float(self.ratings[idx]),
+                'types': list(self.types[idx]),
+                'latitude': float(self.lats[idx]),
+                'longitude': float(self.lngs[idx]),
+                'distance': float(distances[i])
+            })
+        return places
+
+
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+
+def load_poi_index(path=None):
+    """POI_DATA_PATH 데이터셋을 읽어 인덱스를 만듭니다. 파일이 없으면 None
+
+    인덱스는 읽기 전용이므로 경로별로 한 번만 만들어 공유합니다 (preload 후
+    fork하는 워커들은 부모 프로세스가 만든 배열을 그대로 공유).
+    """
+    path = path or os.getenv('POI_DATA_PATH', os.path.join(os.path.dirname(__file__), 'data', 'poi_seoul.csv'))
+    if not os.path.exists(path):
+        return None
+
+    cell_size = float(os.getenv('POI_CELL_SIZE', 0.01))
+    with _indexes_lock:
+        key = (os.path.abspath(path), cell_size)
+        if key not in _indexes:
+            try:
+                _indexes[key] = POIIndex.load(path, cell_size=cell_size)
+            except Exception as e:
+                print(f"POI 데이터 로드 오류: {e}")
+                return None
+        return _indexes[key]
@@ -0,0 +1,143 @@
+import math
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from geo_cache import geohash_decode, geohash_neighbors
+from ratelimit import PRIORITY_BACKGROUND, RateLimitExceeded
+
+# PREFETCH_PLACE_TYPES가 없거나 비어 있을 때 미리 채울 장소 유형
+DEFAULT_PLACE_TYPES = ('restaurant', 'tourist_attraction', 'hotel')
+
+
+class Prefetcher:
+    """위치 갱신 직후 다음 장소 검색에 쓰일 타일과 주소를 미리 채웁니다.
+
+    사용자 셀과 이웃 셀 × 자주 찾는 장소 유형의 Places 타일, 사용자 주변
+    역지오코딩 셀을 가까운 순으로 골라 예산 안에서만 백그라운드 우선순위로
+    조회합니다. 이미 캐시된 항목과 진행 중인 항목은 건너뛰며, 실제 요청과
+    같은 single-flight 키를 쓰므로 조회 도중 들어온 요청은 결과를 공유합니다.
+    """
+
+    def __init__(self, recommender, place_types=None, radius=None, budget=None, geocode_budget=None,
+                 workers=None, max_pending=None):
+        self.recommender = recommender
+        self.place_types = place_types or [
+            t.strip() for t in os.getenv('PREFETCH_PLACE_TYPES', '').split(',') if t.strip()
+        ] or list(DEFAULT_PLACE_TYPES)
+        self.radius = int(radius or os.getenv('PREFETCH_RADIUS', 5000))
+        self.budget = int(budget if budget is not None else os.getenv('PREFETCH_BUDGET', 9))
+        self.geocode_budget = int(geocode_budget if geocode_budget is not None
+                                  else os.getenv('PREFETCH_GEOCODE_BUDGET', 2))
+        self.max_pending = int(max_pending or os.getenv('PREFETCH_MAX_PENDING', 100))
+
+        self._executor = ThreadPoolExecutor(max_workers=int(workers or os.getenv('PREFETCH_WORKERS', 2)),
+                                            thread_name_prefix='prefetch')
+        self._pending = set()
+        self._lock = threading.Lock()
+        self._stats = {'scheduled': 0, 'skipped': 0, 'fetched': 0, 'failed': 0, 'shed': 0}
+
+    def schedule(self, lat, lng):
+        """위치 갱신 시 호출합니다. 예약한 조회 수를 반환합니다."""
+        scheduled = 0
+        for key, fn in self._plan(lat, lng):
+            with self._lock:
+                if key in self._pending or len(self._pending) >= self.max_pending:
+                    self._stats['skipped'] += 1
+                    continue
+                self._pending.add(key)
+                self._stats['scheduled'] += 1
+            self._executor.submit(self._run, key, fn)
+            scheduled += 1
+        return scheduled
+
+    def _plan(self, lat, lng):
+        """예산 안에서 조회할 (키, 함수) 목록. 캐시된 항목은 예산을 쓰지 않습니다."""
+        recommender = self.recommender
+        tasks = []
+
+        if recommender.provider != 'offline' and recommender.api_key and self.budget > 0:
+            places_cache = recommender.places_cache
+            own = places_cache.tile(lat, lng, self.place_types[0], self.radius).key[0]
+            cells = [own] + self._nearest(lat, lng, geohash_neighbors(own))
+
+            budget = self.budget
+            for cell in cells:
+                cell_lat, cell_lng = geohash_decode(cell)[:2]
+                for place_type in self.place_types:
+                    if budget <= 0:
+                        break
+                    tile = places_cache.tile(cell_lat, cell_lng, place_type, self.radius)
+                    if places_cache.contains(tile):
+                        continue
+                    tasks.append((('places',) + tile.key, self._places_task(tile, place_type)))
+                    budget -= 1
+
+        if self.geocode_budget > 0:
+            geocode_cache = recommender.geocode_cache
+            budget = self.geocode_budget
+            for cell in self._nearest(lat, lng, geohash_neighbors(geocode_cache.cell(lat, lng))):
+                if budget <= 0:
+                    break
+                cell_lat, cell_lng = geohash_decode(cell)[:2]
+                if geocode_cache.contains(cell_lat, cell_lng):
+                    continue
+                tasks.append((('geocode', cell), self._geocode_task(cell, cell_lat, cell_lng)))
+                budget -= 1
+
+        return tasks
+
+    @staticmethod
+    def _nearest(lat, lng, cells):
+        """셀 중심이 가까운 순으로 정렬 (경도 차는 위도에 맞춰 보정)"""
+        scale = math.cos(math.radians(lat))
+
+        def distance(cell):
+            cell_lat, cell_lng = geohash_decode(cell)[:2]
+            return math.hypot(cell_lat - lat, (cell_lng - lng) * scale)
+
+        return sorted(cells, key=distance)
+
+    def _places_task(self, tile, place_type):
+        recommender = self.recommender
+
+        def fetch():
+            return recommender.places_flight.do(
+                tile.key, lambda: recommender.fetch_tile(tile, place_type, PRIORITY_BACKGROUND)
+            )
+        return fetch
+
+    def _geocode_task(self, cell, lat, lng):
+        recommender = self.recommender
+
+        def fetch():
+            return recommender.geocode_flight.do(
+                cell, lambda: recommender.resolve_address(lat, lng, PRIORITY_BACKGROUND)
+            )
+        return fetch
+
+    def _run(self, key, fn):
+        try:
+            result = fn()
+            self._count('fetched' if result is not None else 'failed')
+        except RateLimitExceeded:
+            # 실제 요청에 호출 한도를 양보
+            self._count('shed')
+        except Exception as e:
+            print(f"프리페치 오류: {e}")
+            self._count('failed')
+        finally:
+            with self._lock:
+                self._pending.discard(key)
+
+    def _count(self, name):
+        with self._lock:
+            self._stats[name] += 1
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats['pending'] = len(self._pending)
+        stats['budget'] = self.budget
+        stats['geocode_budget'] = self.geocode_budget
+        return stats
@@ -0,0 +1,122 @@
+import numpy as np
+
+# WGS84 평균 반지름 (km)
+EARTH_RADIUS_KM = 6371.0088
+
+
+def haversine_km(lat, lng, lats, lngs):
+    """기준점에서 여러 좌표까지의 haversine 거리(km)를 한 번에 계산합니다."""
+    lat1 = np.radians(lat)
+    lat2 = np.radians(np.asarray(lats, dtype=np.float64))
+    dlat = lat2 - lat1
+    dlng = np.radians(np.asarray(lngs, dtype=np.float64) - lng)
+
+    a = np.sin(dlat / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin(dlng / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+def _extract_coordinates(results):
+    """Places 원본 레코드에서 좌표가 있는 레코드와 좌표 배열을 추출합니다."""
+    records = []
+    coords = []
+    for place in results:
+        location = place.get('geometry', {}).get('location', {})
+        lat_ = location.get('lat')
+        lng_ = location.get('lng')
+        if lat_ is None or lng_ is None:
+            continue  # 위치 정보 없는 장소 제외
+        records.append(place)
+        coords.append((lat_, lng_))
+
+    return records, np.array(coords, dtype=np.float64).reshape(-1, 2)
+
+
+def _place_info(place, lat_, lng_, distance):
+    return {
+        'name': place.get('name', ''),
+        'address': place.get('vicinity', ''),
+        'rating': place.get('rating', 0),
+        'types': place.get('types', []),
+        'latitude': lat_,
+        'longitude': lng_,
+        'distance': distance
+    }
+
+
+def top_k_indices(distances, limit):
+    """가까운 순서대로 상위 limit개의 인덱스를 반환합니다 (부분 선택 후 k개만 정렬)."""
+    if limit <= 0 or len(distances) == 0:
+        return np.array([], dtype=np.intp)
+    if len(distances) > limit:
+        candidates = np.argpartition(distances, limit - 1)[:limit]
+    else:
+        candidates = np.arange(len(distances))
+    return candidates[np.argsort(distances[candidates], kind='stable')]
+
+
+def rank_places(lat, lng, results, limit=10, radius=None):
+    """Places 원본 레코드를 거리순으로 순위화해 상위 limit개 장소 정보를 반환합니다.
+
+    거리는 NumPy 배열 위에서 haversine으로 한 번에 계산하고, 전체 정렬 대신
+    argpartition으로 상위 k개만 골라 정렬합니다. radius(미터)를 주면 반경
+    밖의 장소는 제외합니다.
+    """
+    records, coords = _extract_coordinates(results)
+    if not records:
+        return []
+
+    distances = haversine_km(lat, lng, coords[:, 0], coords[:, 1])
+    candidates = np.arange(len(records))
+    if radius is not None:
+        candidates = np.flatnonzero(distances * 1000 <= radius)
+
+    selected = candidates[top_k_indices(distances[candidates], limit)]
+    return [
+        _place_info(records[i], float(coords[i, 0]), float(coords[i, 1]), float(distances[i]))
+        for i in selected
+    ]
+
+
+def rank_places_geodesic(lat, lng, results, limit=10, radius=None):
+    """geodesic 거리와 전체 정렬을 사용하는 기준(reference) 구현"""
+    # 정확도 검증에만 쓰이므로 geopy는 여기서 불러옴 (요청 경로의 시작 시간에서 제외)
+    from geopy.distance import geodesic
+
+    places = []
+    for place in results:
+        location = place.get('geometry', {}).get('location', {})
+        lat_ = location.get('lat')
+        lng_ = location.get('lng')
+        if lat_ is None or lng_ is None:
+            continue
+        distance = geodesic((lat, lng), (lat_, lng_)).kilometers
+        if radius is not None and distance * 1000 > radius:
+            continue
+        places.append(_place_info(place, lat_, lng_, distance))
+
+    places.sort(key=lambda x: x['distance'])
+    return places[:limit]
+
+
+def check_accuracy(lat, lng, results, limit=10, radius=None):
+    """벡터화 순위 결과를 geodesic 기준 구현과 비교합니다.
+
+    반환값의 max_error_km는 같은 장소에 대한 두 거리의 최대 차이이고,
+    same_order는 두 구현이 같은 장소를 같은 순서로 골랐는지 여부입니다.
+    """
+    fast = rank_places(lat, lng, results, limit, radius)
+    reference = rank_places_geodesic(lat, lng, results, limit, radius)
+
+    reference_distance = {
+        (p['name'], p['latitude'], p['longitude']): p['distance'] for p in reference
+    }
+    errors = []
+    for place in fast:
+        key = (place['name'], place['latitude'], place['longitude'])
+        if key in reference_distance:
+            errors.append(abs(place['distance'] - reference_distance[key]))
+
+    return {
+        'max_error_km': max(errors) if errors else 0.0,
+        'same_order': [p['name'] for p in fast] == [p['name'] for p in reference]
+    }
@@ -0,0 +1,97 @@
+import heapq
+import itertools
+import threading
+import time
+
+# 우선순위 (값이 작을수록 먼저 처리)
+PRIORITY_INTERACTIVE = 0
+PRIORITY_DEFAULT = 1
+PRIORITY_BACKGROUND = 2
+
+
+class RateLimitExceeded(Exception):
+    """허용 대기 시간 안에 호출 토큰을 얻지 못해 요청을 거절(load shedding)했을 때 발생"""
+
+
+class TokenBucketScheduler:
+    """업스트림 호출 한도를 지키는 토큰 버킷 + 우선순위 대기열
+
+    초당 rate개의 토큰이 최대 burst개까지 쌓이며, 토큰이 없으면 호출자는
+    우선순위 순(같으면 도착 순)으로 대기합니다. 대기열 앞 호출자들을 처리하는
+    데 걸릴 예상 시간이 max_wait를 넘거나 대기열이 가득 차면 기다리지 않고
+    RateLimitExceeded로 즉시 거절합니다.
+    """
+
+    def __init__(self, name, rate, burst=1, max_wait=2.0, max_queue=100):
+        self.name = name
+        self.rate = float(rate)
+        self.burst = float(burst)
+        self.max_wait = max_wait
+        self.max_queue = max_queue
+
+        self._tokens = self.burst
+        self._updated = time.monotonic()
+        self._waiters = []
+        self._sequence = itertools.count()
+        self._cond = threading.Condition()
+        self._stats = {'granted': 0, 'shed': 0, 'waited': 0}
+
+    def _refill(self, now):
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def acquire(self, priority=PRIORITY_DEFAULT, max_wait=None):
+        """토큰 하나를 얻을 때까지 기다립니다. 제한 시간을 넘길 것 같으면 RateLimitExceeded"""
+        max_wait = self.max_wait if max_wait is None else max_wait
+
+        with self._cond:
+            now = time.monotonic()
+            self._refill(now)
+
+            if not self._waiters and self._tokens >= 1:
+                self._tokens -= 1
+                self._stats['granted'] += 1
+                return
+
+            # 나보다 먼저 처리될 대기자 수로 예상 대기 시간을 계산
+            ahead = sum(1 for waiter in self._waiters if waiter[0] <= priority)
+            expected_wait = (ahead + 1 - self._tokens) / self.rate
+            if len(self._waiters) >= self.max_queue or expected_wait > max_wait:
+                self._stats['shed'] += 1
+                raise RateLimitExceeded(f"{self.name}: 호출 한도 초과 (예상 대기 {expected_wait:.1f}s)")
+
+            entry = (priority, next(self._sequence))
+            heapq.heappush(self._waiters, entry)
+            self._stats['waited'] += 1
+            deadline = now + max_wait
+
+            while True:
+                now = time.monotonic()
+                self._refill(now)
+
+                if self._waiters[0] == entry and self._tokens >= 1:
+                    heapq.heappop(self._waiters)
+                    self._tokens -= 1
+                    self._stats['granted'] += 1
+                    self._cond.notify_all()
+                    return
+
+                remaining = deadline - now
+                if remaining <= 0:
+                    self._waiters.remove(entry)
+                    heapq.heapify(self._waiters)
+                    self._stats['shed'] += 1
+                    self._cond.notify_all()
+                    raise RateLimitExceeded(f"{self.name}: 대기 시간 {max_wait}s 초과")
+
+                if self._waiters[0] == entry:
+                    # 다음 토큰이 생길 때까지
+                    self._cond.wait(min(remaining, (1 - self._tokens) / self.rate))
+                else:
+                    self._cond.wait(remaining)
+
+    def stats(self):
+        with self._cond:
+            stats = dict(self._stats)
+            stats['queued'] = len(self._waiters)
+        return stats
@@ -0,0 +1,48 @@
+"""채팅 서버 운영 모드 (eventlet)
+
+eventlet monkey patch를 적용한 뒤 chat_app을 불러오므로 연결마다 OS 스레드
+대신 그린 스레드를 사용하고, WebSocket 연결 수천 개를 한 프로세스에서 유지할
+수 있습니다. Dify/Nominatim/Google 호출은 그린 소켓 위에서 협조적으로
+진행되고, SQLite 작업은 BLOCKING_WORKERS개로 제한된 네이티브 스레드 풀에서
+실행됩니다.
+
+    python serve.py --port 5002
+    gunicorn -k eventlet -w 1 --worker-connections 10000 -b 0.0.0.0:5002 serve:app
+
+불러올 때 folium 지도 템플릿과 오프라인 POI 인덱스를 미리 준비하므로(core.preload)
+gunicorn --preload로 띄우면 부모 프로세스에서 한 번만 준비하고 워커들이 fork로
+메모리를 공유합니다. DB 연결, 캐시, 업스트림 클라이언트는 워커에서 처음 사용할
+때 만들어집니다.
+
+여러 프로세스로 수평 확장할 때는 프로세스마다 다른 포트로 띄우고 앞단 프록시에서
+스티키 세션(예: nginx ip_hash)을 설정한 뒤, 모든 프로세스에
+SOCKETIO_MESSAGE_QUEUE=redis://... 를 지정합니다 (redis 패키지 필요).
+"""
+import eventlet
+
+eventlet.monkey_patch()
+
+import argparse
+import os
+
+import core
+from chat_app import app, socketio
+
+core.preload()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--host', default=os.getenv('HOST', '0.0.0.0'))
+    parser.add_argument('--port', type=int, default=int(os.getenv('PORT', 5002)))
+    parser.add_argument('--max-connections', type=int, default=int(os.getenv('SOCKETIO_MAX_CONNECTIONS', 10000)),
+                        help='동시에 유지할 최대 연결 수 (프로세스의 파일 디스크립터 한도도 함께 확인)')
+    parser.add_argument('--access-log', action='store_true', help='요청 로그 출력')
+    args = parser.parse_args()
+
+    print(f"운영 모드(eventlet) 채팅 서버: http://{args.host}:{args.port}")
+    socketio.run(app, host=args.host, port=args.port, max_size=args.max_connections, log_output=args.access_log)
+
+
+if __name__ == '__main__':
+    main()
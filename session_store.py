@@ -0,0 +1,157 @@
+import atexit
+import os
+import threading
+from collections import OrderedDict, deque
+from datetime import datetime
+
+
+class SessionStore:
+    """user_sessions 앞단의 인메모리 세션 저장소
+
+    세션별 현재 위치, 환경설정, 최근 대화 몇 턴을 LRU로 보관합니다. 변경은
+    메모리에만 반영하고 dirty로 표시해 두면 백그라운드 스레드가 주기적으로
+    모아서 user_sessions에 upsert합니다. 캐시에 없는 세션은 처음 조회할 때
+    DB에서 한 번 읽어 옵니다.
+
+    캐시는 프로세스마다 따로라 여러 프로세스로 띄울 때는 한 세션의 요청이 같은
+    프로세스로 가도록 스티키 라우팅을 둡니다. 그렇지 않더라도 upsert는 마지막
+    활동 시각이 DB보다 이전인 사본을 버리므로 오래된 사본이 새 값을 덮지는 않습니다.
+    """
+
+    def __init__(self, db, maxsize=None, flush_interval=None, max_turns=None):
+        self.db = db
+        self.maxsize = int(maxsize or os.getenv('SESSION_STORE_SIZE', 10000))
+        self.flush_interval = float(flush_interval or os.getenv('SESSION_FLUSH_INTERVAL', 5))
+        self.max_turns = int(max_turns or os.getenv('SESSION_MAX_TURNS', 10))
+
+        self._sessions = OrderedDict()
+        self._dirty = {}
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._stats = {'hits': 0, 'loads': 0, 'evictions': 0, 'flushed': 0}
+
+        self._stop = threading.Event()
+        self._flusher = threading.Thread(target=self._flush_loop, name='session-flusher', daemon=True)
+        self._flusher.start()
+        atexit.register(self.flush)
+
+    def get(self, session_id):
+        """세션 상태의 복사본을 반환합니다. 처음 보는 세션이면 DB에서 읽거나 새로 만듭니다.
+
+        저장소의 세션은 다른 스레드가 계속 바꾸므로 잠금 안에서 복사해 돌려줍니다.
+        """
+        session = self._get(session_id)
+        with self._lock:
+            return dict(session, turns=list(session['turns']))
+
+    def _get(self, session_id):
+        """저장소가 보관하는 세션 dict (변경은 self._lock 안에서만)"""
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session is not None:
+                self._sessions.move_to_end(session_id)
+                self._stats['hits'] += 1
+                return session
+
+            # 밀려났지만 아직 기록되지 않은 세션은 DB보다 최신
+            session = self._dirty.get(session_id)
+            if session is not None:
+                self._sessions[session_id] = session
+                self._stats['hits'] += 1
+                self._evict()
+                return session
+
+        session = self._load(session_id)
+        with self._lock:
+            # 읽는 동안 다른 스레드가 먼저 넣었다면 그쪽을 사용
+            existing = self._sessions.get(session_id)
+            if existing is not None:
+                return existing
+            self._sessions[session_id] = session
+            self._stats['loads'] += 1
+            self._evict()
+        return session
+
+    def _load(self, session_id):
+        row = self.db.get_session(session_id) or {}
+        turns = deque(maxlen=self.max_turns)
+        if row:
+            # 최근 대화는 오래된 것부터 쌓음
+            for turn in reversed(self.db.get_chat_history(session_id, self.max_turns)):
+                turns.append({'user': turn['user'], 'ai': turn['ai']})
+        return {
+            'session_id': session_id,
+            'current_location': row.get('current_location'),
+            'preferences': row.get('preferences') or {},
+            'turns': turns,
+            'last_activity': row.get('last_activity'),
+        }
+
+    def _evict(self):
+        """용량을 넘은 세션을 제거합니다. dirty 세션은 다음 write-back까지 _dirty에 남습니다."""
+        while len(self._sessions) > self.maxsize:
+            self._sessions.popitem(last=False)
+            self._stats['evictions'] += 1
+
+    def _touch(self, session):
+        """self._lock 안에서 호출합니다."""
+        session['last_activity'] = datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S')
+        self._dirty[session['session_id']] = session
+
+    def update_location(self, session_id, location_data):
+        session = self._get(session_id)
+        with self._lock:
+            session['current_location'] = location_data
+            self._touch(session)
+
+    def set_preference(self, session_id, name, value):
+        session = self._get(session_id)
+        with self._lock:
+            session['preferences'] = dict(session['preferences'], **{name: value})
+            self._touch(session)
+
+    def add_turn(self, session_id, user_message, ai_response):
+        """최근 대화 턴 기록 (대화 본문은 chat_history에 따로 저장됩니다)"""
+        session = self._get(session_id)
+        with self._lock:
+            session['turns'].append({'user': user_message, 'ai': ai_response})
+            self._touch(session)
+
+    def flush(self):
+        """dirty 세션을 user_sessions에 upsert합니다."""
+        with self._flush_lock:
+            with self._lock:
+                dirty, self._dirty = self._dirty, {}
+                rows = [(s['session_id'], s['current_location'], s['preferences'], s['last_activity'])
+                        for s in dirty.values()]
+            if not rows:
+                return 0
+
+            try:
+                self.db.upsert_sessions(rows)
+            except Exception as e:
+                print(f"세션 저장 오류: {e}")
+                # 실패한 세션은 다음 주기에 다시 시도 (그 사이 새로 바뀐 세션은 유지)
+                with self._lock:
+                    for session_id, session in dirty.items():
+                        self._dirty.setdefault(session_id, session)
+                return 0
+
+            with self._lock:
+                self._stats['flushed'] += len(rows)
+            return len(rows)
+
+    def _flush_loop(self):
+        while not self._stop.wait(self.flush_interval):
+            self.flush()
+
+    def close(self):
+        self._stop.set()
+        self.flush()
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats['sessions'] = len(self._sessions)
+            stats['dirty'] = len(self._dirty)
+        return stats
@@ -1,6 +1,8 @@
 // 전역 변수
 let currentLocation = null;
 let currentPlaces = [];
+let leafletMap = null;
+let markerLayer = null;
 
 // 페이지 로드 시 초기화
 document.addEventListener('DOMContentLoaded', function() {
@@ -121,7 +123,8 @@ function searchPlaces() {
     
     showLoading();
     
-    fetch('/search_places', {
+    // 모든 페이지를 받아 오는 동안 결과를 NDJSON 줄 단위로 갱신
+    fetch('/search_places/stream', {
         method: 'POST',
         headers: {
             'Content-Type': 'application/json',
@@ -133,21 +136,27 @@ function searchPlaces() {
             place_type: placeType
         })
     })
-    .then(response => response.json())
-    .then(data => {
-        hideLoading();
-        if (data.success) {
-            currentLocation = data.location;
-            currentPlaces = data.places;
-            
-            displayLocationInfo(data.location);
-            displayPlaces(data.places);
-            displayMap(data.map_html);
-            
-            showAlert(`${data.places.length}개의 여행지를 찾았습니다!`, 'success');
-        } else {
-            showAlert('여행지 검색에 실패했습니다.', 'danger');
+    .then(response => {
+        const reader = response.body.getReader();
+        const decoder = new TextDecoder();
+        let buffer = '';
+        
+        function read() {
+            return reader.read().then(({ done, value }) => {
+                if (done) {
+                    if (buffer.trim()) {
+                        displaySearchResult(JSON.parse(buffer));
+                    }
+                    return;
+                }
+                buffer += decoder.decode(value, { stream: true });
+                const lines = buffer.split('\n');
+                buffer = lines.pop();
+                lines.filter(line => line.trim()).forEach(line => displaySearchResult(JSON.parse(line)));
+                return read();
+            });
         }
+        return read();
     })
     .catch(error => {
         hideLoading();
@@ -156,6 +165,28 @@ function searchPlaces() {
     });
 }
 
+function displaySearchResult(data) {
+    hideLoading();
+    if (data.success) {
+        currentLocation = data.location;
+        currentPlaces = data.places;
+        
+        displayLocationInfo(data.location);
+        displayPlaces(data.places);
+        if (data.map_geojson) {
+            displayMarkers(data.map_geojson);
+        } else {
+            displayMap(data.map_html);
+        }
+        
+        if (data.done) {
+            showAlert(`${data.places.length}개의 여행지를 찾았습니다!`, 'success');
+        }
+    } else {
+        showAlert('여행지 검색에 실패했습니다.', 'danger');
+    }
+}
+
 function displayPlaces(places) {
     const resultsCard = document.getElementById('resultsCard');
     const placesList = document.getElementById('placesList');
@@ -196,10 +227,54 @@ function displayPlaces(places) {
 }
 
 function displayMap(mapHtml) {
+    // folium HTML 모드 (map_format: 'html')
+    if (leafletMap) {
+        leafletMap.remove();
+        leafletMap = null;
+        markerLayer = null;
+    }
     const mapContainer = document.getElementById('map');
     mapContainer.innerHTML = mapHtml;
 }
 
+function displayMarkers(geojson) {
+    // Leaflet 지도는 처음 한 번만 만들고 이후에는 마커만 교체
+    if (!leafletMap) {
+        const mapContainer = document.getElementById('map');
+        mapContainer.innerHTML = '';
+        leafletMap = L.map(mapContainer);
+        L.tileLayer('https://{s}.tile.openstreetmap.org/{z}/{x}/{y}.png', {
+            attribution: '&copy; OpenStreetMap contributors'
+        }).addTo(leafletMap);
+        window.map = leafletMap;
+    }
+    
+    if (markerLayer) {
+        markerLayer.remove();
+    }
+    markerLayer = L.geoJSON(geojson, {
+        pointToLayer: function(feature, latlng) {
+            const color = feature.properties.kind === 'current' ? 'red' : 'blue';
+            return L.circleMarker(latlng, {
+                radius: 8,
+                color: color,
+                fillColor: color,
+                fillOpacity: 0.7
+            });
+        },
+        onEachFeature: function(feature, layer) {
+            const p = feature.properties;
+            if (p.kind === 'current') {
+                layer.bindPopup(`현재 위치<br>${p.address}`);
+            } else {
+                layer.bindPopup(`<b>${p.name}</b><br>주소: ${p.address}<br>평점: ${p.rating}<br>거리: ${p.distance.toFixed(1)}km`);
+            }
+        }
+    }).addTo(leafletMap);
+    
+    leafletMap.fitBounds(markerLayer.getBounds(), { padding: [30, 30], maxZoom: 15 });
+}
+
 function getRatingStars(rating) {
     const fullStars = Math.floor(rating);
     const hasHalfStar = rating % 1 >= 0.5;
@@ -280,7 +355,7 @@ document.addEventListener('keydown', function(event) {
 window.addEventListener('resize', function() {
     // 지도 리사이즈 (필요한 경우)
     const mapContainer = document.getElementById('map');
-    if (mapContainer.innerHTML.includes('folium')) {
+    if (leafletMap || mapContainer.innerHTML.includes('folium')) {
         // 지도가 로드된 경우 리사이즈 처리
         setTimeout(() => {
             if (window.map && typeof window.map.invalidateSize === 'function') {
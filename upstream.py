@@ -0,0 +1,241 @@
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from circuit import CircuitBreaker, StaleRevalidator
+from ratelimit import PRIORITY_DEFAULT, TokenBucketScheduler
+
+# 업스트림별 기본 설정. 환경 변수 <NAME>_BASE_URL, <NAME>_CONNECT_TIMEOUT,
+# <NAME>_TIMEOUT, <NAME>_MAX_CONCURRENCY, <NAME>_RATE, <NAME>_BURST, <NAME>_MAX_WAIT
+# 로 덮어쓸 수 있습니다 (예: NOMINATIM_TIMEOUT). rate는 초당 호출 한도이며 0이면 제한 없음
+# 회로 차단기는 <NAME>_BREAKER_FAILURE_RATE(0이면 끔), _BREAKER_SLOW_CALL, _BREAKER_WINDOW,
+# _BREAKER_MIN_CALLS, _BREAKER_OPEN_SECONDS로 조정합니다
+#
+# asyncio 변형은 두지 않습니다. 두 앱은 동기 Flask이고 비동기 모드는 eventlet이라(serve.py)
+# requests 호출이 그린 스레드에서 그대로 비차단으로 동작하며, 한 요청 안의 동시 호출은
+# run_concurrently가 맡습니다. 코루틴용 래퍼는 같은 블로킹 세션을 실행기에서 돌릴 뿐이었습니다
+BREAKER_DEFAULTS = {'failure_rate': 0.5, 'window': 20, 'min_calls': 5, 'open_seconds': 30}
+
+UPSTREAM_DEFAULTS = {
+    'google_places': {
+        'base_url': 'https://maps.googleapis.com',
+        'connect_timeout': 3.05,
+        'timeout': 5,
+        'max_concurrency': 16,
+        'rate': 10,
+        'burst': 10,
+        'max_wait': 2.0,
+        'breaker_slow_call': 3.0,
+    },
+    'nominatim': {
+        'base_url': 'https://nominatim.openstreetmap.org',
+        'connect_timeout': 3.05,
+        'timeout': 5,
+        'max_concurrency': 2,
+        'rate': 1,
+        'burst': 1,
+        'max_wait': 2.0,
+        'breaker_slow_call': 3.0,
+        'headers': {'User-Agent': 'travel_recommender'},
+    },
+    'dify': {
+        'base_url': 'https://api.dify.ai',
+        'connect_timeout': 3.05,
+        'timeout': 60,
+        'max_concurrency': 32,
+        'rate': 0,
+        'burst': 1,
+        'max_wait': 0,
+        # 스트리밍 응답은 헤더(첫 응답)까지의 시간
+        'breaker_slow_call': 20.0,
+    },
+}
+
+
+class UpstreamBusyError(Exception):
+    """동시 호출 한도 때문에 제한 시간 안에 요청을 보내지 못했을 때 발생"""
+
+
+class Upstream:
+    """업스트림 HTTP 클라이언트
+
+    keep-alive 연결 풀을 가진 Session 하나를 공유하고, 모든 요청에
+    (연결, 읽기) 타임아웃과 동시 호출 수 제한을 적용합니다. limiter가 있으면
+    요청 전에 우선순위에 따라 호출 토큰을 받고, breaker가 있으면 회로가 열린
+    동안 호출하지 않고 CircuitOpenError로 바로 실패합니다.
+    """
+
+    def __init__(self, name, base_url, connect_timeout=3.05, timeout=10, max_concurrency=8, headers=None,
+                 limiter=None, breaker=None):
+        self.name = name
+        self.base_url = base_url.rstrip('/')
+        self.timeout = (connect_timeout, timeout)
+        self.max_concurrency = max_concurrency
+        self.limiter = limiter
+        self.breaker = breaker
+        self.revalidator = StaleRevalidator(breaker) if breaker is not None else None
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max_concurrency, max_retries=0)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        if headers:
+            self.session.headers.update(headers)
+
+        self._slots = threading.BoundedSemaphore(max_concurrency)
+        self._lock = threading.Lock()
+        self._stats = {'requests': 0, 'errors': 0, 'busy': 0, 'in_flight': 0}
+
+    def request(self, method, path, priority=PRIORITY_DEFAULT, **kwargs):
+        """업스트림에 요청을 보냅니다.
+
+        연결 실패나 타임아웃은 requests 예외로, 호출 한도 초과는
+        RateLimitExceeded로, 회로가 열려 있으면 CircuitOpenError로 전달됩니다.
+        """
+        if self.breaker is not None:
+            self.breaker.before_call()
+
+        try:
+            if self.limiter is not None:
+                self.limiter.acquire(priority)
+
+            # 빈 슬롯을 읽기 타임아웃 이상 기다리지 않습니다
+            if not self._slots.acquire(timeout=self.timeout[1]):
+                self._count('busy')
+                raise UpstreamBusyError(f"{self.name}: 동시 호출 한도({self.max_concurrency}) 초과")
+        except Exception:
+            # 업스트림을 호출하지 않았으므로 회로 상태에 반영하지 않음
+            if self.breaker is not None:
+                self.breaker.release()
+            raise
+
+        kwargs.setdefault('timeout', self.timeout)
+        self._count('requests')
+        self._count('in_flight')
+        started = time.monotonic()
+        try:
+            response = self.session.request(method, f"{self.base_url}{path}", **kwargs)
+        except Exception:
+            self._count('errors')
+            self._record(True, started)
+            raise
+        finally:
+            self._count('in_flight', -1)
+            self._slots.release()
+
+        self._record(response.status_code >= 500, started)
+        return response
+
+    def _record(self, failed, started):
+        if self.breaker is not None:
+            self.breaker.record(failed, time.monotonic() - started)
+
+    def circuit_open(self):
+        """회로가 열려 있어 지금 호출하면 바로 실패하는지"""
+        return self.breaker is not None and self.breaker.is_open()
+
+    def revalidate(self, key, fn):
+        """stale로 응답한 key를 업스트림이 회복되면 fn()으로 다시 조회하도록 예약합니다."""
+        if self.revalidator is not None:
+            self.revalidator.defer(key, fn)
+
+    def get(self, path, **kwargs):
+        return self.request('GET', path, **kwargs)
+
+    def post(self, path, **kwargs):
+        return self.request('POST', path, **kwargs)
+
+    def _count(self, name, delta=1):
+        with self._lock:
+            self._stats[name] += delta
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+        if self.limiter is not None:
+            stats['rate_limit'] = self.limiter.stats()
+        if self.breaker is not None:
+            stats['circuit'] = self.breaker.stats()
+            stats['revalidate'] = self.revalidator.stats()
+        return stats
+
+
+_upstreams = {}
+_upstreams_lock = threading.Lock()
+_executor = ThreadPoolExecutor(max_workers=int(os.getenv('UPSTREAM_WORKERS', 32)), thread_name_prefix='upstream')
+
+
+def get_upstream(name):
+    """이름에 해당하는 공유 업스트림 클라이언트를 반환합니다."""
+    with _upstreams_lock:
+        upstream = _upstreams.get(name)
+        if upstream is None:
+            defaults = UPSTREAM_DEFAULTS[name]
+            prefix = name.upper()
+
+            limiter = None
+            rate = float(os.getenv(f'{prefix}_RATE', defaults['rate']))
+            if rate > 0:
+                limiter = TokenBucketScheduler(
+                    name,
+                    rate,
+                    burst=float(os.getenv(f'{prefix}_BURST', defaults['burst'])),
+                    max_wait=float(os.getenv(f'{prefix}_MAX_WAIT', defaults['max_wait'])),
+                )
+
+            breaker = None
+            failure_rate = float(os.getenv(f'{prefix}_BREAKER_FAILURE_RATE', BREAKER_DEFAULTS['failure_rate']))
+            if failure_rate > 0:
+                breaker = CircuitBreaker(
+                    name,
+                    failure_rate=failure_rate,
+                    slow_call=float(os.getenv(f'{prefix}_BREAKER_SLOW_CALL', defaults['breaker_slow_call'])),
+                    window=int(os.getenv(f'{prefix}_BREAKER_WINDOW', BREAKER_DEFAULTS['window'])),
+                    min_calls=int(os.getenv(f'{prefix}_BREAKER_MIN_CALLS', BREAKER_DEFAULTS['min_calls'])),
+                    open_seconds=float(os.getenv(f'{prefix}_BREAKER_OPEN_SECONDS', BREAKER_DEFAULTS['open_seconds'])),
+                )
+
+            upstream = _upstreams[name] = Upstream(
+                name,
+                os.getenv(f'{prefix}_BASE_URL', defaults['base_url']),
+                connect_timeout=float(os.getenv(f'{prefix}_CONNECT_TIMEOUT', defaults['connect_timeout'])),
+                timeout=float(os.getenv(f'{prefix}_TIMEOUT', defaults['timeout'])),
+                max_concurrency=int(os.getenv(f'{prefix}_MAX_CONCURRENCY', defaults['max_concurrency'])),
+                headers=defaults.get('headers'),
+                limiter=limiter,
+                breaker=breaker,
+            )
+        return upstream
+
+
+def reverse_geocode(lat, lng, priority=PRIORITY_DEFAULT):
+    """Nominatim 역지오코딩으로 주소 문자열을 조회합니다."""
+    response = get_upstream('nominatim').get('/reverse', params=_reverse_params(lat, lng), priority=priority)
+    return _display_name(response)
+
+
+def _reverse_params(lat, lng):
+    return {'lat': lat, 'lon': lng, 'format': 'json'}
+
+
+def _display_name(response):
+    response.raise_for_status()
+    address = response.json().get('display_name')
+    if not address:
+        raise ValueError('역지오코딩 결과가 없습니다')
+    return address
+
+
+def run_concurrently(*calls):
+    """인자 없는 호출 여러 개를 공용 실행기에서 동시에 실행하고 결과를 순서대로 반환합니다."""
+    futures = [_executor.submit(call) for call in calls]
+    return [future.result() for future in futures]
+
+
+def upstream_stats():
+    with _upstreams_lock:
+        return {name: upstream.stats() for name, upstream in _upstreams.items()}